@@ -1,11 +1,19 @@
 """Agent 1: Input Validation Agent."""
 import json
 import re
-import httpx
-from typing import Dict, Optional
-from config import STUDENT_PORTAL_BASE_URL, STUDENT_PORTAL_API_KEY
+from typing import Callable, Dict, Optional, List
+from config import (
+    STUDENT_PORTAL_API_KEY,
+    AGENT1_LOCAL_VALIDATION_ENABLED,
+    AGENT1_LOCAL_CONFIDENCE_THRESHOLD,
+)
 from agent_prompts import AGENT1_INPUT_VALIDATION_PROMPT
 from json_parser_utils import parse_llm_json_response
+from llm_client import chat_completion, chat_completion_sync
+from model_router import route_payload
+from prompt_layout import build_messages, render_context
+from token_budget import fit_prompt
+from local_validator import LocalInputValidator
 
 
 class InputValidationAgent:
@@ -18,10 +26,10 @@ class InputValidationAgent:
         Args:
             model: LLM model to use (default: "gpt-4o-mini" for cost efficiency)
         """
-        self.base_url = STUDENT_PORTAL_BASE_URL
         self.api_key = STUDENT_PORTAL_API_KEY
         self.model = model
-        self.endpoint = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+        self.timeout = 60.0
+        self.local_validator = LocalInputValidator() if AGENT1_LOCAL_VALIDATION_ENABLED else None
         
         if not self.api_key:
             raise ValueError("STUDENT_PORTAL_API_KEY not set")
@@ -41,54 +49,112 @@ class InputValidationAgent:
         Returns:
             Dictionary with validation results
         """
-        user_message = f"""Please validate the following resume and project materials:
-
-=== RESUME CONTENT ===
-{resume_text}
-
-=== PROJECT MATERIALS ===
-{project_materials if project_materials else "No project materials provided"}
-
-Please analyze and return the validation result in the specified JSON format."""
+        local_result = self._validate_locally(resume_text, project_materials)
+        if local_result is not None and local_result["confidence"] >= AGENT1_LOCAL_CONFIDENCE_THRESHOLD:
+            return local_result
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        try:
+            payload = self._build_payload(resume_text, project_materials)
+            result = chat_completion_sync(payload, timeout=self.timeout, agent_name="agent1")
+            return self._mark_llm_result(self._parse_completion(result), local_result)
         
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": AGENT1_INPUT_VALIDATION_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
-            "temperature": 0.1,
-            "max_tokens": 2000
-        }
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def avalidate_inputs(
+        self,
+        resume_text: str,
+        project_materials: Optional[str] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Async variant of validate_inputs using the shared async client.
+        
+        Args:
+            resume_text: Resume content text
+            project_materials: Optional project materials text
+            progress_callback: Optional callback for streamed progress updates
+        
+        Returns:
+            Dictionary with validation results
+        """
+        local_result = self._validate_locally(resume_text, project_materials)
+        if local_result is not None and local_result["confidence"] >= AGENT1_LOCAL_CONFIDENCE_THRESHOLD:
+            return local_result
         
         try:
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(self.endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                result = response.json()
-                
-                message_content = result["choices"][0]["message"]["content"]
-                validation_result = self._parse_json_response(message_content)
-                
-                return validation_result
+            payload = self._build_payload(resume_text, project_materials)
+            result = await chat_completion(
+                payload,
+                timeout=self.timeout,
+                agent_name="agent1",
+                progress_callback=progress_callback
+            )
+            return self._mark_llm_result(self._parse_completion(result), local_result)
         
         except Exception as e:
-            return {
-                "is_valid": False,
-                "error": str(e),
-                "validation_summary": f"Validation failed: {str(e)}"
-            }
+            return self._error_result(e)
+    
+    def _validate_locally(self, resume_text: str, project_materials: Optional[str]) -> Optional[Dict]:
+        """Run the rule-based validator; None if it is disabled or fails."""
+        if self.local_validator is None:
+            return None
+        try:
+            return self.local_validator.validate(resume_text, project_materials)
+        except Exception as e:
+            print(f"⚠️  Warning: local validation failed, using LLM: {e}")
+            return None
+    
+    def _mark_llm_result(self, result: Dict, local_result: Optional[Dict]) -> Dict:
+        """Tag an LLM validation result with its source and the local confidence."""
+        result["validation_source"] = "llm"
+        if local_result is not None:
+            result["local_confidence"] = local_result["confidence"]
+        return result
+    
+    def _build_payload(self, resume_text: str, project_materials: Optional[str]) -> Dict:
+        """Build the chat-completions payload for input validation."""
+        user_messages, max_tokens = fit_prompt(
+            "agent1",
+            self.model,
+            AGENT1_INPUT_VALIDATION_PROMPT,
+            {"resume_text": resume_text, "project_materials": project_materials},
+            self._render_user_messages,
+            max_tokens=2000,
+            trim_order=["project_materials", "resume_text"]
+        )
+        
+        return route_payload("agent1", {
+            "model": self.model,
+            "messages": build_messages(AGENT1_INPUT_VALIDATION_PROMPT, user_messages),
+            "temperature": 0.1,
+            "max_tokens": max_tokens
+        })
+    
+    def _render_user_messages(self, sections: Dict[str, str]) -> List[str]:
+        """Build the user messages from rendered prompt sections: shared context, then the request."""
+        return [
+            render_context(resume_text=sections["resume_text"]),
+            f"""Please validate the resume above and the following project materials:
+
+=== PROJECT MATERIALS ===
+{sections["project_materials"] if sections["project_materials"] else "No project materials provided"}
+
+Please analyze and return the validation result in the specified JSON format."""
+        ]
+    
+    def _parse_completion(self, result: Dict) -> Dict:
+        """Extract and parse the message content of a chat-completions response."""
+        message_content = result["choices"][0]["message"]["content"]
+        return self._parse_json_response(message_content)
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Build the fallback result returned when validation fails."""
+        return {
+            "is_valid": False,
+            "error": str(error),
+            "validation_summary": f"Validation failed: {str(error)}"
+        }
     
     def _parse_json_response(self, content: str) -> Dict:
         """Parse JSON response from LLM using enhanced parser."""
@@ -1,11 +1,54 @@
 """Agent 2: JD Analysis & Matching Assessment Agent."""
+import copy
 import json
 import re
-import httpx
-from typing import Dict, Optional
-from config import STUDENT_PORTAL_BASE_URL, STUDENT_PORTAL_API_KEY
+import time
+from typing import Callable, Dict, Optional, List
+from config import STUDENT_PORTAL_API_KEY, AGENT2_SECTIONED_ENABLED
 from agent_prompts import AGENT2_JD_ANALYSIS_PROMPT
+from context_projection import project_fields
 from json_parser_utils import parse_llm_json_response
+from llm_client import chat_completion, chat_completion_sync
+from model_router import route_payload
+from prompt_layout import build_messages, render_context
+from token_budget import fit_prompt
+from semantic_cache import get_semantic_cache, context_hash
+from workflow_dag import WorkflowDAG, WorkflowStage
+
+# Tasks of AGENT2_JD_ANALYSIS_PROMPT generated as separate calls in sectioned
+# mode: the output keys each produces and the sections whose results it
+# builds on. The JD and candidate analyses only read the inputs; matching and
+# recommendations compare the two.
+AGENT2_SECTIONS = {
+    "jd_analysis": {
+        "task": "Task 1: JD Deep Analysis & Ideal Candidate Profile",
+        "keys": ["job_role_team_analysis", "ideal_candidate_profile", "context_notes"],
+        "depends_on": [],
+        "max_tokens": 2000,
+    },
+    "candidate_analysis": {
+        "task": "Task 2: Candidate Profile Analysis",
+        "keys": ["candidate_profile", "resume_quality_issues"],
+        "depends_on": [],
+        "max_tokens": 2500,
+    },
+    "match_assessment": {
+        "task": "Task 3: Match Assessment & Scoring",
+        "keys": ["match_assessment"],
+        "depends_on": ["jd_analysis", "candidate_analysis"],
+        "max_tokens": 1200,
+    },
+    "recommendations": {
+        "task": "Task 4: Improvement Recommendations (ROI-Based)",
+        "keys": ["improvement_recommendations", "project_materials_recommendations"],
+        "depends_on": ["jd_analysis", "candidate_analysis"],
+        "max_tokens": 3000,
+    },
+}
+
+
+class AnalysisSectionError(Exception):
+    """Raised when one section of a sectioned JD analysis fails."""
 
 
 class JDAnalysisAgent:
@@ -18,10 +61,9 @@ class JDAnalysisAgent:
         Args:
             model: LLM model to use (default: "supermind-agent-v1" for complex analysis)
         """
-        self.base_url = STUDENT_PORTAL_BASE_URL
         self.api_key = STUDENT_PORTAL_API_KEY
         self.model = model
-        self.endpoint = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+        self.timeout = 180.0
         
         if not self.api_key:
             raise ValueError("STUDENT_PORTAL_API_KEY not set")
@@ -43,58 +85,288 @@ class JDAnalysisAgent:
         Returns:
             Dictionary with analysis results
         """
-        user_message = f"""Please analyze the following JD, resume, and project materials:
-
-=== JOB DESCRIPTION ===
-{jd_text}
-
-=== RESUME ===
-{resume_text}
-
-=== PROJECT MATERIALS ===
-{project_materials if project_materials else "No project materials provided"}
-
-Please provide comprehensive analysis in the specified JSON format."""
+        semantic_cache = get_semantic_cache()
+        candidate_text = self._candidate_text(resume_text, project_materials)
+        try:
+            payload = self._build_payload(jd_text, resume_text, project_materials)
+        except Exception as e:
+            return self._error_result(e)
+        # Cached analyses are keyed on the model the request is routed to
+        prompt_context = context_hash(payload["model"], AGENT2_JD_ANALYSIS_PROMPT)
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        match = semantic_cache.lookup(jd_text, candidate_text, prompt_context)
+        if match and match["reusable"]:
+            return copy.deepcopy(match["analysis"])
+        
+        try:
+            if match:
+                payload = self._build_payload(
+                    jd_text, resume_text, project_materials,
+                    warm_start=match["analysis"],
+                    model=payload["model"]
+                )
+            result = chat_completion_sync(payload, timeout=self.timeout, agent_name="agent2")
+            analysis = self._parse_completion(result)
+        
+        except Exception as e:
+            return self._error_result(e)
+        
+        if "error" not in analysis:
+            semantic_cache.store(jd_text, candidate_text, prompt_context, analysis)
+        return analysis
+    
+    async def aanalyze_jd_and_match(
+        self,
+        jd_text: str,
+        resume_text: str,
+        project_materials: Optional[str] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Async variant of analyze_jd_and_match using the shared async client.
+        
+        Args:
+            jd_text: Job description text
+            resume_text: Resume content text
+            project_materials: Optional project materials text
+            progress_callback: Optional callback for streamed progress updates
+        
+        Returns:
+            Dictionary with analysis results
+        """
+        semantic_cache = get_semantic_cache()
+        candidate_text = self._candidate_text(resume_text, project_materials)
+        try:
+            payload = self._build_payload(jd_text, resume_text, project_materials)
+        except Exception as e:
+            return self._error_result(e)
+        # Cached analyses are keyed on the model the request is routed to
+        model = payload["model"]
+        prompt_context = context_hash(model, AGENT2_JD_ANALYSIS_PROMPT)
+        
+        match = await semantic_cache.alookup(jd_text, candidate_text, prompt_context)
+        if match and match["reusable"]:
+            return copy.deepcopy(match["analysis"])
+        
+        warm_start = match["analysis"] if match else None
+        if AGENT2_SECTIONED_ENABLED:
+            analysis = await self.aanalyze_sectioned(
+                jd_text, resume_text, project_materials,
+                warm_start=warm_start,
+                progress_callback=progress_callback,
+                model=model
+            )
+        else:
+            try:
+                if warm_start:
+                    payload = self._build_payload(
+                        jd_text, resume_text, project_materials, warm_start=warm_start, model=model
+                    )
+                result = await chat_completion(
+                    payload,
+                    timeout=self.timeout,
+                    agent_name="agent2",
+                    progress_callback=progress_callback
+                )
+                analysis = self._parse_completion(result)
+            
+            except Exception as e:
+                return self._error_result(e)
+        
+        if "error" not in analysis:
+            await semantic_cache.astore(jd_text, candidate_text, prompt_context, analysis)
+        return analysis
+    
+    async def aanalyze_sectioned(
+        self,
+        jd_text: str,
+        resume_text: str,
+        project_materials: Optional[str] = None,
+        warm_start: Optional[Dict] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        model: Optional[str] = None
+    ) -> Dict:
+        """
+        Run the JD analysis as one call per task in AGENT2_SECTIONS.
+        
+        The JD and candidate analyses run concurrently; matching and
+        recommendations start once both are done and run concurrently with
+        each other. The sections are assembled into the single-call output.
+        
+        Args:
+            jd_text: Job description text
+            resume_text: Resume content text
+            project_materials: Optional project materials text
+            warm_start: Optional cached analysis of a near-identical input to revise
+            progress_callback: Optional callback, called as each section completes
+            model: Model for every section (default: each section is routed)
+        
+        Returns:
+            Dictionary with analysis results
+        """
+        started = time.monotonic()
+        completed: Dict[str, Dict] = {}
+        completion_tokens = [0]
+        
+        def make_run(name: str):
+            section = AGENT2_SECTIONS[name]
+            
+            async def run(inputs: Dict) -> Dict:
+                prior_analysis = {key: value for output in inputs.values() for key, value in output.items()}
+                payload = self._build_payload(
+                    jd_text, resume_text, project_materials,
+                    warm_start=project_fields(warm_start, section["keys"]) if warm_start else None,
+                    section=name,
+                    prior_analysis=prior_analysis or None,
+                    model=model
+                )
+                result = await chat_completion(payload, timeout=self.timeout, agent_name="agent2")
+                completion_tokens[0] += (result.get("usage") or {}).get("completion_tokens") or 0
+                output = self._parse_section(result, name)
+                completed[name] = output
+                if progress_callback is not None:
+                    progress_callback({
+                        "tokens": completion_tokens[0],
+                        "expected_tokens": None,
+                        "fraction": round(len(completed) / len(AGENT2_SECTIONS), 3),
+                        "elapsed_seconds": round(time.monotonic() - started, 1),
+                        "eta_seconds": None,
+                        "sections": output,
+                    })
+                return output
+            
+            return run
+        
+        dag = WorkflowDAG([
+            WorkflowStage(name, make_run(name), depends_on=section["depends_on"])
+            for name, section in AGENT2_SECTIONS.items()
+        ])
+        report = await dag.run()
+        if report["error"] is not None:
+            return self._error_result(report["error"])
+        
+        analysis: Dict = {}
+        for name in AGENT2_SECTIONS:
+            analysis.update(report["results"][name])
+        return analysis
+    
+    def _build_payload(
+        self,
+        jd_text: str,
+        resume_text: str,
+        project_materials: Optional[str],
+        warm_start: Optional[Dict] = None,
+        section: Optional[str] = None,
+        prior_analysis: Optional[Dict] = None,
+        model: Optional[str] = None
+    ) -> Dict:
+        """
+        Build the chat-completions payload for JD analysis.
+        
+        Args:
+            jd_text: Job description text
+            resume_text: Resume content text
+            project_materials: Optional project materials text
+            warm_start: Optional cached analysis of a near-identical input to revise
+            section: Name in AGENT2_SECTIONS to generate only that task (default: the whole analysis)
+            prior_analysis: Outputs of the sections the requested one builds on
+            model: Model already routed for this analysis; the payload is built
+                for it and not routed again (default: route from self.model)
+        
+        Returns:
+            Chat-completions request body
+        """
+        user_messages, max_tokens = fit_prompt(
+            "agent2",
+            model or self.model,
+            AGENT2_JD_ANALYSIS_PROMPT,
+            {
+                "jd_text": jd_text,
+                "resume_text": resume_text,
+                "project_materials": project_materials,
+                "warm_start": json.dumps(warm_start, ensure_ascii=False) if warm_start else None,
+                "prior_analysis": prior_analysis,
+                "instructions": self._instructions(section)
+            },
+            self._render_user_messages,
+            max_tokens=AGENT2_SECTIONS[section]["max_tokens"] if section else 6000,
+            trim_order=["warm_start", "prior_analysis", "project_materials", "resume_text", "jd_text"]
+        )
         
         payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": AGENT2_JD_ANALYSIS_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
+            "model": model or self.model,
+            "messages": build_messages(AGENT2_JD_ANALYSIS_PROMPT, user_messages),
             "temperature": 0.3,
-            "max_tokens": 6000
+            "max_tokens": max_tokens
         }
+        return payload if model else route_payload("agent2", payload)
+    
+    def _instructions(self, section: Optional[str]) -> str:
+        """Closing instructions of the user message for the whole analysis or one section."""
+        if section is None:
+            return "Please provide comprehensive analysis in the specified JSON format."
+        keys = AGENT2_SECTIONS[section]["keys"]
+        return (
+            f"Please perform only {AGENT2_SECTIONS[section]['task']}. "
+            f"Return a JSON object with only the {', '.join(keys)} key(s), in the specified JSON format."
+        )
+    
+    def _render_user_messages(self, sections: Dict[str, str]) -> List[str]:
+        """Build the user messages from rendered prompt sections: shared context, then the request."""
+        prior_analysis = ""
+        if sections["prior_analysis"]:
+            prior_analysis = f"""
+
+=== ANALYSIS COMPLETED SO FAR ===
+{sections["prior_analysis"]}"""
+        user_message = f"""Please analyze the JD and resume above, and the following project materials:
+
+=== PROJECT MATERIALS ===
+{sections["project_materials"] if sections["project_materials"] else "No project materials provided"}{prior_analysis}
+
+{sections["instructions"]}"""
         
-        try:
-            with httpx.Client(timeout=180.0) as client:
-                response = client.post(self.endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                result = response.json()
-                
-                message_content = result["choices"][0]["message"]["content"]
-                analysis_result = self._parse_json_response(message_content)
-                
-                return analysis_result
+        if sections["warm_start"]:
+            user_message += f"""
+
+=== PRIOR ANALYSIS OF A NEAR-IDENTICAL JD AND RESUME ===
+{sections["warm_start"]}
+
+Use the prior analysis as a starting point: keep what still applies and revise only what differs for the inputs above."""
+        return [render_context(sections["jd_text"], sections["resume_text"]), user_message]
+    
+    def _candidate_text(self, resume_text: str, project_materials: Optional[str]) -> str:
+        """Text describing the candidate side of the semantic cache key."""
+        return f"{resume_text}\n{project_materials or ''}"
+    
+    def _parse_completion(self, result: Dict) -> Dict:
+        """Extract and parse the message content of a chat-completions response."""
+        message_content = result["choices"][0]["message"]["content"]
+        return self._parse_json_response(message_content)
+    
+    def _parse_section(self, result: Dict, section: str) -> Dict:
+        """
+        Extract one section's output keys from a chat-completions response.
         
-        except Exception as e:
-            return {
-                "error": str(e),
-                "job_role_team_analysis": {},
-                "ideal_candidate_profile": {},
-                "match_assessment": {}
-            }
+        Raises:
+            AnalysisSectionError: If the response has none of the section's keys
+        """
+        parsed = self._parse_completion(result)
+        if not isinstance(parsed, dict) or "error" in parsed:
+            raise AnalysisSectionError(f"Section {section} returned no analysis")
+        output = {key: parsed[key] for key in AGENT2_SECTIONS[section]["keys"] if key in parsed}
+        if not output:
+            raise AnalysisSectionError(f"Section {section} returned none of {', '.join(AGENT2_SECTIONS[section]['keys'])}")
+        return output
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Build the fallback result returned when analysis fails."""
+        return {
+            "error": str(error),
+            "job_role_team_analysis": {},
+            "ideal_candidate_profile": {},
+            "match_assessment": {}
+        }
     
     def _parse_json_response(self, content: str) -> Dict:
         """Parse JSON response from LLM using enhanced parser."""
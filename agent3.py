@@ -1,11 +1,15 @@
 """Agent 3: Project Packaging Agent."""
 import json
 import re
-import httpx
-from typing import Dict, Optional
-from config import STUDENT_PORTAL_BASE_URL, STUDENT_PORTAL_API_KEY
+from typing import Callable, Dict, Optional, List
+from config import STUDENT_PORTAL_API_KEY
 from agent_prompts import AGENT3_PROJECT_PACKAGING_PROMPT
+from context_projection import project_context
 from json_parser_utils import parse_llm_json_response
+from llm_client import chat_completion, chat_completion_sync
+from model_router import route_payload
+from prompt_layout import build_messages, render_context
+from token_budget import fit_prompt
 
 
 class ProjectPackagingAgent:
@@ -18,10 +22,9 @@ class ProjectPackagingAgent:
         Args:
             model: LLM model to use (default: "supermind-agent-v1" for complex analysis)
         """
-        self.base_url = STUDENT_PORTAL_BASE_URL
         self.api_key = STUDENT_PORTAL_API_KEY
         self.model = model
-        self.endpoint = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+        self.timeout = 180.0
         
         if not self.api_key:
             raise ValueError("STUDENT_PORTAL_API_KEY not set")
@@ -43,57 +46,97 @@ class ProjectPackagingAgent:
         Returns:
             Dictionary with packaged projects
         """
-        user_message = f"""Please package and optimize the following projects:
-
-=== JOB DESCRIPTION ===
-{jd_text}
+        try:
+            payload = self._build_payload(jd_text, project_materials, agent2_outputs)
+            result = chat_completion_sync(payload, timeout=self.timeout, agent_name="agent3")
+            return self._parse_completion(result)
+        
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def apackage_projects(
+        self,
+        jd_text: str,
+        project_materials: str,
+        agent2_outputs: Dict,
+        progress_callback: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Async variant of package_projects using the shared async client.
+        
+        Args:
+            jd_text: Job description text
+            project_materials: Project materials text
+            agent2_outputs: Agent 2 analysis outputs
+            progress_callback: Optional callback for streamed progress updates
+        
+        Returns:
+            Dictionary with packaged projects
+        """
+        try:
+            payload = self._build_payload(jd_text, project_materials, agent2_outputs)
+            result = await chat_completion(
+                payload,
+                timeout=self.timeout,
+                agent_name="agent3",
+                progress_callback=progress_callback
+            )
+            return self._parse_completion(result)
+        
+        except Exception as e:
+            return self._error_result(e)
+    
+    def _build_payload(
+        self,
+        jd_text: str,
+        project_materials: str,
+        agent2_outputs: Dict
+    ) -> Dict:
+        """Build the chat-completions payload for project packaging."""
+        user_messages, max_tokens = fit_prompt(
+            "agent3",
+            self.model,
+            AGENT3_PROJECT_PACKAGING_PROMPT,
+            {"jd_text": jd_text, "project_materials": project_materials, "agent2_outputs": project_context("agent3", "agent2_outputs", agent2_outputs)},
+            self._render_user_messages,
+            max_tokens=5000,
+            trim_order=["agent2_outputs", "jd_text", "project_materials"]
+        )
+        
+        return route_payload("agent3", {
+            "model": self.model,
+            "messages": build_messages(AGENT3_PROJECT_PACKAGING_PROMPT, user_messages),
+            "temperature": 0.3,
+            "max_tokens": max_tokens
+        })
+    
+    def _render_user_messages(self, sections: Dict[str, str]) -> List[str]:
+        """Build the user messages from rendered prompt sections: shared context, then the request."""
+        return [
+            render_context(jd_text=sections["jd_text"]),
+            f"""Please package and optimize the following projects for the JD above:
 
 === PROJECT MATERIALS ===
-{project_materials}
+{sections["project_materials"]}
 
 === AGENT 2 ANALYSIS ===
-{json.dumps(agent2_outputs, indent=2, ensure_ascii=False)}
+{sections["agent2_outputs"]}
 
 Please provide optimized projects in the specified JSON format."""
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": AGENT3_PROJECT_PACKAGING_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
-            "temperature": 0.3,
-            "max_tokens": 5000
+        ]
+    
+    def _parse_completion(self, result: Dict) -> Dict:
+        """Extract and parse the message content of a chat-completions response."""
+        message_content = result["choices"][0]["message"]["content"]
+        return self._parse_json_response(message_content)
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Build the fallback result returned when packaging fails."""
+        return {
+            "error": str(error),
+            "selected_projects": [],
+            "skipped_projects": []
         }
-        
-        try:
-            with httpx.Client(timeout=180.0) as client:
-                response = client.post(self.endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                result = response.json()
-                
-                message_content = result["choices"][0]["message"]["content"]
-                packaged_projects = self._parse_json_response(message_content)
-                
-                return packaged_projects
-        
-        except Exception as e:
-            return {
-                "error": str(e),
-                "selected_projects": [],
-                "skipped_projects": []
-            }
     
     def _parse_json_response(self, content: str) -> Dict:
         """Parse JSON response from LLM using enhanced parser."""
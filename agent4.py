@@ -2,10 +2,15 @@
 import json
 import re
 import httpx
-from typing import Dict, Optional, List
-from config import STUDENT_PORTAL_BASE_URL, STUDENT_PORTAL_API_KEY
+from typing import Callable, Dict, Optional, List
+from config import STUDENT_PORTAL_API_KEY
 from agent_prompts import AGENT4_RESUME_OPTIMIZATION_PROMPT
+from context_projection import project_context
 from json_parser_utils import parse_llm_json_response
+from llm_client import chat_completion, chat_completion_sync
+from model_router import route_payload
+from prompt_layout import build_messages, render_context
+from token_budget import fit_prompt
 
 
 class ResumeOptimizationAgent:
@@ -18,10 +23,9 @@ class ResumeOptimizationAgent:
         Args:
             model: LLM model to use (default: "supermind-agent-v1" for complex analysis)
         """
-        self.base_url = STUDENT_PORTAL_BASE_URL
         self.api_key = STUDENT_PORTAL_API_KEY
         self.model = model
-        self.endpoint = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+        self.timeout = 120.0
         
         if not self.api_key:
             raise ValueError("STUDENT_PORTAL_API_KEY not set")
@@ -51,82 +55,121 @@ class ResumeOptimizationAgent:
         Returns:
             Dictionary with resume optimization recommendations
         """
-        # Build user message
-        user_message = f"""Please optimize the following resume based on the JD, Agent 2 analysis, and Agent 3 optimized projects:
-
-=== JOB DESCRIPTION ===
-{jd_text}
-
-=== CURRENT RESUME ===
-{resume_text}
+        try:
+            payload = self._build_payload(jd_text, resume_text, agent2_outputs, agent3_outputs)
+            result = chat_completion_sync(payload, timeout=self.timeout, agent_name="agent4")
+            return self._parse_completion(result)
+        
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def aoptimize_resume(
+        self,
+        jd_text: str,
+        resume_text: str,
+        agent2_outputs: Dict,
+        agent3_outputs: Dict,
+        progress_callback: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Async variant of optimize_resume using the shared async client.
+        
+        Args:
+            jd_text: Job description text
+            resume_text: Current resume text
+            agent2_outputs: Complete Agent 2 analysis output
+            agent3_outputs: Complete Agent 3 output
+            progress_callback: Optional callback for streamed progress updates
+        
+        Returns:
+            Dictionary with resume optimization recommendations
+        """
+        try:
+            payload = self._build_payload(jd_text, resume_text, agent2_outputs, agent3_outputs)
+            result = await chat_completion(
+                payload,
+                timeout=self.timeout,
+                agent_name="agent4",
+                progress_callback=progress_callback
+            )
+            return self._parse_completion(result)
+        
+        except Exception as e:
+            return self._error_result(e)
+    
+    def _build_payload(
+        self,
+        jd_text: str,
+        resume_text: str,
+        agent2_outputs: Dict,
+        agent3_outputs: Dict
+    ) -> Dict:
+        """Build the chat-completions payload for resume optimization."""
+        # Build user message within the model's token budget
+        user_messages, max_tokens = fit_prompt(
+            "agent4",
+            self.model,
+            AGENT4_RESUME_OPTIMIZATION_PROMPT,
+            {
+                "jd_text": jd_text,
+                "resume_text": resume_text,
+                "agent2_outputs": project_context("agent4", "agent2_outputs", agent2_outputs),
+                "agent3_outputs": project_context("agent4", "agent3_outputs", agent3_outputs)
+            },
+            self._render_user_messages,
+            max_tokens=4000,
+            trim_order=["agent2_outputs", "agent3_outputs", "jd_text", "resume_text"]
+        )
+        
+        return route_payload("agent4", {
+            "model": self.model,
+            "messages": build_messages(AGENT4_RESUME_OPTIMIZATION_PROMPT, user_messages),
+            "temperature": 0.3,
+            "max_tokens": max_tokens
+        })
+    
+    def _render_user_messages(self, sections: Dict[str, str]) -> List[str]:
+        """Build the user messages from rendered prompt sections: shared context, then the request."""
+        return [
+            render_context(sections["jd_text"], sections["resume_text"]),
+            f"""Please optimize the current resume above based on the JD, Agent 2 analysis, and Agent 3 optimized projects:
 
 === AGENT 2 ANALYSIS OUTPUTS ===
-{json.dumps(agent2_outputs, indent=2, ensure_ascii=False)}
+{sections["agent2_outputs"]}
 
 === AGENT 3 OPTIMIZED PROJECTS ===
-{json.dumps(agent3_outputs, indent=2, ensure_ascii=False)}
+{sections["agent3_outputs"]}
 
 Please analyze the resume and provide optimization recommendations in the specified JSON format."""
+        ]
+    
+    def _parse_completion(self, result: Dict) -> Dict:
+        """Extract and parse the message content of a chat-completions response."""
+        # Extract message content
+        message_content = result["choices"][0]["message"]["content"]
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": AGENT4_RESUME_OPTIMIZATION_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
-            "temperature": 0.3,
-            "max_tokens": 4000
-        }
+        # Parse JSON response
+        return self._parse_json_response(message_content)
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Build the fallback result returned when optimization fails."""
+        if isinstance(error, httpx.HTTPError):
+            message = f"HTTP error during resume optimization: {str(error)}"
+        else:
+            message = f"Error during resume optimization: {str(error)}"
         
-        try:
-            with httpx.Client(timeout=120.0) as client:
-                response = client.post(self.endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                result = response.json()
-                
-                # Extract message content
-                message_content = result["choices"][0]["message"]["content"]
-                
-                # Parse JSON response
-                return self._parse_json_response(message_content)
-                
-        except httpx.HTTPError as e:
-            return {
-                "error": f"HTTP error during resume optimization: {str(e)}",
-                "experience_replacements": [],
-                "format_content_adjustments": [],
-                "optimization_summary": {
-                    "total_experiences_analyzed": 0,
-                    "experiences_recommended_for_replacement": 0,
-                    "total_adjustments_suggested": 0,
-                    "expected_match_score_improvement": "0.0 points",
-                    "key_improvements": []
-                }
-            }
-        except Exception as e:
-            return {
-                "error": f"Error during resume optimization: {str(e)}",
-                "experience_replacements": [],
-                "format_content_adjustments": [],
-                "optimization_summary": {
-                    "total_experiences_analyzed": 0,
-                    "experiences_recommended_for_replacement": 0,
-                    "total_adjustments_suggested": 0,
-                    "expected_match_score_improvement": "0.0 points",
-                    "key_improvements": []
-                }
+        return {
+            "error": message,
+            "experience_replacements": [],
+            "format_content_adjustments": [],
+            "optimization_summary": {
+                "total_experiences_analyzed": 0,
+                "experiences_recommended_for_replacement": 0,
+                "total_adjustments_suggested": 0,
+                "expected_match_score_improvement": "0.0 points",
+                "key_improvements": []
             }
+        }
     
     def _parse_json_response(self, content: str) -> Dict:
         """
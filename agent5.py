@@ -1,11 +1,42 @@
 """Agent 5: Interview Preparation Assistant."""
+import asyncio
 import json
 import re
 import httpx
-from typing import Dict, Optional, List
-from config import STUDENT_PORTAL_BASE_URL, STUDENT_PORTAL_API_KEY
+from typing import Callable, Dict, Optional, List
+from config import STUDENT_PORTAL_API_KEY, AGENT5_PARALLEL_ENABLED, AGENT5_DEEP_DIVE_PROJECTS
 from agent_prompts import AGENT5_INTERVIEW_PREPARATION_PROMPT
+from context_projection import project_context
 from json_parser_utils import parse_llm_json_response
+from llm_client import chat_completion, chat_completion_sync
+from model_router import route_payload
+from prompt_layout import build_messages, render_context
+from token_budget import fit_prompt
+
+# Themes of the interview preparation output and the instruction for each
+THEME_INSTRUCTIONS = {
+    "theme_1_behavioral_interview": "Behavioral Interview Questions (Self-introduction, Storytelling example, Top 10 Behavioral Questions)",
+    "theme_2_project_deep_dive": "Project Deep-Dive Questions (Top 3 Projects with technical detail questions)",
+    "theme_3_business_domain": "Business Domain Questions (10 business-related questions)",
+}
+
+# Themes built only from the JD and Agent 2 outputs, so they can be generated
+# before the final resume exists
+RESUME_INDEPENDENT_THEMES = ["theme_3_business_domain"]
+
+# Completion budget of a request covering only some themes
+THEME_MAX_TOKENS = {
+    "theme_1_behavioral_interview": 2500,
+    "theme_2_project_deep_dive": 2500,
+    "theme_3_business_domain": 1500,
+    "preparation_summary": 300,
+}
+
+# Completion budget of one project's deep dive in parallel mode
+PROJECT_DEEP_DIVE_MAX_TOKENS = 1200
+
+# Calls made for a part in parallel mode before it is reported as failed
+PART_ATTEMPTS = 2
 
 
 class InterviewPreparationAgent:
@@ -18,10 +49,9 @@ class InterviewPreparationAgent:
         Args:
             model: LLM model to use (default: "supermind-agent-v1" for complex analysis)
         """
-        self.base_url = STUDENT_PORTAL_BASE_URL
         self.api_key = STUDENT_PORTAL_API_KEY
         self.model = model
-        self.endpoint = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+        self.timeout = 180.0
         
         if not self.api_key:
             raise ValueError("STUDENT_PORTAL_API_KEY not set")
@@ -49,90 +79,446 @@ class InterviewPreparationAgent:
         Returns:
             Dictionary with interview preparation materials
         """
-        # Extract classified projects from Agent 4 outputs
-        classified_projects = agent4_outputs.get("classified_projects", {
-            "resume_adopted_projects": [],
-            "resume_not_adopted_projects": []
-        })
+        try:
+            payload = self._build_payload(jd_text, final_resume, agent2_outputs, agent4_outputs)
+            result = chat_completion_sync(payload, timeout=self.timeout, agent_name="agent5")
+            return self._parse_completion(result)
         
-        # Build user message
-        user_message = f"""Please generate comprehensive interview preparation materials based on the following:
-
-=== JOB DESCRIPTION ===
-{jd_text}
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def aprepare_interview(
+        self,
+        jd_text: str,
+        final_resume: str,
+        agent2_outputs: Dict,
+        agent4_outputs: Dict,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        precomputed_sections: Optional[Dict] = None,
+        part_callback: Optional[Callable[[str, Dict], None]] = None
+    ) -> Dict:
+        """
+        Async variant of prepare_interview using the shared async client.
+        
+        Args:
+            jd_text: Job description text
+            final_resume: Final optimized resume after all modifications
+            agent2_outputs: Complete Agent 2 analysis output
+            agent4_outputs: Complete Agent 4 output including classified_projects
+            progress_callback: Optional callback for streamed progress updates; in
+                parallel mode each update names its part under "part"
+            precomputed_sections: Themes generated ahead of time (e.g. by
+                agenerate_sections); only the remaining themes are requested
+            part_callback: Called with (part name, part result) as each
+                concurrent call finishes (AGENT5_PARALLEL_ENABLED only)
+        
+        Returns:
+            Dictionary with interview preparation materials
+        """
+        precomputed = {
+            key: value for key, value in (precomputed_sections or {}).items()
+            if key in THEME_INSTRUCTIONS and value
+        }
+        if AGENT5_PARALLEL_ENABLED:
+            return await self.aprepare_interview_parallel(
+                jd_text, final_resume, agent2_outputs, agent4_outputs,
+                precomputed_sections=precomputed,
+                progress_callback=progress_callback,
+                part_callback=part_callback
+            )
+        if not precomputed:
+            try:
+                payload = self._build_payload(jd_text, final_resume, agent2_outputs, agent4_outputs)
+                result = await chat_completion(
+                    payload,
+                    timeout=self.timeout,
+                    agent_name="agent5",
+                    progress_callback=progress_callback
+                )
+                return self._parse_completion(result)
+            
+            except Exception as e:
+                return self._error_result(e)
+        
+        remaining = [key for key in THEME_INSTRUCTIONS if key not in precomputed]
+        generated = {}
+        if remaining:
+            generated = await self.agenerate_sections(
+                jd_text,
+                agent2_outputs,
+                remaining + ["preparation_summary"],
+                final_resume=final_resume,
+                agent4_outputs=agent4_outputs,
+                progress_callback=progress_callback
+            )
+        return self._merge_sections(generated, precomputed)
+    
+    async def aprepare_interview_parallel(
+        self,
+        jd_text: str,
+        final_resume: str,
+        agent2_outputs: Dict,
+        agent4_outputs: Dict,
+        precomputed_sections: Optional[Dict] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        part_callback: Optional[Callable[[str, Dict], None]] = None
+    ) -> Dict:
+        """
+        Generate the interview preparation as concurrent calls.
+        
+        One call covers the behavioral theme (and the preparation focus
+        areas), one the business domain, and one each deep-dive project, so
+        the wall time is that of the longest part instead of the whole output.
+        A failed part is requested again, up to PART_ATTEMPTS calls.
+        
+        Args:
+            jd_text: Job description text
+            final_resume: Final optimized resume after all modifications
+            agent2_outputs: Complete Agent 2 analysis output
+            agent4_outputs: Complete Agent 4 output including classified_projects
+            precomputed_sections: Themes generated ahead of time, not requested again
+            progress_callback: Optional callback for each part's streamed
+                progress updates, with the part's name under "part"
+            part_callback: Called with (part name, part result) as each part finishes
+        
+        Returns:
+            Dictionary with interview preparation materials. If parts still
+            failed, their defaults are filled in, "partial" is True and the
+            errors are listed under "part_errors"; if all failed, "error" is set.
+        """
+        precomputed = precomputed_sections or {}
+        parts = self.plan_parts(agent4_outputs, precomputed)
+        
+        async def run_part(name: str, request: Dict) -> Dict:
+            part_progress = None
+            if progress_callback is not None:
+                def part_progress(update: Dict) -> None:
+                    progress_callback({**update, "part": name})
+            
+            for attempt in range(1, PART_ATTEMPTS + 1):
+                result = await self.agenerate_sections(
+                    jd_text,
+                    agent2_outputs,
+                    request["sections"],
+                    final_resume=final_resume,
+                    agent4_outputs=request.get("agent4_outputs", agent4_outputs),
+                    progress_callback=part_progress,
+                    instructions=request.get("instructions"),
+                    max_tokens=request.get("max_tokens")
+                )
+                if "error" not in result and "parse_error" not in result:
+                    break
+                if attempt < PART_ATTEMPTS:
+                    print(f"⚠️  Warning: Interview preparation part {name} failed, retrying: "
+                          f"{result.get('error') or result.get('parse_error')}")
+            if part_callback is not None:
+                part_callback(name, result)
+            return result
+        
+        results = await asyncio.gather(*(run_part(name, request) for name, request in parts.items()))
+        
+        generated: Dict = {}
+        part_errors = {}
+        for name, result in zip(parts, results):
+            if "error" in result or "parse_error" in result:
+                part_errors[name] = result.get("error") or result.get("parse_error")
+            for key, value in result.items():
+                if key not in parts[name]["sections"]:
+                    continue
+                if key == "theme_2_project_deep_dive":
+                    projects = generated.setdefault(key, {"selected_projects": []})["selected_projects"]
+                    projects.extend(value.get("selected_projects", []))
+                else:
+                    generated[key] = value
+        
+        interview_prep = self._merge_sections(generated, precomputed)
+        if part_errors:
+            interview_prep["partial"] = True
+            interview_prep["part_errors"] = part_errors
+            if len(part_errors) == len(parts):
+                interview_prep["error"] = next(iter(part_errors.values()))
+        return interview_prep
+    
+    def plan_parts(self, agent4_outputs: Dict, precomputed: Dict) -> Dict[str, Dict]:
+        """
+        Split the interview preparation into independent requests.
+        
+        Args:
+            agent4_outputs: Agent 4 output including classified_projects
+            precomputed: Themes that are already generated
+        
+        Returns:
+            Requests by part name, each with "sections" and optionally
+            "agent4_outputs", "instructions" and "max_tokens"
+        """
+        parts: Dict[str, Dict] = {}
+        if "theme_1_behavioral_interview" not in precomputed:
+            parts["behavioral"] = {"sections": ["theme_1_behavioral_interview", "preparation_summary"]}
+        if "theme_3_business_domain" not in precomputed:
+            parts["business_domain"] = {"sections": ["theme_3_business_domain"], "agent4_outputs": None}
+        if "theme_2_project_deep_dive" in precomputed:
+            return parts
+        
+        classified_projects = agent4_outputs.get("classified_projects", {})
+        adopted = classified_projects.get("resume_adopted_projects", [])[:AGENT5_DEEP_DIVE_PROJECTS]
+        for position, project in enumerate(adopted):
+            name = project.get("project_name") or f"project {position + 1}"
+            parts[f"project_{project.get('project_index', position)}"] = {
+                "sections": ["theme_2_project_deep_dive"],
+                "agent4_outputs": {"classified_projects": {"resume_adopted_projects": [project]}},
+                "instructions": (
+                    f"Please generate only the Project Deep-Dive Questions for the project \"{name}\" "
+                    f"(project_index {project.get('project_index', position)}, from resume_adopted_projects), "
+                    "with its STAR overview and 5 technical deep-dive questions.\n\n"
+                    "Return a JSON object with only the theme_2_project_deep_dive key, whose "
+                    "selected_projects list holds this one project, in the specified JSON format."
+                ),
+                "max_tokens": PROJECT_DEEP_DIVE_MAX_TOKENS,
+            }
+        
+        missing = AGENT5_DEEP_DIVE_PROJECTS - len(adopted)
+        if missing > 0:
+            # Fallback of the prompt: supplement with detailed resume experiences
+            exclude = ", ".join(f"\"{p.get('project_name')}\"" for p in adopted if p.get("project_name"))
+            parts["resume_experiences"] = {
+                "sections": ["theme_2_project_deep_dive"],
+                "agent4_outputs": None,
+                "instructions": (
+                    f"Please generate only the Project Deep-Dive Questions for the {missing} most relevant "
+                    "detailed experiences from the resume (source \"resume_experience\")"
+                    + (f", other than {exclude}" if exclude else "")
+                    + ", each with its STAR overview and 5 technical deep-dive questions.\n\n"
+                    "Return a JSON object with only the theme_2_project_deep_dive key, in the specified JSON format."
+                ),
+                "max_tokens": PROJECT_DEEP_DIVE_MAX_TOKENS * missing,
+            }
+        return parts
+    
+    async def agenerate_sections(
+        self,
+        jd_text: str,
+        agent2_outputs: Dict,
+        sections: List[str],
+        final_resume: Optional[str] = None,
+        agent4_outputs: Optional[Dict] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        instructions: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict:
+        """
+        Generate only some sections of the interview preparation.
+        
+        Resume-independent themes (RESUME_INDEPENDENT_THEMES) need only the JD
+        and Agent 2 outputs, so they can run before the final resume exists.
+        
+        Args:
+            jd_text: Job description text
+            agent2_outputs: Complete Agent 2 analysis output
+            sections: Output keys to generate (themes and/or "preparation_summary")
+            final_resume: Final optimized resume, if the sections need it
+            agent4_outputs: Agent 4 output with classified_projects, if the sections need it
+            progress_callback: Optional callback for streamed progress updates
+            instructions: Request text replacing the default one for the sections
+            max_tokens: Completion budget replacing the per-theme default
+        
+        Returns:
+            Dictionary with the generated sections, or an "error" key; a
+            "parse_error" key if the response lacks any of the sections
+        """
+        try:
+            payload = self._build_payload(
+                jd_text, final_resume, agent2_outputs, agent4_outputs,
+                sections=sections, instructions=instructions, max_tokens=max_tokens
+            )
+            result = await chat_completion(
+                payload,
+                timeout=self.timeout,
+                agent_name="agent5",
+                progress_callback=progress_callback
+            )
+            return self._parse_sections(result, sections)
+        
+        except Exception as e:
+            print(f"⚠️  Warning: Error generating interview preparation sections: {str(e)}")
+            return {"error": str(e)}
+    
+    def _build_payload(
+        self,
+        jd_text: str,
+        final_resume: Optional[str],
+        agent2_outputs: Dict,
+        agent4_outputs: Optional[Dict],
+        sections: Optional[List[str]] = None,
+        instructions: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict:
+        """
+        Build the chat-completions payload for interview preparation.
+        
+        Args:
+            jd_text: Job description text
+            final_resume: Final optimized resume (None for resume-independent sections)
+            agent2_outputs: Complete Agent 2 analysis output
+            agent4_outputs: Agent 4 output with classified_projects (None for resume-independent sections)
+            sections: Output keys to request (default: the complete preparation)
+            instructions: Request text replacing the default one for the sections
+            max_tokens: Completion budget (default: derived from the sections)
+        
+        Returns:
+            Chat-completions request body
+        """
+        classified_projects = None
+        if agent4_outputs is not None:
+            # Extract classified projects from Agent 4 outputs
+            classified_projects = agent4_outputs.get("classified_projects", {
+                "resume_adopted_projects": [],
+                "resume_not_adopted_projects": []
+            })
+        
+        if max_tokens is None and sections is None:
+            max_tokens = 6000  # Longer response needed for comprehensive interview prep
+        elif max_tokens is None:
+            max_tokens = min(6000, sum(THEME_MAX_TOKENS.get(key, 1500) for key in sections))
+        
+        # Build user message within the model's token budget
+        user_messages, max_tokens = fit_prompt(
+            "agent5",
+            self.model,
+            AGENT5_INTERVIEW_PREPARATION_PROMPT,
+            {
+                "jd_text": jd_text,
+                "final_resume": final_resume,
+                "agent2_outputs": project_context("agent5", "agent2_outputs", agent2_outputs),
+                "classified_projects": project_context("agent5", "classified_projects", classified_projects),
+                "instructions": instructions or self._instructions(sections)
+            },
+            self._render_user_messages,
+            max_tokens=max_tokens,
+            trim_order=["agent2_outputs", "classified_projects", "jd_text", "final_resume"]
+        )
+        
+        return route_payload("agent5", {
+            "model": self.model,
+            "messages": build_messages(AGENT5_INTERVIEW_PREPARATION_PROMPT, user_messages),
+            "temperature": 0.3,
+            "max_tokens": max_tokens
+        })
+    
+    def _instructions(self, sections: Optional[List[str]]) -> str:
+        """Closing instructions of the user message for the requested sections."""
+        if sections is None:
+            themes = "\n".join(f"{i}. {text}" for i, text in enumerate(THEME_INSTRUCTIONS.values(), 1))
+            return f"""Please generate interview preparation materials covering:
+{themes}
 
-=== FINAL OPTIMIZED RESUME ===
-{final_resume}
+Provide all content in the specified JSON format."""
+        
+        themes = "\n".join(
+            f"{i}. {THEME_INSTRUCTIONS[key]}"
+            for i, key in enumerate([k for k in sections if k in THEME_INSTRUCTIONS], 1)
+        )
+        return f"""Please generate only the following part of the interview preparation materials:
+{themes}
 
-=== AGENT 2 ANALYSIS OUTPUTS ===
-{json.dumps(agent2_outputs, indent=2, ensure_ascii=False)}
+Return a JSON object with only the {", ".join(sections)} key(s), in the specified JSON format."""
+    
+    def _render_user_messages(self, sections: Dict[str, str]) -> List[str]:
+        """Build the user messages from rendered prompt sections: shared context, then the request."""
+        subject = "the JD and final optimized resume above" if sections["final_resume"] else "the JD above"
+        projects = ""
+        if sections["classified_projects"]:
+            projects = f"""
 
 === AGENT 4 CLASSIFIED PROJECTS ===
-{json.dumps(classified_projects, indent=2, ensure_ascii=False)}
+{sections["classified_projects"]}"""
+        return [
+            render_context(sections["jd_text"], sections["final_resume"] or None),
+            f"""Please generate comprehensive interview preparation materials for {subject}, based on the following:
 
-Please generate interview preparation materials covering:
-1. Behavioral Interview Questions (Self-introduction, Storytelling example, Top 10 Behavioral Questions)
-2. Project Deep-Dive Questions (Top 3 Projects with technical detail questions)
-3. Business Domain Questions (10 business-related questions)
+=== AGENT 2 ANALYSIS OUTPUTS ===
+{sections["agent2_outputs"]}{projects}
 
-Provide all content in the specified JSON format."""
+{sections["instructions"]}"""
+        ]
+    
+    def _parse_completion(self, result: Dict) -> Dict:
+        """Extract, parse and complete the message content of a chat-completions response."""
+        # Extract message content
+        message_content = result["choices"][0]["message"]["content"]
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # Check if response contains actual JSON (not just handoff tags)
+        if not re.search(r'\{[^{}]*\}', message_content, re.DOTALL):
+            # No JSON found, return default structure
+            print("⚠️  Warning: Agent 5 response contains no JSON, returning default structure")
+            return self._ensure_required_fields({})
         
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": AGENT5_INTERVIEW_PREPARATION_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
-            "temperature": 0.3,
-            "max_tokens": 6000  # Longer response needed for comprehensive interview prep
-        }
+        # Parse JSON response
+        try:
+            interview_prep = self._parse_json_response(message_content)
+            # Ensure required fields
+            interview_prep = self._ensure_required_fields(interview_prep)
+            return interview_prep
+        except Exception as parse_error:
+            print(f"⚠️  Warning: Failed to parse Agent 5 JSON: {str(parse_error)}")
+            print("   Returning default structure with error message")
+            default_prep = self._ensure_required_fields({})
+            default_prep["parse_error"] = str(parse_error)
+            default_prep["raw_response_preview"] = message_content[:500]
+            return default_prep
+    
+    def _parse_sections(self, result: Dict, sections: List[str]) -> Dict:
+        """
+        Extract the requested sections from a chat-completions response.
         
+        Returns:
+            The sections; if the response is not JSON or any section is missing
+            or not an object, "parse_error" and a preview of the response,
+            alongside the sections that were returned
+        """
+        message_content = result["choices"][0]["message"]["content"]
         try:
-            with httpx.Client(timeout=180.0) as client:
-                response = client.post(self.endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                result = response.json()
-                
-                # Extract message content
-                message_content = result["choices"][0]["message"]["content"]
-                
-                # Check if response contains actual JSON (not just handoff tags)
-                if not re.search(r'\{[^{}]*\}', message_content, re.DOTALL):
-                    # No JSON found, return default structure
-                    print("⚠️  Warning: Agent 5 response contains no JSON, returning default structure")
-                    return self._ensure_required_fields({})
-                
-                # Parse JSON response
-                try:
-                    interview_prep = self._parse_json_response(message_content)
-                    # Ensure required fields
-                    interview_prep = self._ensure_required_fields(interview_prep)
-                    return interview_prep
-                except Exception as parse_error:
-                    print(f"⚠️  Warning: Failed to parse Agent 5 JSON: {str(parse_error)}")
-                    print("   Returning default structure with error message")
-                    default_prep = self._ensure_required_fields({})
-                    default_prep["parse_error"] = str(parse_error)
-                    default_prep["raw_response_preview"] = message_content[:500]
-                    return default_prep
-        
-        except httpx.HTTPStatusError as e:
-            print(f"⚠️  Warning: API request failed: {e.response.status_code}")
-            return self._ensure_required_fields({"api_error": str(e)})
-        except Exception as e:
-            print(f"⚠️  Warning: Error generating interview preparation: {str(e)}")
-            return self._ensure_required_fields({"error": str(e)})
+            parsed = self._parse_json_response(message_content)
+        except Exception as parse_error:
+            print(f"⚠️  Warning: Failed to parse Agent 5 JSON: {str(parse_error)}")
+            return {"parse_error": str(parse_error), "raw_response_preview": message_content[:500]}
+        if not isinstance(parsed, dict):
+            return {"parse_error": "Response is not a JSON object", "raw_response_preview": message_content[:500]}
+        found = {key: parsed[key] for key in sections if isinstance(parsed.get(key), dict)}
+        missing = [key for key in sections if key not in found]
+        if missing:
+            return {
+                **found,
+                "parse_error": f"Response is missing sections: {', '.join(missing)}",
+                "raw_response_preview": message_content[:500]
+            }
+        return found
+    
+    def _merge_sections(self, generated: Dict, precomputed: Dict) -> Dict:
+        """
+        Combine separately generated sections into one preparation.
+        
+        Args:
+            generated: Sections from the final request (may carry error keys)
+            precomputed: Sections generated ahead of time
+        
+        Returns:
+            Dictionary with all required fields
+        """
+        interview_prep = {**generated, **precomputed}
+        # The summary counts cover every theme, so rebuild them from the merged result
+        summary = interview_prep.pop("preparation_summary", None) or {}
+        interview_prep = self._ensure_required_fields(interview_prep)
+        if summary.get("key_preparation_focus_areas"):
+            interview_prep["preparation_summary"]["key_preparation_focus_areas"] = summary["key_preparation_focus_areas"]
+        return interview_prep
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Build the default-structure result returned when the request fails."""
+        if isinstance(error, httpx.HTTPStatusError):
+            print(f"⚠️  Warning: API request failed: {error.response.status_code}")
+            return self._ensure_required_fields({"api_error": str(error)})
+        print(f"⚠️  Warning: Error generating interview preparation: {str(error)}")
+        return self._ensure_required_fields({"error": str(error)})
     
     def _parse_json_response(self, content: str) -> Dict:
         """
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Offline batch runs of the workflow over many (resume, JD, projects) inputs.
+
+A run lives in its own directory and advances stage by stage (Agent 1 -> 4).
+Each stage writes its chat-completion requests as a JSONL batch in the
+OpenAI batch format, submits them through an upstream batch endpoint or a
+local queue drained at the rate limiter's pace, then parses the responses
+with the agents' own parsers. Every response and parsed output is appended
+to the run directory as it arrives, so an interrupted run resumes where it
+stopped.
+
+Usage:
+    python batch_runner.py start inputs.jsonl [--run-dir DIR] [--submitter local|batch_api]
+    python batch_runner.py resume RUN_DIR
+    python batch_runner.py status RUN_DIR
+
+Each input line is {"id": optional, "jd_text": ..., "resume_text": ..., "projects_text": optional}.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from config import (
+    STUDENT_PORTAL_BASE_URL,
+    STUDENT_PORTAL_API_KEY,
+    AGENT1_LOCAL_CONFIDENCE_THRESHOLD,
+    LLM_BATCH_API_ENABLED,
+    LLM_BATCH_COMPLETION_WINDOW,
+    LLM_BATCH_POLL_INTERVAL,
+    LLM_BATCH_CONCURRENCY,
+    BATCH_RUNS_DIR,
+)
+from agent1 import InputValidationAgent
+from agent2 import JDAnalysisAgent
+from agent3 import ProjectPackagingAgent
+from agent4 import ResumeOptimizationAgent
+from agent_prompts import AGENT2_JD_ANALYSIS_PROMPT
+from circuit_breaker import CircuitOpenError
+from llm_client import chat_completion
+from rate_limiter import PRIORITY_BATCH, request_priority
+from resume_optimization_service import ResumeOptimizationService
+from semantic_cache import get_semantic_cache, context_hash
+from token_budget import PromptTooLargeError
+
+STAGES = ["agent1", "agent2", "agent3", "agent4"]
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    """Read a JSONL file, skipping a torn last line left by an interrupted write."""
+    if not path.exists():
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def _append_jsonl(path: Path, records: Iterable[Dict]) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+
+
+def _write_jsonl(path: Path, records: Iterable[Dict]) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    tmp_path.replace(path)
+
+
+class LocalQueueSubmitter:
+    """
+    Drains a stage's requests through the shared LLM client.
+    
+    Requests are sent at batch priority, so the cross-worker rate limiter
+    paces them behind interactive workflow calls, with at most
+    LLM_BATCH_CONCURRENCY in flight. While the circuit breaker is open the
+    queue waits for the next probe instead of failing the items.
+    """
+    
+    name = "local"
+    
+    def __init__(self, concurrency: int = LLM_BATCH_CONCURRENCY, timeout: float = 180.0):
+        """
+        Initialize the submitter.
+        
+        Args:
+            concurrency: Maximum requests in flight
+            timeout: Per-request timeout in seconds
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+    
+    async def submit(
+        self,
+        stage: str,
+        requests: List[Dict],
+        stage_state: Dict,
+        on_response: Callable[[Dict], None],
+        save_state: Callable[[], None]
+    ) -> None:
+        """
+        Send the requests and report each response as it completes.
+        
+        Args:
+            stage: Agent identifier of the stage
+            requests: Batch request lines ({"custom_id", "method", "url", "body"})
+            stage_state: Persisted state of the stage (unused by the local queue)
+            on_response: Called with each batch response line
+            save_state: Persists stage_state
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def send(request: Dict) -> None:
+            async with semaphore:
+                while True:
+                    try:
+                        body = await chat_completion(request["body"], timeout=self.timeout, agent_name=stage)
+                        on_response({
+                            "custom_id": request["custom_id"],
+                            "response": {"status_code": 200, "body": body},
+                            "error": None,
+                        })
+                        return
+                    except CircuitOpenError as e:
+                        await asyncio.sleep(max(e.retry_after, 1.0))
+                    except Exception as e:
+                        on_response({
+                            "custom_id": request["custom_id"],
+                            "response": None,
+                            "error": {"message": str(e)},
+                        })
+                        return
+        
+        token = request_priority.set(PRIORITY_BATCH)
+        try:
+            await asyncio.gather(*(send(request) for request in requests))
+        finally:
+            request_priority.reset(token)
+
+
+class BatchAPISubmitter:
+    """
+    Submits a stage through an OpenAI-compatible batch API (/v1/files and /v1/batches).
+    
+    The upstream batch id is saved in the run manifest as soon as it is
+    created, so a resumed run keeps polling the same batch instead of
+    submitting it again.
+    """
+    
+    name = "batch_api"
+    
+    def __init__(
+        self,
+        base_url: str = STUDENT_PORTAL_BASE_URL,
+        completion_window: str = LLM_BATCH_COMPLETION_WINDOW,
+        poll_interval: float = LLM_BATCH_POLL_INTERVAL
+    ):
+        """
+        Initialize the submitter.
+        
+        Args:
+            base_url: API base URL (the /v1 endpoints are appended)
+            completion_window: Batch completion window requested upstream
+            poll_interval: Seconds between batch status polls
+        """
+        self.base_url = base_url.rstrip("/")
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+    
+    async def submit(
+        self,
+        stage: str,
+        requests: List[Dict],
+        stage_state: Dict,
+        on_response: Callable[[Dict], None],
+        save_state: Callable[[], None]
+    ) -> None:
+        """
+        Upload the requests as a batch file, wait for the batch and report its responses.
+        
+        Args:
+            stage: Agent identifier of the stage
+            requests: Batch request lines ({"custom_id", "method", "url", "body"})
+            stage_state: Persisted state of the stage; holds the upstream batch id
+            on_response: Called with each batch response line
+            save_state: Persists stage_state
+        
+        Raises:
+            httpx.HTTPError: When the batch API rejects a request
+            RuntimeError: When the batch ends failed, expired or cancelled
+        """
+        headers = {"Authorization": f"Bearer {STUDENT_PORTAL_API_KEY}"}
+        async with httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=120.0) as client:
+            batch_id = stage_state.get("upstream_batch_id")
+            if not batch_id:
+                content = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in requests)
+                upload = await client.post(
+                    "/v1/files",
+                    data={"purpose": "batch"},
+                    files={"file": (f"{stage}.requests.jsonl", content.encode("utf-8"), "application/jsonl")},
+                )
+                upload.raise_for_status()
+                created = await client.post("/v1/batches", json={
+                    "input_file_id": upload.json()["id"],
+                    "endpoint": CHAT_COMPLETIONS_URL,
+                    "completion_window": self.completion_window,
+                    "metadata": {"stage": stage},
+                })
+                created.raise_for_status()
+                batch_id = created.json()["id"]
+                stage_state["upstream_batch_id"] = batch_id
+                save_state()
+            
+            while True:
+                response = await client.get(f"/v1/batches/{batch_id}")
+                response.raise_for_status()
+                batch = response.json()
+                stage_state["upstream_status"] = batch.get("status")
+                stage_state["upstream_counts"] = batch.get("request_counts")
+                save_state()
+                if batch.get("status") in BATCH_TERMINAL_STATES:
+                    break
+                await asyncio.sleep(self.poll_interval)
+            
+            # Completed batches may still carry per-request errors in the error file
+            for file_key in ("output_file_id", "error_file_id"):
+                file_id = batch.get(file_key)
+                if not file_id:
+                    continue
+                content = await client.get(f"/v1/files/{file_id}/content")
+                content.raise_for_status()
+                for line in content.text.splitlines():
+                    if line.strip():
+                        on_response(json.loads(line))
+            
+            if batch.get("status") != "completed":
+                # Let a resumed run submit the remaining requests as a new batch
+                stage_state.pop("upstream_batch_id", None)
+                save_state()
+                raise RuntimeError(f"Upstream batch {batch_id} ended {batch.get('status')}")
+
+
+def get_submitter(name: Optional[str] = None):
+    """
+    Get a batch submitter by name.
+    
+    Args:
+        name: "local" or "batch_api" (default: batch_api when LLM_BATCH_API_ENABLED)
+    
+    Returns:
+        Submitter instance
+    """
+    name = name or ("batch_api" if LLM_BATCH_API_ENABLED else "local")
+    if name == "batch_api":
+        return BatchAPISubmitter()
+    if name == "local":
+        return LocalQueueSubmitter()
+    raise ValueError(f"Unknown batch submitter: {name}")
+
+
+class BatchRun:
+    """
+    One resumable batch run of the Agent 1-4 workflow.
+    
+    Files in the run directory:
+        manifest.json            run and per-stage state
+        items.jsonl              the inputs, with ids
+        <stage>.requests.jsonl   chat-completion batch requests of the stage
+        <stage>.responses.jsonl  batch response lines, appended as they arrive
+        <stage>.outputs.jsonl    parsed agent outputs by item id
+        results.jsonl            final per-item results
+    """
+    
+    def __init__(self, run_dir: Path, submitter=None):
+        """
+        Open an existing run.
+        
+        Args:
+            run_dir: Run directory created by BatchRun.create
+            submitter: Submitter to use (default: the one the run was created with)
+        """
+        self.run_dir = Path(run_dir)
+        manifest_path = self.run_dir / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No batch run at {self.run_dir}")
+        self.manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        self.submitter = submitter or get_submitter(self.manifest.get("submitter"))
+        self.items = {item["id"]: item for item in _read_jsonl(self.run_dir / "items.jsonl")}
+        
+        self.agent1 = InputValidationAgent()
+        self.agent2 = JDAnalysisAgent()
+        self.agent3 = ProjectPackagingAgent()
+        self.agent4 = ResumeOptimizationAgent()
+    
+    @classmethod
+    def create(cls, items: List[Dict], run_dir: Optional[Path] = None, submitter: Optional[str] = None) -> "BatchRun":
+        """
+        Create a run directory for a set of inputs.
+        
+        Args:
+            items: Inputs with jd_text, resume_text and optional id / projects_text
+            run_dir: Run directory (default: a new directory under BATCH_RUNS_DIR)
+            submitter: "local" or "batch_api" (default per LLM_BATCH_API_ENABLED)
+        
+        Returns:
+            The new run
+        """
+        run_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        run_dir = Path(run_dir) if run_dir else Path(BATCH_RUNS_DIR) / run_id
+        run_dir.mkdir(parents=True, exist_ok=True)
+        if (run_dir / "manifest.json").exists():
+            raise FileExistsError(f"Batch run already exists at {run_dir}; resume it instead")
+        
+        records = []
+        for index, item in enumerate(items):
+            if not item.get("jd_text") or not item.get("resume_text"):
+                raise ValueError(f"Input {index} needs jd_text and resume_text")
+            records.append({
+                "id": str(item.get("id") or f"item_{index:05d}"),
+                "jd_text": item["jd_text"],
+                "resume_text": item["resume_text"],
+                "projects_text": item.get("projects_text"),
+            })
+        if len({r["id"] for r in records}) != len(records):
+            raise ValueError("Input ids must be unique")
+        _write_jsonl(run_dir / "items.jsonl", records)
+        
+        manifest = {
+            "run_id": run_dir.name,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat(),
+            "submitter": get_submitter(submitter).name,
+            "status": "pending",
+            "current_stage": STAGES[0],
+            "items": len(records),
+            "stages": {stage: {"status": "pending"} for stage in STAGES},
+            "error": None,
+        }
+        (run_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        return cls(run_dir)
+    
+    def _save_manifest(self) -> None:
+        self.manifest["updated_at"] = datetime.now().isoformat()
+        path = self.run_dir / "manifest.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+        tmp_path.replace(path)
+    
+    def _outputs(self, stage: str) -> Dict[str, Dict]:
+        return {r["id"]: r["output"] for r in _read_jsonl(self.run_dir / f"{stage}.outputs.jsonl")}
+    
+    def _failed_items(self) -> Dict[str, str]:
+        """Items stopped by a critical Agent 1 issue, like the interactive workflow does."""
+        failed = {}
+        for item_id, output in self._outputs("agent1").items():
+            if not output.get("is_valid", False) and "error" not in output:
+                critical = [i for i in output.get("issues", []) if i.get("severity") == "critical"]
+                if critical:
+                    failed[item_id] = "Input validation failed with critical issues"
+        return failed
+    
+    def _build_request(self, stage: str, item: Dict, outputs: Dict[str, Dict[str, Dict]]) -> Dict:
+        """Build the chat-completions payload of an item for a stage."""
+        item_id = item["id"]
+        if stage == "agent1":
+            return self.agent1._build_payload(item["resume_text"], item["projects_text"])
+        if stage == "agent2":
+            return self.agent2._build_payload(
+                item["jd_text"], item["resume_text"], item["projects_text"],
+                warm_start=item.get("warm_start"),
+                model=item.get("model")
+            )
+        if stage == "agent3":
+            return self.agent3._build_payload(item["jd_text"], item["projects_text"] or "", outputs["agent2"][item_id])
+        return self.agent4._build_payload(
+            item["jd_text"], item["resume_text"], outputs["agent2"][item_id], outputs["agent3"][item_id]
+        )
+    
+    async def _resolve_locally(self, stage: str, item: Dict) -> Optional[Dict]:
+        """Answer a stage without the LLM when the interactive path would (local validation, semantic cache)."""
+        if stage == "agent1":
+            local_result = self.agent1._validate_locally(item["resume_text"], item["projects_text"])
+            item["local_result"] = local_result
+            if local_result is not None and local_result["confidence"] >= AGENT1_LOCAL_CONFIDENCE_THRESHOLD:
+                return local_result
+        if stage == "agent2":
+            try:
+                # Cached analyses are keyed on the model the request is routed to
+                item["model"] = self.agent2._build_payload(
+                    item["jd_text"], item["resume_text"], item["projects_text"]
+                )["model"]
+            except PromptTooLargeError:
+                return None
+            semantic_cache = get_semantic_cache()
+            match = await semantic_cache.alookup(
+                item["jd_text"],
+                self.agent2._candidate_text(item["resume_text"], item["projects_text"]),
+                context_hash(item["model"], AGENT2_JD_ANALYSIS_PROMPT)
+            )
+            if match and match["reusable"]:
+                return match["analysis"]
+            item["warm_start"] = match["analysis"] if match else None
+        return None
+    
+    async def _parse_response(self, stage: str, item: Dict, line: Dict) -> Dict:
+        """Turn a batch response line into the agent's output, exactly as the interactive path would."""
+        agent = getattr(self, stage)
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            message = (line.get("error") or {}).get("message") or f"Upstream status {response.get('status_code')}"
+            return agent._error_result(RuntimeError(message))
+        try:
+            output = agent._parse_completion(response["body"])
+        except Exception as e:
+            return agent._error_result(e)
+        
+        if stage == "agent1":
+            output = agent._mark_llm_result(output, item.get("local_result"))
+        if stage == "agent2" and "error" not in output:
+            await get_semantic_cache().astore(
+                item["jd_text"],
+                agent._candidate_text(item["resume_text"], item["projects_text"]),
+                context_hash(item.get("model", agent.model), AGENT2_JD_ANALYSIS_PROMPT),
+                output
+            )
+        return output
+    
+    async def _run_stage(self, stage: str) -> None:
+        stage_state = self.manifest["stages"][stage]
+        outputs = {s: self._outputs(s) for s in STAGES}
+        failed = self._failed_items()
+        pending = [
+            dict(item) for item_id, item in self.items.items()
+            if item_id not in outputs[stage] and item_id not in failed
+        ]
+        outputs_path = self.run_dir / f"{stage}.outputs.jsonl"
+        
+        # Responses received before an interruption are parsed, not sent again
+        responses_path = self.run_dir / f"{stage}.responses.jsonl"
+        received = {r.get("custom_id") for r in _read_jsonl(responses_path)}
+        
+        # Items the interactive path would answer without an upstream call
+        local_outputs = []
+        to_request = []
+        requests = []
+        for item in pending:
+            output = await self._resolve_locally(stage, item)
+            if output is None and item["id"] not in received:
+                try:
+                    requests.append({
+                        "custom_id": item["id"],
+                        "method": "POST",
+                        "url": CHAT_COMPLETIONS_URL,
+                        "body": self._build_request(stage, item, outputs),
+                    })
+                except PromptTooLargeError as e:
+                    # Fails without a call, as the interactive path does
+                    output = getattr(self, stage)._error_result(e)
+            if output is not None:
+                local_outputs.append({"id": item["id"], "output": output, "source": "local"})
+            else:
+                to_request.append(item)
+        _append_jsonl(outputs_path, local_outputs)
+        
+        stage_state.update(status="running", requests=len(requests), local=len(local_outputs))
+        self._save_manifest()
+        if requests:
+            _write_jsonl(self.run_dir / f"{stage}.requests.jsonl", requests)
+            await self.submitter.submit(
+                stage,
+                requests,
+                stage_state,
+                lambda line: _append_jsonl(responses_path, [line]),
+                self._save_manifest
+            )
+        
+        # Fan the responses back through the agents' parsers
+        received = {r.get("custom_id"): r for r in _read_jsonl(responses_path)}
+        parsed = []
+        for item in to_request:
+            if item["id"] in received:
+                output = await self._parse_response(stage, item, received[item["id"]])
+                parsed.append({"id": item["id"], "output": output})
+        _append_jsonl(outputs_path, parsed)
+        
+        stage_state.update(status="completed", outputs=len(self._outputs(stage)))
+        self._save_manifest()
+    
+    def _write_results(self) -> None:
+        """Fan the stage outputs into ResumeOptimizationService, as the workflow does, and write results."""
+        outputs = {stage: self._outputs(stage) for stage in STAGES}
+        failed = self._failed_items()
+        results = []
+        for item_id, item in self.items.items():
+            result = {"id": item_id, "status": "completed", "error": None}
+            result.update({stage: outputs[stage].get(item_id) for stage in STAGES})
+            if item_id in failed:
+                result.update(status="failed", error=failed[item_id])
+            elif any(outputs[stage].get(item_id) is None for stage in STAGES):
+                result.update(status="incomplete", error="Missing stage outputs")
+            else:
+                service = ResumeOptimizationService()
+                service.load_original_resume(item["resume_text"])
+                service.load_agent3_outputs(outputs["agent3"][item_id])
+                service.load_optimization_recommendations(outputs["agent4"][item_id])
+                result["feedback_status"] = service.get_feedback_status()
+                result["classified_projects"] = service.get_classified_projects_for_interview()
+            results.append(result)
+        _write_jsonl(self.run_dir / "results.jsonl", results)
+    
+    async def run(self) -> Dict:
+        """
+        Run (or resume) every remaining stage and write the final results.
+        
+        Returns:
+            Progress of the run
+        """
+        self.manifest.update(status="running", error=None)
+        self._save_manifest()
+        try:
+            for stage in STAGES:
+                if self.manifest["stages"][stage]["status"] == "completed":
+                    continue
+                self.manifest["current_stage"] = stage
+                await self._run_stage(stage)
+            self._write_results()
+            self.manifest.update(status="completed", current_stage="completed")
+        except BaseException as e:
+            self.manifest.update(status="interrupted", error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._save_manifest()
+        return self.progress()
+    
+    def progress(self) -> Dict:
+        """
+        Get the progress of the run.
+        
+        Returns:
+            Manifest with per-stage output counts
+        """
+        stages = {}
+        for stage in STAGES:
+            stages[stage] = {
+                **self.manifest["stages"][stage],
+                "outputs": len(self._outputs(stage)),
+                "responses": len(_read_jsonl(self.run_dir / f"{stage}.responses.jsonl")),
+            }
+        return {**self.manifest, "stages": stages, "failed_items": len(self._failed_items())}
+    
+    def results(self) -> List[Dict]:
+        """Final per-item results (empty until the run completes)."""
+        return _read_jsonl(self.run_dir / "results.jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the workflow over a batch of inputs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    start = subparsers.add_parser("start", help="Create and run a batch from a JSONL of inputs")
+    start.add_argument("inputs", help="JSONL file of {id, jd_text, resume_text, projects_text}")
+    start.add_argument("--run-dir", help="Run directory (default: under BATCH_RUNS_DIR)")
+    start.add_argument("--submitter", choices=["local", "batch_api"], help="How requests are submitted")
+    resume = subparsers.add_parser("resume", help="Resume an interrupted run")
+    resume.add_argument("run_dir")
+    status = subparsers.add_parser("status", help="Show the progress of a run")
+    status.add_argument("run_dir")
+    args = parser.parse_args()
+    
+    if args.command == "start":
+        run = BatchRun.create(_read_jsonl(Path(args.inputs)), args.run_dir, args.submitter)
+        print(f"Batch run: {run.run_dir}")
+    else:
+        run = BatchRun(Path(args.run_dir))
+    
+    if args.command != "status":
+        try:
+            asyncio.run(run.run())
+        except KeyboardInterrupt:
+            print(f"Interrupted; resume with: python batch_runner.py resume {run.run_dir}")
+            sys.exit(1)
+    print(json.dumps(run.progress(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
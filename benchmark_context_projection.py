@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark the prompt savings of context projection for Agents 3, 4 and 5.
+
+Builds each agent's payload twice from a saved workflow: once embedding the
+full upstream outputs as indented JSON (the previous prompts) and once with
+the projected, compact context. Reports prompt tokens per agent and, with
+--live, the upstream latency of both variants.
+
+Usage:
+    python benchmark_context_projection.py result.json --jd jd.txt --resume resume.txt \\
+        [--projects projects.txt] [--live --repeat 3]
+
+result.json is the response of GET /api/v1/workflow/result/{workflow_id}
+(or its "results" object).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# The agents refuse to start without a key; offline runs never send a request
+if "--live" not in sys.argv:
+    os.environ.setdefault("STUDENT_PORTAL_API_KEY", "benchmark")
+
+import context_projection
+import token_budget
+from agent3 import ProjectPackagingAgent
+from agent4 import ResumeOptimizationAgent
+from agent5 import InterviewPreparationAgent
+from llm_client import post_chat_completion_sync
+from resume_optimization_service import ResumeOptimizationService
+
+
+def load_results(path: str) -> Dict:
+    """Load agent outputs from a saved workflow result."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    results = data.get("results", data)
+    missing = [name for name in ("agent2", "agent3") if not isinstance(results.get(name), dict)]
+    if missing:
+        raise ValueError(f"Workflow result has no outputs for: {', '.join(missing)}")
+    return results
+
+
+def build_payloads(results: Dict, jd_text: str, resume_text: str, projects_text: str) -> Dict[str, Dict]:
+    """Build the Agent 3, 4 and 5 payloads for the saved workflow."""
+    agent2_outputs = results["agent2"]
+    agent3_outputs = results["agent3"]
+    
+    service = ResumeOptimizationService()
+    service.load_agent3_outputs(agent3_outputs)
+    agent4_outputs = {"classified_projects": service.get_classified_projects_for_interview()}
+    
+    return {
+        "agent3": ProjectPackagingAgent()._build_payload(jd_text, projects_text, agent2_outputs),
+        "agent4": ResumeOptimizationAgent()._build_payload(jd_text, resume_text, agent2_outputs, agent3_outputs),
+        "agent5": InterviewPreparationAgent()._build_payload(jd_text, resume_text, agent2_outputs, agent4_outputs),
+    }
+
+
+def build_variants(results: Dict, jd_text: str, resume_text: str, projects_text: str) -> Dict[str, Dict]:
+    """Build the payloads with projection off (baseline) and on (projected)."""
+    # Compare untrimmed prompts so the difference is due to projection only
+    token_budget.TOKEN_BUDGET_ENABLED = False
+    variants = {}
+    for name, enabled in (("baseline", False), ("projected", True)):
+        context_projection.CONTEXT_PROJECTION_ENABLED = enabled
+        variants[name] = build_payloads(results, jd_text, resume_text, projects_text)
+    return variants
+
+
+def measure_latency(payload: Dict, repeat: int, timeout: float) -> List[float]:
+    """Send a payload upstream repeat times and return the latencies in seconds."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        post_chat_completion_sync(payload, timeout=timeout)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark context projection prompt savings")
+    parser.add_argument("result", help="Saved workflow result JSON")
+    parser.add_argument("--jd", required=True, help="Job description text file")
+    parser.add_argument("--resume", required=True, help="Resume text file")
+    parser.add_argument("--projects", help="Project materials text file")
+    parser.add_argument("--live", action="store_true", help="Also measure upstream latency")
+    parser.add_argument("--repeat", type=int, default=3, help="Live requests per agent and variant")
+    parser.add_argument("--timeout", type=float, default=180.0, help="Live request timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    
+    results = load_results(args.result)
+    jd_text = Path(args.jd).read_text(encoding="utf-8")
+    resume_text = Path(args.resume).read_text(encoding="utf-8")
+    projects_text = Path(args.projects).read_text(encoding="utf-8") if args.projects else ""
+    
+    variants = build_variants(results, jd_text, resume_text, projects_text)
+    
+    report = {"encoder": token_budget.get_token_counter().name, "agents": {}}
+    for agent_name in variants["baseline"]:
+        row = {}
+        for variant, payloads in variants.items():
+            payload = payloads[agent_name]
+            row[f"{variant}_prompt_tokens"] = token_budget.count_message_tokens(payload["messages"])
+            if args.live:
+                latencies = measure_latency(payload, args.repeat, args.timeout)
+                row[f"{variant}_median_seconds"] = round(statistics.median(latencies), 2)
+        saved = row["baseline_prompt_tokens"] - row["projected_prompt_tokens"]
+        row["tokens_saved"] = saved
+        row["tokens_saved_percent"] = round(100.0 * saved / max(row["baseline_prompt_tokens"], 1), 1)
+        if args.live:
+            row["seconds_saved"] = round(row["baseline_median_seconds"] - row["projected_median_seconds"], 2)
+        report["agents"][agent_name] = row
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print(f"Token counts: {report['encoder']}")
+    header = f"{'agent':<8}{'baseline':>10}{'projected':>11}{'saved':>9}{'saved %':>9}"
+    if args.live:
+        header += f"{'base s':>9}{'proj s':>9}{'saved s':>9}"
+    print(header)
+    for agent_name, row in report["agents"].items():
+        line = (
+            f"{agent_name:<8}{row['baseline_prompt_tokens']:>10}{row['projected_prompt_tokens']:>11}"
+            f"{row['tokens_saved']:>9}{row['tokens_saved_percent']:>8}%"
+        )
+        if args.live:
+            line += f"{row['baseline_median_seconds']:>9}{row['projected_median_seconds']:>9}{row['seconds_saved']:>9}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
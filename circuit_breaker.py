@@ -0,0 +1,188 @@
+"""Circuit breaker around the upstream chat-completions endpoint."""
+import threading
+import time
+from typing import Dict, Optional
+
+from config import (
+    LLM_BREAKER_ENABLED,
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_TIMEOUT,
+    LLM_BREAKER_HALF_OPEN_MAX_CALLS,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the breaker is open."""
+    
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            f"LLM service unavailable: circuit breaker open after repeated upstream failures "
+            f"(next probe in {retry_after:.0f}s)"
+        )
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after N consecutive upstream failures or timeouts.
+    Open -> half-open once the reset timeout elapses; a limited number of
+    probe calls are let through, and their outcome closes or re-opens it.
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = LLM_BREAKER_RESET_TIMEOUT,
+        half_open_max_calls: int = LLM_BREAKER_HALF_OPEN_MAX_CALLS,
+        enabled: bool = LLM_BREAKER_ENABLED
+    ):
+        """
+        Initialize the breaker in the closed state.
+        
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds to stay open before probing
+            half_open_max_calls: Concurrent probe calls allowed when half-open
+            enabled: Whether the breaker ever opens
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probes_in_flight = 0
+        self._stats = {"times_opened": 0, "rejected": 0, "failures": 0, "successes": 0}
+        self._last_failure: Optional[str] = None
+    
+    def _refresh(self, now: float) -> None:
+        """Move open -> half-open once the reset timeout has elapsed (lock held)."""
+        if self._state == STATE_OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = STATE_HALF_OPEN
+            self._probes_in_flight = 0
+    
+    def _retry_after(self, now: float) -> float:
+        if self._state == STATE_OPEN:
+            return max(0.0, self.reset_timeout - (now - self._opened_at))
+        return 0.0
+    
+    def _open(self, now: float) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._stats["times_opened"] += 1
+    
+    @property
+    def state(self) -> str:
+        """Current breaker state."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+    
+    def allows_request(self) -> bool:
+        """Whether a call made now would be let through (does not reserve a probe)."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self._state == STATE_HALF_OPEN:
+                return self._probes_in_flight < self.half_open_max_calls
+            return self._state == STATE_CLOSED
+    
+    def before_call(self) -> None:
+        """
+        Admit a call or fail fast.
+        
+        Every admitted call must be followed by record_success, record_failure
+        or release.
+        
+        Raises:
+            CircuitOpenError: While open, or half-open with all probe slots taken
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self._state == STATE_CLOSED:
+                return
+            if self._state == STATE_HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return
+            self._stats["rejected"] += 1
+            retry_after = self._retry_after(now) or self.reset_timeout
+        raise CircuitOpenError(retry_after)
+    
+    def record_success(self) -> None:
+        """The upstream answered; close the breaker."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._stats["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._opened_at = None
+                self._probes_in_flight = 0
+    
+    def record_failure(self, error: Optional[Exception] = None) -> None:
+        """The upstream failed or timed out; open the breaker at the threshold."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if error is not None:
+                self._last_failure = f"{type(error).__name__}: {error}"
+            if self._state == STATE_HALF_OPEN:
+                self._open(now)
+            elif self._state == STATE_CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._open(now)
+    
+    def release(self) -> None:
+        """An admitted call ended without a verdict (e.g. cancelled); free its probe slot."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+    
+    def snapshot(self) -> Dict:
+        """
+        Get breaker state and counters.
+        
+        Returns:
+            Dictionary describing the breaker
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            return {
+                "enabled": self.enabled,
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_after_seconds": round(self._retry_after(now), 1),
+                "probes_in_flight": self._probes_in_flight,
+                "last_failure": self._last_failure,
+                **self._stats,
+            }
+
+
+_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Get the process-wide circuit breaker shared by all agents."""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
@@ -49,3 +49,128 @@ JOBS_DIR = str(BASE_DIR / "data" / "jobs")
 # Create directories if they don't exist
 for directory in [DATA_DIR, RESUMES_DIR, PROJECTS_DIR, JOBS_DIR, VECTOR_DB_PATH]:
     os.makedirs(directory, exist_ok=True)
+
+# Shared LLM HTTP Client (Connection Pool) Configuration
+LLM_HTTP2_ENABLED = os.getenv("LLM_HTTP2_ENABLED", "true").lower() == "true"
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_STREAMING_ENABLED = os.getenv("LLM_STREAMING_ENABLED", "false").lower() == "true"
+
+# LLM Response Cache Configuration (SQLite, shared by all workers)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(BASE_DIR / "data" / "llm_cache.db"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Semantic (near-duplicate) Cache for Agent 2 JD Analyses
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+# Minimum cosine similarity, required of the JD and of the candidate text separately
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+# "warm_start" passes a near-duplicate analysis to the LLM to revise; "reuse" additionally
+# returns it without a call, but only when the candidate text is exactly the same
+SEMANTIC_CACHE_MODE = os.getenv("SEMANTIC_CACHE_MODE", "warm_start")
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashing")  # "hashing" or "remote"
+SEMANTIC_CACHE_HASHING_DIM = int(os.getenv("SEMANTIC_CACHE_HASHING_DIM", "1024"))
+# Entries older than the TTL are dropped, then the oldest above the maximum count
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+# Append-only files: one JSON line per entry, and the entries' vectors as raw float32 rows
+SEMANTIC_CACHE_METADATA_FILE = str(BASE_DIR / "data" / "vector_db" / "jd_analyses.jsonl")
+SEMANTIC_CACHE_VECTORS_FILE = str(BASE_DIR / "data" / "vector_db" / "jd_analyses.f32")
+
+# LLM Retry, Hedging and Stall Detection Configuration
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20.0"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "10"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "5.0"))
+LLM_STREAM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_STREAM_FIRST_TOKEN_TIMEOUT", "60.0"))
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "20.0"))
+
+# Upstream Rate Limiter Configuration (SQLite token buckets shared by all workers)
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LLM_RATE_LIMIT_PATH = os.getenv("LLM_RATE_LIMIT_PATH", str(BASE_DIR / "data" / "llm_rate_limit.db"))
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "60"))
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "200000"))
+# Per-model overrides as JSON, e.g. {"gpt-4o-mini": {"rpm": 120, "tpm": 400000}}
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "{}")
+
+# LLM Circuit Breaker Configuration (shared by all agents in a worker)
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30.0"))
+LLM_BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("LLM_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+
+# Latency-aware Model Routing Configuration
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "true").lower() == "true"
+LLM_ROUTING_MIN_SAMPLES = int(os.getenv("LLM_ROUTING_MIN_SAMPLES", "5"))
+LLM_ROUTING_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTING_MAX_ERROR_RATE", "0.2"))
+LLM_ROUTING_DEFAULT_SLO = float(os.getenv("LLM_ROUTING_DEFAULT_SLO", "90.0"))
+# Per-agent policies as JSON; models are listed cheapest first, e.g.
+# {"agent3": {"models": ["gpt-4o-mini", "supermind-agent-v1"], "latency_slo": 45,
+#             "max_input_tokens": {"gpt-4o-mini": 6000}}}
+LLM_ROUTING_POLICIES = os.getenv("LLM_ROUTING_POLICIES", "{}")
+
+# Agent 1 Local Validation Fast Path
+AGENT1_LOCAL_VALIDATION_ENABLED = os.getenv("AGENT1_LOCAL_VALIDATION_ENABLED", "true").lower() == "true"
+AGENT1_LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("AGENT1_LOCAL_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Token Budget Configuration
+TOKEN_BUDGET_ENABLED = os.getenv("TOKEN_BUDGET_ENABLED", "true").lower() == "true"
+# tiktoken encoding; set TIKTOKEN_CACHE_DIR to a directory holding the BPE file to use it offline
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+LLM_DEFAULT_CONTEXT_WINDOW = int(os.getenv("LLM_DEFAULT_CONTEXT_WINDOW", "32000"))
+# Per-model context windows as JSON
+LLM_CONTEXT_WINDOWS = os.getenv("LLM_CONTEXT_WINDOWS", '{"gpt-4o-mini": 128000}')
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "1024"))
+LLM_CONTEXT_SAFETY_TOKENS = int(os.getenv("LLM_CONTEXT_SAFETY_TOKENS", "256"))
+# Embed only the upstream output fields each agent reads, as compact JSON
+CONTEXT_PROJECTION_ENABLED = os.getenv("CONTEXT_PROJECTION_ENABLED", "true").lower() == "true"
+
+# Batch Mode Configuration (offline runs over many inputs)
+BATCH_RUNS_DIR = os.getenv("BATCH_RUNS_DIR", str(BASE_DIR / "data" / "batch_runs"))
+# Submit stages through the upstream /v1/batches API instead of the local queue
+LLM_BATCH_API_ENABLED = os.getenv("LLM_BATCH_API_ENABLED", "false").lower() == "true"
+LLM_BATCH_COMPLETION_WINDOW = os.getenv("LLM_BATCH_COMPLETION_WINDOW", "24h")
+LLM_BATCH_POLL_INTERVAL = float(os.getenv("LLM_BATCH_POLL_INTERVAL", "60.0"))
+# Requests in flight when the local queue drains a stage
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+
+# Parallel Section Generation (one long completion split into concurrent calls)
+# Agent 5: behavioral, business domain and one call per deep-dive project
+AGENT5_PARALLEL_ENABLED = os.getenv("AGENT5_PARALLEL_ENABLED", "true").lower() == "true"
+# Projects given a technical deep dive ("Top 3 Projects")
+AGENT5_DEEP_DIVE_PROJECTS = int(os.getenv("AGENT5_DEEP_DIVE_PROJECTS", "3"))
+# Speculative Agent 5 sections not claimed by an interview preparation are dropped after this long
+AGENT5_SPECULATION_TTL_SECONDS = int(os.getenv("AGENT5_SPECULATION_TTL_SECONDS", "3600"))
+# Agent 2: JD analysis split into its tasks, run concurrently where they do not depend on each other
+AGENT2_SECTIONED_ENABLED = os.getenv("AGENT2_SECTIONED_ENABLED", "false").lower() == "true"
+
+# Workflow State Store Configuration (shared by all workers)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")  # "sqlite" or "memory"
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", str(BASE_DIR / "data" / "workflow_state.db"))
+# Seconds between writes of running workflows' progress to the store
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "0.5"))
+# Longest a progress request with since_version/If-None-Match is held open waiting for a change
+# (kept below the gateway's 30-60 s timeout)
+PROGRESS_LONG_POLL_MAX_SECONDS = float(os.getenv("PROGRESS_LONG_POLL_MAX_SECONDS", "25"))
+# Retention of workflows, results and interview jobs after their last update (running ones are
+# only evicted for capacity once finished, or by TTL when their heartbeat stopped)
+STATE_TTL_SECONDS = int(os.getenv("STATE_TTL_SECONDS", str(24 * 3600)))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "500"))
+STATE_MAX_BYTES = int(os.getenv("STATE_MAX_BYTES", str(100 * 1024 * 1024)))
+# Evicted entries keep an "expired" marker this long, so lookups can tell them from unknown ids
+STATE_TOMBSTONE_TTL_SECONDS = int(os.getenv("STATE_TOMBSTONE_TTL_SECONDS", str(7 * 24 * 3600)))
+STATE_EVICT_INTERVAL = float(os.getenv("STATE_EVICT_INTERVAL", "60"))
+# Running jobs' documents are touched this often by their worker; a running document not
+# touched for STATE_STALE_SECONDS belongs to a dead worker and is marked failed
+STATE_HEARTBEAT_INTERVAL = float(os.getenv("STATE_HEARTBEAT_INTERVAL", "10"))
+STATE_STALE_SECONDS = int(os.getenv("STATE_STALE_SECONDS", "120"))
+
+# Per-workflow Resume Optimization Sessions
+# Sessions are rebuilt from the state store on demand; these bound the copies kept in a worker's memory
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "100"))
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", "1800"))
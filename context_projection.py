@@ -0,0 +1,112 @@
+"""Per-agent projection of upstream agent outputs embedded in prompts."""
+import json
+from typing import Any, Dict, List, Optional, Union
+
+from config import CONTEXT_PROJECTION_ENABLED
+
+# Fields of earlier agents' outputs that each downstream agent reads, keyed by
+# agent and prompt section. These mirror the "Inputs" of each agent's system
+# prompt; dotted paths select nested fields. A section without an entry is
+# embedded in full.
+CONTEXT_PROJECTIONS: Dict[str, Dict[str, List[str]]] = {
+    "agent3": {
+        "agent2_outputs": [
+            "ideal_candidate_profile",
+            "candidate_profile",
+            "match_assessment",
+            "improvement_recommendations",
+        ],
+    },
+    "agent4": {
+        "agent2_outputs": [
+            "job_role_team_analysis",
+            "ideal_candidate_profile",
+            "match_assessment",
+            "improvement_recommendations",
+        ],
+        "agent3_outputs": [
+            "selected_projects",
+            "skipped_projects",
+            "notes_for_resume_agent",
+        ],
+    },
+    "agent5": {
+        "agent2_outputs": [
+            "job_role_team_analysis",
+            "ideal_candidate_profile",
+            "match_assessment",
+        ],
+    },
+}
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _drop_empty(value: Any) -> Any:
+    """Recursively drop empty strings, lists, dicts and nulls."""
+    if isinstance(value, dict):
+        cleaned = {k: _drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if not _is_empty(v)}
+    if isinstance(value, list):
+        cleaned = [_drop_empty(v) for v in value]
+        return [v for v in cleaned if not _is_empty(v)]
+    return value
+
+
+def project_fields(value: Dict, fields: List[str]) -> Dict:
+    """
+    Keep only the given (possibly dotted) fields of a dictionary.
+    
+    Args:
+        value: Upstream agent output
+        fields: Field paths to keep, e.g. "match_assessment.overall_match"
+    
+    Returns:
+        New dictionary with the selected fields, empty values removed
+    """
+    projected: Dict = {}
+    for path in fields:
+        keys = path.split(".")
+        current: Any = value
+        for key in keys:
+            if not isinstance(current, dict) or key not in current:
+                current = None
+                break
+            current = current[key]
+        if _is_empty(current):
+            continue
+        target = projected
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = current
+    
+    if not projected:
+        # None of the declared fields (e.g. the upstream JSON failed to parse):
+        # keep everything rather than send an empty section
+        projected = value
+    return _drop_empty(projected)
+
+
+def project_context(
+    agent_name: str,
+    section: str,
+    value: Optional[Union[Dict, List]]
+) -> Optional[Union[str, Dict, List]]:
+    """
+    Project an upstream output to the fields an agent needs, serialized compactly.
+    
+    Args:
+        agent_name: Downstream agent identifier (e.g. "agent4")
+        section: Prompt section the value is embedded in (e.g. "agent2_outputs")
+        value: Upstream agent output
+    
+    Returns:
+        Compact JSON string, or the value unchanged when projection is disabled
+    """
+    if not CONTEXT_PROJECTION_ENABLED or value is None:
+        return value
+    fields = CONTEXT_PROJECTIONS.get(agent_name, {}).get(section)
+    if fields is not None and isinstance(value, dict):
+        value = project_fields(value, fields)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
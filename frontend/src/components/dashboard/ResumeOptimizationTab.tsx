@@ -1,6 +1,7 @@
 import { useState } from 'react';
 import { CheckCircle, ChevronDown, ChevronUp, Check, X } from 'lucide-react';
 import { resumeAPI } from '../../services/api';
+import { useAppStore } from '../../store/useAppStore';
 
 interface Props {
   data: any;
@@ -9,6 +10,8 @@ interface Props {
 }
 
 export default function ResumeOptimizationTab({ data, onFeedbackUpdate }: Props) {
+  const { workflow } = useAppStore();
+  const workflowId = workflow.workflow_id;
   const [expandedItems, setExpandedItems] = useState<Set<string>>(new Set());
   const [userFeedback, setUserFeedback] = useState<Record<string, string>>({});
   const [submitting, setSubmitting] = useState<string | null>(null);
@@ -29,9 +32,10 @@ export default function ResumeOptimizationTab({ data, onFeedbackUpdate }: Props)
     feedback: 'accept' | 'reject' | 'further_modify',
     modifiedText?: string
   ) => {
+    if (!workflowId) return;
     setSubmitting(itemId);
     try {
-      await resumeAPI.submitFeedback({
+      await resumeAPI.submitFeedback(workflowId, {
         feedback_type: feedbackType,
         item_id: itemId,
         feedback,
@@ -47,7 +51,7 @@ export default function ResumeOptimizationTab({ data, onFeedbackUpdate }: Props)
   };
 
   const handleAcceptAll = async () => {
-    if (!confirm('Accept all recommendations?')) return;
+    if (!workflowId || !confirm('Accept all recommendations?')) return;
 
     const allFeedbacks: any[] = [];
 
@@ -93,7 +97,7 @@ export default function ResumeOptimizationTab({ data, onFeedbackUpdate }: Props)
     }
 
     try {
-      await resumeAPI.submitBatchFeedback(allFeedbacks);
+      await resumeAPI.submitBatchFeedback(workflowId, allFeedbacks);
       alert('All recommendations accepted!');
       onFeedbackUpdate();
     } catch (error: any) {
@@ -36,8 +36,9 @@ export default function DashboardPage() {
   }, [workflow.status, navigate]);
 
   const loadRecommendations = async () => {
+    if (!workflow.workflow_id) return;
     try {
-      const data = await resumeAPI.getRecommendations();
+      const data = await resumeAPI.getRecommendations(workflow.workflow_id);
       setRecommendations(data.recommendations);
     } catch (error: any) {
       console.error('Error loading recommendations:', error);
@@ -45,8 +46,9 @@ export default function DashboardPage() {
   };
 
   const loadFeedbackStatus = async () => {
+    if (!workflow.workflow_id) return;
     try {
-      const data = await resumeAPI.getFeedbackStatus();
+      const data = await resumeAPI.getFeedbackStatus(workflow.workflow_id);
       setFeedbackStatus(data.feedback_status);
     } catch (error: any) {
       console.error('Error loading feedback status:', error);
@@ -54,9 +56,10 @@ export default function DashboardPage() {
   };
 
   const handleGenerateResume = async () => {
+    if (!workflow.workflow_id) return;
     setGeneratingResume(true);
     try {
-      const result = await resumeAPI.generateFinal();
+      const result = await resumeAPI.generateFinal(workflow.workflow_id);
       useAppStore.getState().setFinalResume(result.final_resume);
       
       // Auto-start Agent 5
@@ -119,8 +122,9 @@ export default function DashboardPage() {
   };
 
   const handleExportResume = async (format: 'pdf' | 'docx') => {
+    if (!workflow.workflow_id) return;
     try {
-      await resumeAPI.export(format, 'Resume');
+      await resumeAPI.export(workflow.workflow_id, format, 'Resume');
       // In a real app, you'd download the file
       alert(`Resume exported successfully! (${format.toUpperCase()})`);
     } catch (error: any) {
@@ -75,6 +75,9 @@ const getInitialApiBaseUrl = () => {
   return url || window.location.origin;
 };
 
+// Seconds a progress long poll is held open by the server (it caps this below the gateway timeout)
+const LONG_POLL_WAIT_SECONDS = 20;
+
 const api = axios.create({
   baseURL: getInitialApiBaseUrl(), // Initial value, will be updated in interceptor
   headers: {
@@ -231,10 +234,17 @@ export const workflowAPI = {
     }
   },
 
-  getProgress: async (workflow_id: string) => {
+  // With since_version, the server holds the request until the progress changes
+  // (long poll) and answers 304 if it does not; null is returned then
+  getProgress: async (workflow_id: string, since_version?: number) => {
     try {
-      const response = await api.get(`/api/v1/workflow/progress/${workflow_id}`);
-      return response.data;
+      const response = since_version === undefined
+        ? await api.get(`/api/v1/workflow/progress/${workflow_id}`)
+        : await api.get(`/api/v1/workflow/progress/${workflow_id}`, {
+            params: { since_version, wait: LONG_POLL_WAIT_SECONDS },
+            validateStatus: (status: number) => (status >= 200 && status < 300) || status === 304,
+          });
+      return response.status === 304 ? null : response.data;
     } catch (error: any) {
       // Handle 404 specifically - workflow might not be created yet
       if (error.status === 404) {
@@ -245,7 +255,7 @@ export const workflowAPI = {
           current_step: 'agent1',
           progress: 0,
           message: 'Workflow is initializing...',
-          results: {},
+          completed_stages: [],
           error: null,
         };
       }
@@ -258,43 +268,71 @@ export const workflowAPI = {
     return response.data;
   },
 
+  getStageResult: async (workflow_id: string, stage: string) => {
+    const response = await api.get(`/api/v1/workflow/result/${workflow_id}/${stage}`);
+    return response.data;
+  },
+
   // SSE stream for real-time progress with fallback to polling
   streamProgress: (workflow_id: string, onUpdate: (data: any) => void, onError?: (error: Error) => void) => {
     let eventSource: EventSource | null = null;
-    let pollInterval: ReturnType<typeof setInterval> | null = null;
+    let pollTimer: ReturnType<typeof setTimeout> | null = null;
+    let polling = false;
+    let lastVersion: number | undefined;
     let sseFailed = false;
     let isClosed = false;
     let consecutiveErrors = 0;
     const MAX_CONSECUTIVE_ERRORS = 5; // Allow some 404s during initialization
 
+    // Progress updates carry status fields only; each stage result arrives once
+    // (as an SSE "results" patch, or fetched when polling) and is merged here
+    const results: Record<string, any> = {};
+    const emit = (data: any) => onUpdate({ ...data, results: { ...results } });
+
     const close = () => {
       isClosed = true;
       if (eventSource) {
         eventSource.close();
         eventSource = null;
       }
-      if (pollInterval) {
-        clearInterval(pollInterval);
-        pollInterval = null;
+      if (pollTimer) {
+        clearTimeout(pollTimer);
+        pollTimer = null;
       }
     };
 
     // Fallback polling function
     const startPolling = () => {
-      if (pollInterval) return; // Already polling
+      if (polling) return; // Already polling
+      polling = true;
       
       const poll = async () => {
         if (isClosed) return;
+        let delay = 0; // Long poll: ask again as soon as the server answers
         
         try {
-          const data = await workflowAPI.getProgress(workflow_id);
+          const data = await workflowAPI.getProgress(workflow_id, lastVersion);
           consecutiveErrors = 0; // Reset on success
-          onUpdate(data);
-          
-          if (data.status === 'completed' || data.status === 'failed') {
-            close();
+          if (data) {
+            for (const stage of data.completed_stages || []) {
+              if (!(stage in results)) {
+                const stageResult = await workflowAPI.getStageResult(workflow_id, stage);
+                results[stage] = stageResult.result;
+              }
+            }
+            if (data.version === undefined) {
+              delay = 2000; // Not created yet (or expired): nothing to wait on
+            } else {
+              lastVersion = data.version;
+            }
+            emit(data);
+            
+            if (data.status === 'completed' || data.status === 'failed') {
+              close();
+            }
           }
         } catch (error: any) {
+          delay = 2000;
           consecutiveErrors++;
           console.error('Polling error:', error);
           
@@ -313,11 +351,13 @@ export const workflowAPI = {
             onError(error as Error);
           }
         }
+        
+        if (!isClosed) {
+          pollTimer = setTimeout(poll, delay);
+        }
       };
       
-      // Poll immediately, then every 2 seconds
       poll();
-      pollInterval = setInterval(poll, 2000);
     };
 
     // Try SSE first - use fresh API URL
@@ -331,10 +371,21 @@ export const workflowAPI = {
         sseFailed = false;
       };
       
+      eventSource.addEventListener('results', (event) => {
+        try {
+          const patch = JSON.parse((event as MessageEvent).data);
+          patch.forEach((op: { path: string; value: any }) => {
+            results[op.path.split('/')[2]] = op.value;
+          });
+        } catch (error) {
+          console.error('Error parsing SSE results:', error);
+        }
+      });
+
       eventSource.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
-          onUpdate(data);
+          emit(data);
           
           // Close if completed or failed
           if (data.status === 'completed' || data.status === 'failed') {
@@ -388,7 +439,7 @@ export const workflowAPI = {
     // Also start polling as backup after a short delay
     // This ensures we get updates even if SSE silently fails
     setTimeout(() => {
-      if (!sseFailed && !isClosed && !pollInterval) {
+      if (!sseFailed && !isClosed && !polling) {
         console.log('Starting polling as backup to SSE');
         startPolling();
       }
@@ -413,39 +464,39 @@ export const resumeAPI = {
     return response.data;
   },
 
-  getRecommendations: async () => {
-    const response = await api.get('/api/v1/resume/recommendations');
+  getRecommendations: async (workflow_id: string) => {
+    const response = await api.get('/api/v1/resume/recommendations', { params: { workflow_id } });
     return response.data;
   },
 
-  submitFeedback: async (feedback: {
+  submitFeedback: async (workflow_id: string, feedback: {
     feedback_type: string;
     item_id: string;
     feedback: string;
     additional_notes?: string;
     modified_text?: string;
   }) => {
-    const response = await api.post('/api/v1/resume/feedback', feedback);
+    const response = await api.post('/api/v1/resume/feedback', feedback, { params: { workflow_id } });
     return response.data;
   },
 
-  submitBatchFeedback: async (feedbacks: any[]) => {
-    const response = await api.post('/api/v1/resume/feedback/batch', feedbacks);
+  submitBatchFeedback: async (workflow_id: string, feedbacks: any[]) => {
+    const response = await api.post('/api/v1/resume/feedback/batch', feedbacks, { params: { workflow_id } });
     return response.data;
   },
 
-  getFeedbackStatus: async () => {
-    const response = await api.get('/api/v1/resume/feedback/status');
+  getFeedbackStatus: async (workflow_id: string) => {
+    const response = await api.get('/api/v1/resume/feedback/status', { params: { workflow_id } });
     return response.data;
   },
 
-  generateFinal: async () => {
-    const response = await api.post('/api/v1/resume/generate');
+  generateFinal: async (workflow_id: string) => {
+    const response = await api.post('/api/v1/resume/generate', null, { params: { workflow_id } });
     return response.data;
   },
 
-  export: async (format: 'pdf' | 'docx', title: string = 'Resume') => {
-    const response = await api.post('/api/v1/resume/export', { format, title });
+  export: async (workflow_id: string, format: 'pdf' | 'docx', title: string = 'Resume') => {
+    const response = await api.post('/api/v1/resume/export', { format, title }, { params: { workflow_id } });
     return response.data;
   },
 };
@@ -470,8 +521,8 @@ export const interviewAPI = {
 
 // Projects API
 export const projectsAPI = {
-  getClassified: async () => {
-    const response = await api.get('/api/v1/projects/classified');
+  getClassified: async (workflow_id: string) => {
+    const response = await api.get('/api/v1/projects/classified', { params: { workflow_id } });
     return response.data;
   },
 };
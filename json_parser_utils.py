@@ -243,3 +243,92 @@ def ensure_json_structure(data: Dict, default_structure: Dict) -> Dict:
     
     merge_dicts(result, data)
     return result
+
+
+class StreamingSectionParser:
+    """
+    Incrementally detect completed top-level fields of a streamed JSON object.
+    
+    Text is fed chunk by chunk as it arrives from a streaming completion. Each
+    top-level field is returned once, as soon as its value is syntactically
+    complete, so callers can render sections before the whole response exists.
+    """
+    
+    def __init__(self):
+        """Initialize an empty parser."""
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape_next = False
+        self._string_start = -1
+        self._key = None
+        self._value_start = -1
+    
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """
+        Feed the next chunk of streamed text.
+        
+        Args:
+            chunk: Newly received text
+        
+        Returns:
+            Dictionary of top-level fields completed by this chunk
+        """
+        self.text += chunk
+        completed = {}
+        text = self.text
+        
+        while self._pos < len(text):
+            i = self._pos
+            char = text[i]
+            self._pos += 1
+            
+            if self._escape_next:
+                self._escape_next = False
+                continue
+            
+            if self._in_string:
+                if char == '\\':
+                    self._escape_next = True
+                elif char == '"':
+                    self._in_string = False
+                    # A string closed at depth 1 with no pending key is a field name
+                    if self._depth == 1 and self._key is None and self._value_start == -1:
+                        try:
+                            self._key = json.loads(text[self._string_start:i + 1])
+                        except json.JSONDecodeError:
+                            self._key = None
+                continue
+            
+            if self._depth == 0:
+                # Skip any preamble (code fences, handoff tags) before the object
+                if char == '{':
+                    self._depth = 1
+                continue
+            
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ':' and self._depth == 1 and self._key is not None and self._value_start == -1:
+                self._value_start = i + 1
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 1:
+                    self._complete_field(text[self._value_start:i] if self._value_start != -1 else None, completed)
+                self._depth -= 1
+            elif char == ',' and self._depth == 1:
+                self._complete_field(text[self._value_start:i] if self._value_start != -1 else None, completed)
+        
+        return completed
+    
+    def _complete_field(self, value_text: Optional[str], completed: Dict[str, Any]) -> None:
+        """Decode a finished top-level value and reset field tracking."""
+        if self._key is not None and value_text is not None:
+            try:
+                completed[self._key] = json.loads(value_text.strip())
+            except json.JSONDecodeError:
+                pass
+        self._key = None
+        self._value_start = -1
@@ -0,0 +1,297 @@
+"""Content-addressed LLM response cache stored in SQLite (WAL) under DATA_DIR."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import agent_prompts
+from config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_BYTES,
+)
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def current_prompt_hashes() -> set:
+    """Hashes of every system prompt constant currently defined in agent_prompts."""
+    return {
+        hash_text(value)
+        for name, value in vars(agent_prompts).items()
+        if name.endswith("_PROMPT") and isinstance(value, str)
+    }
+
+
+def _split_messages(payload: Dict) -> tuple:
+    """Split a chat payload into its system prompt and the remaining messages."""
+    messages = payload.get("messages", [])
+    system_prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    other_messages = [m for m in messages if m.get("role") != "system"]
+    return system_prompt, other_messages
+
+
+def cache_key(payload: Dict) -> str:
+    """
+    Build the content address of a chat-completions request.
+    
+    The key covers the model, the system prompt hash, the user message hash,
+    temperature and max_tokens, so any change in inputs or prompts misses.
+    
+    Args:
+        payload: Chat-completions request body
+    
+    Returns:
+        Hex digest identifying the request
+    """
+    system_prompt, other_messages = _split_messages(payload)
+    material = {
+        "model": payload.get("model"),
+        "system_prompt_hash": hash_text(system_prompt),
+        "user_message_hash": hash_text(json.dumps(other_messages, sort_keys=True, ensure_ascii=False)),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+    }
+    return hash_text(json.dumps(material, sort_keys=True))
+
+
+class LLMResponseCache:
+    """Disk-backed LRU cache of chat-completions responses shared across processes."""
+    
+    # Run size/TTL eviction after this many writes
+    EVICT_EVERY_N_WRITES = 20
+    
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        enabled: bool = LLM_CACHE_ENABLED
+    ):
+        """
+        Initialize the cache and drop entries for prompts that no longer exist.
+        
+        Args:
+            path: SQLite database file
+            ttl_seconds: Maximum age of an entry
+            max_bytes: Maximum total size of stored responses
+            enabled: Whether lookups and writes are performed
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = None
+        
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+            self.invalidate_stale_prompts()
+    
+    def _create_schema(self) -> None:
+        """Create tables and indexes if missing."""
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    prompt_hash TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses(last_accessed)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_prompt_hash ON responses(prompt_hash)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+            )
+    
+    def _bump(self, name: str, amount: int = 1) -> None:
+        """Increment a shared counter (caller holds the lock and a transaction)."""
+        self._conn.execute(
+            "INSERT INTO stats(name, value) VALUES(?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+    
+    def get(self, payload: Dict) -> Optional[Dict]:
+        """
+        Look up a cached response.
+        
+        Args:
+            payload: Chat-completions request body
+        
+        Returns:
+            Cached response, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        key = cache_key(payload)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self._bump("misses")
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_accessed = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._bump("hits")
+        return json.loads(row[0])
+    
+    def put(self, payload: Dict, response: Dict) -> None:
+        """
+        Store a successful response.
+        
+        Args:
+            payload: Chat-completions request body
+            response: Decoded chat-completions response
+        """
+        if not self.enabled:
+            return
+        
+        system_prompt, _ = _split_messages(payload)
+        data = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                "(key, model, prompt_hash, response, size, created_at, last_accessed, hits) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, 0)",
+                (cache_key(payload), payload.get("model"), hash_text(system_prompt),
+                 data, len(data.encode("utf-8")), now, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY_N_WRITES == 0:
+                self._evict(now)
+    
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones above max_bytes."""
+        expired = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            for key, size in self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_accessed ASC"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        
+        if expired:
+            self._bump("expired", expired)
+        if evicted:
+            self._bump("evictions", evicted)
+    
+    def evict(self) -> None:
+        """Run TTL and size eviction now."""
+        if not self.enabled:
+            return
+        with self._lock, self._conn:
+            self._evict(time.time())
+    
+    def invalidate_stale_prompts(self) -> int:
+        """
+        Delete entries whose system prompt no longer matches any prompt constant.
+        
+        Returns:
+            Number of deleted entries
+        """
+        if not self.enabled:
+            return 0
+        
+        hashes = current_prompt_hashes()
+        with self._lock, self._conn:
+            stale = [
+                row[0] for row in self._conn.execute("SELECT DISTINCT prompt_hash FROM responses").fetchall()
+                if row[0] not in hashes
+            ]
+            deleted = 0
+            for prompt_hash in stale:
+                deleted += self._conn.execute(
+                    "DELETE FROM responses WHERE prompt_hash = ?", (prompt_hash,)
+                ).rowcount
+            if deleted:
+                self._bump("invalidated", deleted)
+        return deleted
+    
+    def stats(self) -> Dict:
+        """
+        Get cache statistics shared by all workers.
+        
+        Returns:
+            Dictionary with entry count, size, hit/miss counters and hit rate
+        """
+        if not self.enabled:
+            return {"enabled": False}
+        
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+        
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "enabled": True,
+            "path": self.path,
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "evictions": counters.get("evictions", 0),
+            "expired": counters.get("expired", 0),
+            "invalidated": counters.get("invalidated", 0),
+        }
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Get the process-wide response cache, opening it on first use."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LLMResponseCache()
+    return _response_cache
+
+
+def close_response_cache() -> None:
+    """Close the process-wide response cache."""
+    global _response_cache
+    if _response_cache is not None:
+        _response_cache.close()
+    _response_cache = None
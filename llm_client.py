@@ -0,0 +1,789 @@
+"""Shared pooled HTTP client for chat-completions calls made by all agents."""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from config import (
+    STUDENT_PORTAL_BASE_URL,
+    STUDENT_PORTAL_API_KEY,
+    LLM_HTTP2_ENABLED,
+    LLM_POOL_MAX_CONNECTIONS,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_POOL_KEEPALIVE_EXPIRY,
+    LLM_CONNECT_TIMEOUT,
+    LLM_STREAMING_ENABLED,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_STREAM_FIRST_TOKEN_TIMEOUT,
+    LLM_STREAM_IDLE_TIMEOUT,
+)
+from json_parser_utils import StreamingSectionParser
+from llm_cache import get_response_cache, cache_key
+from rate_limiter import get_rate_limiter, estimate_tokens
+from circuit_breaker import get_circuit_breaker
+from token_budget import record_usage, prompt_cache_stats
+
+try:
+    import h2  # noqa: F401 - httpx needs the h2 package to negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+CHAT_COMPLETIONS_ENDPOINT = f"{STUDENT_PORTAL_BASE_URL.rstrip('/')}/v1/chat/completions"
+
+# Upstream status codes worth retrying; other 4xx responses fail immediately
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class StreamStalledError(Exception):
+    """Raised when a streamed completion stops sending tokens."""
+
+# Process-wide clients. The async client is used by the FastAPI workflow;
+# the sync twin shares the same pool settings for scripts and sync callers.
+_async_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+_metrics = {
+    "requests_total": 0,
+    "requests_failed": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "clients_created": 0,
+    "streamed_requests": 0,
+    "cache_hits": 0,
+    "coalesced_followers": 0,
+    "retries": 0,
+    "hedges_fired": 0,
+    "hedges_won": 0,
+    "stream_stalls": 0,
+    "circuit_rejections": 0,
+}
+
+# Upstream calls currently in flight, keyed by request fingerprint (single-flight)
+_inflight: Dict[str, "asyncio.Task"] = {}
+# Callers awaiting each in-flight call
+_inflight_waiters: Dict["asyncio.Task", int] = {}
+
+
+
+class LatencyTracker:
+    """Rolling latency and error-rate window for one (agent, model) pair."""
+    
+    def __init__(self, window: int = 100):
+        """
+        Initialize the tracker.
+        
+        Args:
+            window: Number of most recent calls kept
+        """
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+    
+    def record(self, seconds: Optional[float], ok: bool) -> None:
+        """Record one call; latency is only kept for successful calls."""
+        self.outcomes.append(ok)
+        if ok and seconds is not None:
+            self.latencies.append(seconds)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile (0-100) of successful calls, or None without samples."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+    
+    def error_rate(self) -> float:
+        """Fraction of failed calls in the window."""
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which to fire a hedged duplicate, or None if not enough data."""
+        if not LLM_HEDGE_ENABLED or len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.percentile(95), LLM_HEDGE_MIN_DELAY)
+    
+    def snapshot(self) -> Dict:
+        """Summary used in metrics."""
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            "calls": len(self.outcomes),
+            "p50_seconds": round(p50, 2) if p50 is not None else None,
+            "p95_seconds": round(p95, 2) if p95 is not None else None,
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+# Latency trackers keyed by (agent_name, model)
+_latency_trackers: Dict[tuple, LatencyTracker] = {}
+
+
+def get_latency_tracker(agent_name: str, model: str) -> LatencyTracker:
+    """Get (or create) the latency tracker of an (agent, model) pair."""
+    key = (agent_name, model)
+    if key not in _latency_trackers:
+        _latency_trackers[key] = LatencyTracker()
+    return _latency_trackers[key]
+
+# Rolling average of completion tokens per agent, used to estimate stream progress
+_completion_token_averages: Dict[str, float] = {}
+
+
+def _http2_enabled() -> bool:
+    """Whether HTTP/2 is both requested and supported by the installed packages."""
+    return LLM_HTTP2_ENABLED and HTTP2_AVAILABLE
+
+
+def _build_limits() -> httpx.Limits:
+    """Build connection pool limits from configuration."""
+    return httpx.Limits(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _build_headers() -> Dict[str, str]:
+    """Default headers sent with every chat-completions request."""
+    return {
+        "Authorization": f"Bearer {STUDENT_PORTAL_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+def _build_timeout(timeout: float) -> httpx.Timeout:
+    """Per-request timeout with a short connect phase."""
+    return httpx.Timeout(timeout, connect=min(timeout, LLM_CONNECT_TIMEOUT))
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the shared async client, creating it on first use.
+    
+    Returns:
+        Process-wide httpx.AsyncClient with keep-alive pooling
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(
+                http2=_http2_enabled(),
+                limits=_build_limits(),
+                headers=_build_headers(),
+                timeout=_build_timeout(180.0),
+            )
+            _metrics["clients_created"] += 1
+        return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    """
+    Get the shared sync client, creating it on first use.
+    
+    Returns:
+        Process-wide httpx.Client with the same pool settings as the async client
+    """
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                http2=_http2_enabled(),
+                limits=_build_limits(),
+                headers=_build_headers(),
+                timeout=_build_timeout(180.0),
+            )
+            _metrics["clients_created"] += 1
+        return _sync_client
+
+
+async def open_llm_client() -> None:
+    """Create the shared async client at application startup."""
+    get_async_client()
+
+
+async def close_llm_client() -> None:
+    """Close the shared clients at application shutdown."""
+    global _async_client, _sync_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    if _sync_client is not None and not _sync_client.is_closed:
+        _sync_client.close()
+    _sync_client = None
+
+
+def _request_started() -> None:
+    _metrics["requests_total"] += 1
+    _metrics["in_flight"] += 1
+    _metrics["max_in_flight"] = max(_metrics["max_in_flight"], _metrics["in_flight"])
+
+
+def _request_finished(failed: bool) -> None:
+    _metrics["in_flight"] -= 1
+    if failed:
+        _metrics["requests_failed"] += 1
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Whether an error means the upstream is degraded (counts toward the circuit breaker)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 408
+    return isinstance(error, (httpx.TransportError, StreamStalledError))
+
+
+@contextmanager
+def _circuit_guard():
+    """
+    Admit one upstream attempt through the circuit breaker and report its outcome.
+    
+    Raises:
+        CircuitOpenError: While the breaker is open
+    """
+    breaker = get_circuit_breaker()
+    try:
+        breaker.before_call()
+    except Exception:
+        _metrics["circuit_rejections"] += 1
+        raise
+    try:
+        yield
+    except Exception as e:
+        if _is_upstream_failure(e):
+            breaker.record_failure(e)
+        elif isinstance(e, httpx.HTTPStatusError):
+            breaker.record_success()  # A 4xx answer still means the upstream is up
+        else:
+            breaker.release()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+
+
+async def post_chat_completion(payload: Dict, timeout: float) -> Dict:
+    """
+    POST a chat-completions payload using the shared async client.
+    
+    Args:
+        payload: Chat-completions request body
+        timeout: Request timeout in seconds
+    
+    Returns:
+        Decoded JSON response
+    
+    Raises:
+        httpx.HTTPError: On transport errors or non-2xx responses
+        CircuitOpenError: While the circuit breaker is open
+    """
+    with _circuit_guard():
+        client = get_async_client()
+        limiter = get_rate_limiter()
+        estimated_tokens = estimate_tokens(payload)
+        await limiter.acquire(payload.get("model", ""), estimated_tokens)
+        _request_started()
+        failed = True
+        try:
+            response = await client.post(
+                CHAT_COMPLETIONS_ENDPOINT,
+                json=payload,
+                timeout=_build_timeout(timeout),
+            )
+            response.raise_for_status()
+            result = response.json()
+            failed = False
+            await limiter.arefund(payload.get("model", ""), estimated_tokens, (result.get("usage") or {}).get("total_tokens"))
+            return result
+        finally:
+            _request_finished(failed)
+
+
+async def stream_chat_completion(
+    payload: Dict,
+    timeout: float,
+    on_delta: Callable[[str], None]
+) -> Dict:
+    """
+    POST a chat-completions payload with stream=True and collect the deltas.
+    
+    Args:
+        payload: Chat-completions request body
+        timeout: Request timeout in seconds
+        on_delta: Called with each content delta as it arrives
+    
+    Returns:
+        Response shaped like a non-streaming completion, so callers can parse
+        choices[0].message.content unchanged
+    
+    Raises:
+        httpx.HTTPError: On transport errors or non-2xx responses
+        StreamStalledError: When no token arrives within the idle timeout
+        CircuitOpenError: While the circuit breaker is open
+    """
+    with _circuit_guard():
+        client = get_async_client()
+        limiter = get_rate_limiter()
+        estimated_tokens = estimate_tokens(payload)
+        await limiter.acquire(payload.get("model", ""), estimated_tokens)
+        _request_started()
+        _metrics["streamed_requests"] += 1
+        failed = True
+        chunks = []
+        usage = {}
+        try:
+            async with client.stream(
+                "POST",
+                CHAT_COMPLETIONS_ENDPOINT,
+                # Ask for the usage chunk so token and prefix-cache counts are recorded
+                json={**payload, "stream": True, "stream_options": {"include_usage": True}},
+                timeout=_build_timeout(timeout),
+            ) as response:
+                response.raise_for_status()
+                lines = response.aiter_lines()
+                while True:
+                    # Fail fast on a stalled stream instead of waiting out the read timeout
+                    idle_timeout = LLM_STREAM_IDLE_TIMEOUT if chunks else LLM_STREAM_FIRST_TOKEN_TIMEOUT
+                    try:
+                        line = await asyncio.wait_for(lines.__anext__(), timeout=idle_timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        _metrics["stream_stalls"] += 1
+                        raise StreamStalledError(f"No tokens received for {idle_timeout:.0f}s")
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("usage"):
+                        usage = event["usage"]
+                    for choice in event.get("choices", []):
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            chunks.append(delta)
+                            on_delta(delta)
+            failed = False
+            await limiter.arefund(payload.get("model", ""), estimated_tokens, usage.get("total_tokens"))
+            return {
+                "choices": [{"message": {"role": "assistant", "content": "".join(chunks)}}],
+                "usage": usage,
+            }
+        finally:
+            _request_finished(failed)
+
+
+def post_chat_completion_sync(payload: Dict, timeout: float) -> Dict:
+    """
+    POST a chat-completions payload using the shared sync client.
+    
+    Args:
+        payload: Chat-completions request body
+        timeout: Request timeout in seconds
+    
+    Returns:
+        Decoded JSON response
+    
+    Raises:
+        httpx.HTTPError: On transport errors or non-2xx responses
+        CircuitOpenError: While the circuit breaker is open
+    """
+    with _circuit_guard():
+        client = get_sync_client()
+        limiter = get_rate_limiter()
+        estimated_tokens = estimate_tokens(payload)
+        limiter.acquire_sync(payload.get("model", ""), estimated_tokens)
+        _request_started()
+        failed = True
+        try:
+            response = client.post(
+                CHAT_COMPLETIONS_ENDPOINT,
+                json=payload,
+                timeout=_build_timeout(timeout),
+            )
+            response.raise_for_status()
+            result = response.json()
+            failed = False
+            limiter.refund(payload.get("model", ""), estimated_tokens, (result.get("usage") or {}).get("total_tokens"))
+            return result
+        finally:
+            _request_finished(failed)
+
+
+class StreamProgress:
+    """Turns streamed deltas into token-based progress, ETA and completed sections."""
+    
+    # Minimum seconds between progress reports that carry no new section
+    REPORT_INTERVAL = 0.5
+    
+    def __init__(self, agent_name: str, max_tokens: int, callback: Callable[[Dict], None]):
+        """
+        Initialize the progress tracker for one streamed call.
+        
+        Args:
+            agent_name: Agent identifier used for the expected-length estimate
+            max_tokens: Requested max_tokens, the fallback length estimate
+            callback: Called with progress updates (see _build_update)
+        """
+        self.agent_name = agent_name
+        self.expected_tokens = max(1, int(_completion_token_averages.get(agent_name, max_tokens * 0.6)))
+        self.callback = callback
+        self.parser = StreamingSectionParser()
+        self.tokens = 0
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        self._last_report = 0.0
+    
+    def on_delta(self, delta: str) -> None:
+        """Record one streamed delta and report progress when due."""
+        now = time.monotonic()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.tokens += 1
+        sections = self.parser.feed(delta)
+        
+        if sections or now - self._last_report >= self.REPORT_INTERVAL:
+            self._last_report = now
+            self.callback(self._build_update(now, sections))
+    
+    def finish(self) -> None:
+        """Report the final update once the stream has completed."""
+        update = self._build_update(time.monotonic(), self.parser.feed(""))
+        update["fraction"] = 1.0
+        update["eta_seconds"] = 0.0
+        self.callback(update)
+    
+    def _build_update(self, now: float, sections: Dict) -> Dict:
+        """Build a progress update for the callback."""
+        fraction = min(self.tokens / self.expected_tokens, 0.99)
+        eta_seconds = None
+        if self.first_token_at is not None and now > self.first_token_at:
+            tokens_per_second = self.tokens / (now - self.first_token_at)
+            remaining = max(self.expected_tokens - self.tokens, 0)
+            eta_seconds = round(remaining / tokens_per_second, 1) if tokens_per_second else None
+        
+        return {
+            "tokens": self.tokens,
+            "expected_tokens": self.expected_tokens,
+            "fraction": round(fraction, 3),
+            "elapsed_seconds": round(now - self.started_at, 1),
+            "eta_seconds": eta_seconds,
+            "sections": sections,
+        }
+
+
+def _record_completion_tokens(agent_name: str, result: Dict, streamed_tokens: int = 0) -> None:
+    """Update the rolling completion-length estimate for an agent."""
+    tokens = (result.get("usage") or {}).get("completion_tokens") or streamed_tokens
+    if not tokens:
+        return
+    previous = _completion_token_averages.get(agent_name)
+    _completion_token_averages[agent_name] = tokens if previous is None else 0.7 * previous + 0.3 * tokens
+
+
+def _is_cacheable(result: Dict) -> bool:
+    """Only complete responses with message content are worth caching."""
+    try:
+        return bool(result["choices"][0]["message"]["content"])
+    except (KeyError, IndexError, TypeError):
+        return False
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed upstream call should be retried."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, StreamStalledError))
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the upstream sends it."""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), LLM_RETRY_MAX_DELAY))
+    return delay
+
+
+async def _with_retries(call: Callable[[], Awaitable[Dict]]) -> Dict:
+    """
+    Await call(), retrying retryable failures with jittered exponential backoff.
+    
+    Args:
+        call: Creates a fresh upstream attempt
+    
+    Returns:
+        Result of the first successful attempt
+    """
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            _metrics["retries"] += 1
+            await asyncio.sleep(_backoff_delay(attempt, e))
+            attempt += 1
+
+
+async def _timed(tracker: LatencyTracker, call: Awaitable[Dict]) -> Dict:
+    """Await an upstream call and record its latency and outcome."""
+    started = time.monotonic()
+    try:
+        result = await call
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        tracker.record(None, ok=False)
+        raise
+    tracker.record(time.monotonic() - started, ok=True)
+    return result
+
+
+async def _hedged_post(payload: Dict, timeout: float, agent_name: str) -> Dict:
+    """
+    POST a completion, firing a duplicate once the call outlives the agent's p95.
+    
+    Whichever request answers first wins and the other is cancelled.
+    
+    Args:
+        payload: Chat-completions request body
+        timeout: Request timeout in seconds
+        agent_name: Agent identifier used for latency tracking
+    
+    Returns:
+        Decoded JSON response
+    """
+    tracker = get_latency_tracker(agent_name, payload.get("model", ""))
+    hedge_delay = tracker.hedge_delay()
+    if hedge_delay is None:
+        return await _timed(tracker, post_chat_completion(payload, timeout))
+    
+    primary = asyncio.ensure_future(_timed(tracker, post_chat_completion(payload, timeout)))
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+        if done:
+            return primary.result()
+        
+        _metrics["hedges_fired"] += 1
+        hedge = asyncio.ensure_future(_timed(tracker, post_chat_completion(payload, timeout)))
+        pending.add(hedge)
+        last_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        _metrics["hedges_won"] += 1
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _single_flight(key: str, factory: Callable[[], Awaitable[Dict]]) -> Dict:
+    """
+    Run factory() once per key among concurrent callers.
+    
+    The first caller (leader) starts the upstream call as a task; callers that
+    arrive while it is in flight (followers) await the same task. The task is
+    shielded, so a cancelled caller does not cancel it for the others; when
+    the last caller is cancelled, the upstream call is cancelled too.
+    
+    Args:
+        key: Request fingerprint
+        factory: Creates the upstream coroutine
+    
+    Returns:
+        The shared result
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+        
+        def _done(finished: "asyncio.Task") -> None:
+            _inflight.pop(key, None)
+            if not finished.cancelled():
+                finished.exception()  # Mark as retrieved if every caller went away
+        
+        task.add_done_callback(_done)
+    else:
+        _metrics["coalesced_followers"] += 1
+    
+    _inflight_waiters[task] = _inflight_waiters.get(task, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if _inflight_waiters.get(task) == 1 and not task.done():
+            task.cancel()
+        raise
+    finally:
+        _inflight_waiters[task] -= 1
+        if not _inflight_waiters[task]:
+            del _inflight_waiters[task]
+
+
+async def chat_completion(
+    payload: Dict,
+    timeout: float,
+    agent_name: str,
+    progress_callback: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Run a chat completion for an agent through the shared async client.
+    
+    Identical requests are answered from the shared response cache (read
+    and written in a thread, off the event loop), and identical requests
+    already in flight in this worker share one upstream
+    call. Retryable failures are retried with jittered exponential backoff;
+    non-streamed calls that outlive the agent's p95 latency are hedged, and
+    streamed calls that stop sending tokens are re-issued. When streaming is
+    enabled and a progress callback is given, the completion is streamed and
+    the callback receives token-based progress updates with any top-level
+    JSON sections that finished parsing.
+    
+    Args:
+        payload: Chat-completions request body
+        timeout: Request timeout in seconds
+        agent_name: Agent identifier (e.g. "agent2") for per-agent statistics
+        progress_callback: Optional callback for streamed progress updates
+    
+    Returns:
+        Decoded (or reassembled) chat-completions response
+    """
+    cache = get_response_cache()
+    cached = await asyncio.to_thread(cache.get, payload)
+    if cached is not None:
+        _metrics["cache_hits"] += 1
+        record_usage(agent_name, payload, cached, from_cache=True)
+        return cached
+    
+    async def stream_attempt() -> Dict:
+        # A fresh tracker per attempt, so a re-issued stream restarts its progress
+        progress = StreamProgress(agent_name, payload.get("max_tokens", 4000), progress_callback)
+        tracker = get_latency_tracker(agent_name, payload.get("model", ""))
+        result = await _timed(tracker, stream_chat_completion(payload, timeout, progress.on_delta))
+        progress.finish()
+        _record_completion_tokens(agent_name, result, progress.tokens)
+        return result
+    
+    async def fetch() -> Dict:
+        if progress_callback is not None and LLM_STREAMING_ENABLED:
+            result = await _with_retries(stream_attempt)
+        else:
+            result = await _with_retries(lambda: _hedged_post(payload, timeout, agent_name))
+            _record_completion_tokens(agent_name, result)
+        
+        if _is_cacheable(result):
+            await asyncio.to_thread(cache.put, payload, result)
+        return result
+    
+    result = await _single_flight(cache_key(payload), fetch)
+    record_usage(agent_name, payload, result)
+    return result
+
+
+def chat_completion_sync(payload: Dict, timeout: float, agent_name: str) -> Dict:
+    """
+    Run a chat completion for an agent through the shared sync client.
+    
+    Args:
+        payload: Chat-completions request body
+        timeout: Request timeout in seconds
+        agent_name: Agent identifier (e.g. "agent2") for per-agent statistics
+    
+    Returns:
+        Decoded chat-completions response
+    """
+    cache = get_response_cache()
+    cached = cache.get(payload)
+    if cached is not None:
+        _metrics["cache_hits"] += 1
+        record_usage(agent_name, payload, cached, from_cache=True)
+        return cached
+    
+    attempt = 0
+    while True:
+        try:
+            result = post_chat_completion_sync(payload, timeout)
+            break
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            _metrics["retries"] += 1
+            time.sleep(_backoff_delay(attempt, e))
+            attempt += 1
+    _record_completion_tokens(agent_name, result)
+    record_usage(agent_name, payload, result)
+    
+    if _is_cacheable(result):
+        cache.put(payload, result)
+    return result
+
+
+def _pool_occupancy(client) -> Dict:
+    """Inspect the underlying httpcore pool for connection occupancy."""
+    if client is None or client.is_closed:
+        return {"open": False}
+    
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for conn in connections if conn.is_idle())
+    return {
+        "open": True,
+        "connections": len(connections),
+        "active_connections": len(connections) - idle,
+        "idle_connections": idle,
+        "utilization": round((len(connections) - idle) / LLM_POOL_MAX_CONNECTIONS, 3),
+    }
+
+
+def get_pool_metrics() -> Dict:
+    """
+    Get connection pool configuration, occupancy and request counters.
+    
+    Returns:
+        Dictionary with pool metrics for both shared clients
+    """
+    return {
+        "endpoint": CHAT_COMPLETIONS_ENDPOINT,
+        "http2": _http2_enabled(),
+        "limits": {
+            "max_connections": LLM_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": LLM_POOL_MAX_KEEPALIVE,
+            "keepalive_expiry": LLM_POOL_KEEPALIVE_EXPIRY,
+        },
+        "requests": dict(_metrics),
+        "streaming_enabled": LLM_STREAMING_ENABLED,
+        "inflight_fingerprints": len(_inflight),
+        "circuit_breaker": get_circuit_breaker().snapshot(),
+        "prompt_cache": prompt_cache_stats(),
+        "async_pool": _pool_occupancy(_async_client),
+        "sync_pool": _pool_occupancy(_sync_client),
+        "latency": {
+            f"{agent}:{model}": tracker.snapshot()
+            for (agent, model), tracker in _latency_trackers.items()
+        },
+    }
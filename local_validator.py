@@ -0,0 +1,323 @@
+"""Deterministic local validator for resume and project materials (Agent 1 fast path)."""
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# Section header keywords, matched against the whole (normalized) header line
+SECTION_HEADERS = {
+    "projects": [
+        "project experience", "projects", "project", "项目经验", "项目经历", "项目",
+    ],
+    "work": [
+        "professional experience", "work experience", "internship experience", "work history",
+        "employment history", "experience", "employment", "internships", "internship",
+        "工作经历", "工作经验", "工作履历", "职业经历", "实习经历", "实习经验",
+    ],
+    "education": [
+        "educational background", "academic background", "education", "qualifications",
+        "教育背景", "教育经历", "学历", "教育",
+    ],
+    "other": [
+        "technical skills", "professional skills", "skills", "certifications", "awards", "honors",
+        "languages", "interests", "references", "summary", "profile", "objective", "contact",
+        "技能", "专业技能", "证书", "获奖", "荣誉", "自我评价", "个人信息", "联系方式",
+    ],
+}
+
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+_DATE = rf"(?:{_MONTH}\s*)?(?:19|20)\d{{2}}(?:\s*[./年-]\s*\d{{1,2}}\s*月?)?"
+_DATE_END = rf"(?:{_DATE}|present|current|now|today|至今|现在)"
+DATE_RANGE_RE = re.compile(rf"{_DATE}\s*(?:-|–|—|~|to|至)\s*{_DATE_END}", re.IGNORECASE)
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(r"(?:\+\d{1,3}[\s-]?)?(?:\(\d{2,4}\)\s?)?\d{3,4}[\s-]?\d{3,4}[\s-]?\d{3,4}")
+LINKEDIN_RE = re.compile(r"linkedin\.com/in/", re.IGNORECASE)
+
+BULLET_RE = re.compile(r"^\s*(?:[•\-*·▪●◦]|\d+[.)、])\s+")
+FIELD_SEPARATOR_RE = re.compile(r"\s*(?:\||｜|·|@|\t|,|，| at | - | – | — )\s*", re.IGNORECASE)
+
+DEGREE_RE = re.compile(
+    r"\b(?:bachelor|master|ph\.?d|doctor|mba|b\.?s\.?c?|m\.?s\.?c?|b\.?a|m\.?a|b\.?eng|m\.?eng|"
+    r"associate|diploma)\b|学士|硕士|博士|本科|研究生|专科",
+    re.IGNORECASE
+)
+INSTITUTION_RE = re.compile(
+    r"\b(?:university|college|institute|school|academy|polytechnic)\b|大学|学院|学校",
+    re.IGNORECASE
+)
+
+PROJECT_START_RE = re.compile(
+    r"^\s*(?:#+\s*\S|project\s*(?:\d+|[ivx]+)\b|project\s*(?:name|title)\s*[:：]|"
+    r"项目\s*[一二三四五六七八九十\d]+|项目名称\s*[:：]|\d+[.)、]\s*\S)",
+    re.IGNORECASE
+)
+PROJECT_TOPIC_RE = re.compile(r"topic|theme|title|name|overview|background|主题|名称|背景|简介", re.IGNORECASE)
+PROJECT_OBJECTIVE_RE = re.compile(r"objective|goal|aim|purpose|target|目标|目的", re.IGNORECASE)
+PROJECT_PROCESS_RE = re.compile(
+    r"process|workflow|method|approach|step|implement|pipeline|built|developed|designed|"
+    r"流程|方法|步骤|实施|过程",
+    re.IGNORECASE
+)
+
+
+class LocalInputValidator:
+    """
+    Rule-based resume validator that returns the AGENT1_INPUT_VALIDATION_PROMPT schema.
+    
+    Sections are found by header detection (like ResumeExporter._is_section_header),
+    entries by date ranges and field separators, contact info and projects by
+    regexes. Every result carries a confidence in [0, 1]; the caller should
+    fall back to the LLM validator when it is low.
+    """
+    
+    # Confidence penalties for each kind of uncertainty
+    PENALTY_NO_HEADER = 0.2
+    PENALTY_INCOMPLETE_ENTRY = 0.15
+    PENALTY_UNSEGMENTED_PROJECTS = 0.15
+    PENALTY_SHORT_TEXT = 0.3
+    # Negative verdicts are never trusted locally above this confidence
+    MAX_CONFIDENCE_WHEN_INVALID = 0.6
+    
+    def _section_of(self, line: str) -> Optional[str]:
+        """Return the section a header line opens, or None if the line is not a header."""
+        normalized = line.strip().strip("#*=:：-_ ").strip().lower()
+        if not normalized or len(normalized) > 40:
+            return None
+        for section, headers in SECTION_HEADERS.items():
+            for header in headers:
+                if normalized == header:
+                    return section
+        # Short all-caps lines without digits or separators are headers of unknown sections
+        if line.strip().isupper() and len(normalized.split()) <= 4 and not re.search(r"[\d|@]", line):
+            return "other"
+        return None
+    
+    def _split_sections(self, lines: List[str]) -> Dict[str, List[str]]:
+        """Group lines under the section header that precedes them."""
+        sections: Dict[str, List[str]] = {}
+        current = "preamble"
+        for line in lines:
+            section = self._section_of(line)
+            if section:
+                current = section
+                sections.setdefault(current, [])
+                continue
+            sections.setdefault(current, []).append(line)
+        return sections
+    
+    def _fields(self, text: str) -> List[str]:
+        """Split an entry line into fields that contain letters or CJK characters."""
+        text = DATE_RANGE_RE.sub(" ", BULLET_RE.sub("", text))
+        text = re.sub(r"[()（）\[\]]", " ", text)
+        return [
+            part.strip() for part in FIELD_SEPARATOR_RE.split(text)
+            if re.search(r"[A-Za-z一-鿿]{2,}", part or "")
+        ]
+    
+    def _work_entries(self, lines: List[str]) -> Tuple[int, List[str], int]:
+        """
+        Find work entries as lines with a date range plus a title and a company.
+        
+        Returns:
+            Tuple of (entry count, issues, bullet count)
+        """
+        count = 0
+        issues = []
+        bullets = 0
+        for i, line in enumerate(lines):
+            if BULLET_RE.match(line):
+                bullets += 1
+                continue
+            if not DATE_RANGE_RE.search(line):
+                continue
+            count += 1
+            fields = self._fields(line)
+            if len(fields) < 2 and i > 0 and lines[i - 1].strip() and not BULLET_RE.match(lines[i - 1]) \
+                    and not DATE_RANGE_RE.search(lines[i - 1]):
+                fields += self._fields(lines[i - 1])
+            if len(fields) < 2:
+                issues.append(f"Work experience entry \"{line.strip()[:60]}\" is missing the job title or company name")
+        
+        if count == 0:
+            # Entries without dates: "Title | Company" lines
+            for line in lines:
+                if not BULLET_RE.match(line) and len(self._fields(line)) >= 2 and ("|" in line or " at " in line):
+                    count += 1
+                    issues.append(f"Work experience entry \"{line.strip()[:60]}\" is missing the time period")
+        return count, issues, bullets
+    
+    def _education_entries(self, lines: List[str]) -> Tuple[int, List[str]]:
+        """
+        Find education entries as lines naming a degree next to an institution.
+        
+        Returns:
+            Tuple of (entry count, issues)
+        """
+        count = 0
+        issues = []
+        for i, line in enumerate(lines):
+            if not DEGREE_RE.search(line):
+                continue
+            count += 1
+            nearby = " ".join(lines[max(0, i - 1):i + 2])
+            if not INSTITUTION_RE.search(nearby):
+                issues.append(f"Education entry \"{line.strip()[:60]}\" is missing the institution name")
+        return count, issues
+    
+    def _split_projects(self, project_materials: str) -> Tuple[List[List[str]], bool]:
+        """
+        Split project materials into projects.
+        
+        Returns:
+            Tuple of (projects as line lists, whether explicit project headings were found)
+        """
+        lines = [line for line in project_materials.splitlines() if line.strip()]
+        starts = [i for i, line in enumerate(lines) if PROJECT_START_RE.match(line) and not BULLET_RE.match(line)]
+        if len(starts) < 1:
+            return ([lines] if lines else []), False
+        if starts[0] != 0:
+            starts.insert(0, 0)
+        projects = [lines[start:end] for start, end in zip(starts, starts[1:] + [len(lines)])]
+        # Headings alone (e.g. numbered sub-steps inside one project) do not make a project
+        return [p for p in projects if len(p) > 1] or [lines], True
+    
+    def _project_issues(self, project: List[str], index: int) -> List[str]:
+        """Check one project for topic, objectives and process."""
+        text = "\n".join(project)
+        missing = []
+        if not (len(project[0].strip()) >= 3 or PROJECT_TOPIC_RE.search(text)):
+            missing.append("project topic/theme")
+        if not PROJECT_OBJECTIVE_RE.search(text):
+            missing.append("objectives/goals")
+        if not PROJECT_PROCESS_RE.search(text):
+            missing.append("main process/workflow")
+        if missing:
+            return [f"Project {index} (\"{project[0].strip()[:40]}\") is missing: {', '.join(missing)}"]
+        return []
+    
+    def validate(self, resume_text: str, project_materials: Optional[str] = None) -> Dict:
+        """
+        Validate resume and project materials without calling the LLM.
+        
+        Args:
+            resume_text: Resume content text
+            project_materials: Optional project materials text
+        
+        Returns:
+            Validation result in the Agent 1 schema, plus "confidence",
+            "has_contact_info" and "validation_source"
+        """
+        lines = [line for line in (resume_text or "").splitlines() if line.strip()]
+        sections = self._split_sections(lines)
+        confidence = 1.0
+        
+        # CJK text is denser, so each CJK character counts as three
+        text_length = len((resume_text or "").strip()) + 2 * len(re.findall(r"[一-鿿]", resume_text or ""))
+        if text_length < 200:
+            confidence -= self.PENALTY_SHORT_TEXT
+        
+        # Work experience: prefer the section, otherwise scan everything outside education
+        work_lines = sections.get("work")
+        if work_lines is None:
+            confidence -= self.PENALTY_NO_HEADER
+            work_lines = [line for name, body in sections.items() if name not in ("education", "projects") for line in body]
+        work_count, work_issues, work_bullets = self._work_entries(work_lines)
+        
+        # Education: prefer the section, otherwise scan everything
+        education_lines = sections.get("education")
+        if education_lines is None:
+            confidence -= self.PENALTY_NO_HEADER
+            education_lines = lines
+        education_count, education_issues = self._education_entries(education_lines)
+        
+        complete_work = work_count - len(work_issues)
+        complete_education = education_count - len(education_issues)
+        if work_issues or education_issues:
+            confidence -= self.PENALTY_INCOMPLETE_ENTRY
+        
+        # Project materials
+        materials_provided = bool(project_materials and project_materials.strip())
+        project_issues = []
+        project_count = 0
+        complete_projects = 0
+        if materials_provided:
+            projects, segmented = self._split_projects(project_materials)
+            if not segmented:
+                confidence -= self.PENALTY_UNSEGMENTED_PROJECTS
+            project_count = len(projects)
+            for index, project in enumerate(projects, 1):
+                issues = self._project_issues(project, index)
+                project_issues.extend(issues)
+                if not issues:
+                    complete_projects += 1
+        
+        has_contact_info = bool(EMAIL_RE.search(resume_text or "") or PHONE_RE.search(resume_text or "")
+                                or LINKEDIN_RE.search(resume_text or ""))
+        
+        missing_sections = []
+        if work_count == 0:
+            missing_sections.append("work_experience")
+        if education_count == 0:
+            missing_sections.append("education")
+        
+        is_valid = (
+            complete_work >= 1
+            and complete_education >= 1
+            and (not materials_provided or complete_projects >= 1)
+        )
+        
+        recommendations = []
+        if work_count == 0:
+            recommendations.append("Add at least one work or internship entry with job title, company and dates")
+        elif work_issues:
+            recommendations.append("Make sure each work entry lists job title, company and time period")
+        elif work_bullets == 0:
+            recommendations.append("Add bullet points describing responsibilities and achievements for each role")
+        if education_count == 0:
+            recommendations.append("Add an education entry with degree and institution name")
+        elif education_issues:
+            recommendations.append("Make sure each education entry names both the degree and the institution")
+        if materials_provided and complete_projects == 0:
+            recommendations.append("Describe each project's topic, objectives and main process/workflow")
+        if not has_contact_info:
+            recommendations.append("Add contact information (email or phone number)")
+        
+        if is_valid:
+            summary = (
+                f"Resume contains {complete_work} complete work experience entr{'y' if complete_work == 1 else 'ies'} "
+                f"and {complete_education} complete education entr{'y' if complete_education == 1 else 'ies'}"
+            )
+            if materials_provided:
+                summary += f"; {complete_projects} of {project_count} projects are complete"
+        else:
+            problems = [s.replace("_", " ") for s in missing_sections]
+            if work_count and complete_work == 0:
+                problems.append("incomplete work experience")
+            if education_count and complete_education == 0:
+                problems.append("incomplete education")
+            if materials_provided and complete_projects == 0:
+                problems.append("incomplete project materials")
+            summary = f"Validation failed: {', '.join(problems)}"
+        
+        if not is_valid:
+            confidence = min(confidence, self.MAX_CONFIDENCE_WHEN_INVALID)
+        
+        return {
+            "is_valid": is_valid,
+            "has_work_experience": work_count > 0,
+            "work_experience_count": work_count,
+            "work_experience_issues": work_issues,
+            "has_education": education_count > 0,
+            "education_count": education_count,
+            "education_issues": education_issues,
+            "has_project_materials": complete_projects > 0,
+            "project_materials_provided": materials_provided,
+            "project_count": project_count,
+            "project_issues": project_issues,
+            "missing_sections": missing_sections,
+            "validation_summary": summary,
+            "recommendations": recommendations,
+            "has_contact_info": has_contact_info,
+            "confidence": round(max(0.0, confidence), 2),
+            "validation_source": "local",
+        }
@@ -0,0 +1,250 @@
+"""Latency-aware model routing for the agents."""
+import contextvars
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import (
+    LLM_ROUTING_ENABLED,
+    LLM_ROUTING_MIN_SAMPLES,
+    LLM_ROUTING_MAX_ERROR_RATE,
+    LLM_ROUTING_DEFAULT_SLO,
+    LLM_ROUTING_POLICIES,
+    TOKEN_BUDGET_ENABLED,
+    LLM_MIN_OUTPUT_TOKENS,
+    LLM_CONTEXT_SAFETY_TOKENS,
+)
+from llm_client import get_latency_tracker
+from rate_limiter import estimate_prompt_tokens
+from token_budget import calibration, clamp_max_tokens, context_window, count_message_tokens
+
+# Routing decisions made in the current context. A workflow sets this to a
+# list so every decision taken by its agents is recorded for auditing.
+routing_decisions: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar(
+    "routing_decisions", default=None
+)
+
+
+def _load_policies() -> Dict[str, Dict]:
+    try:
+        policies = json.loads(LLM_ROUTING_POLICIES)
+    except json.JSONDecodeError:
+        print("⚠️  Warning: LLM_ROUTING_POLICIES is not valid JSON, using defaults")
+        policies = {}
+    return policies if isinstance(policies, dict) else {}
+
+
+class ModelRouter:
+    """
+    Picks, per call, the cheapest candidate model of an agent whose predicted
+    latency meets the agent's SLO.
+    
+    Prediction uses the rolling p95 of the (agent, model) latency tracker,
+    scaled up when the input is larger than the inputs that model usually
+    sees. Models with too few samples are tried optimistically so they can
+    collect data; models with a high error rate, an input limit below the
+    request size or a context window that cannot hold the prompt plus
+    LLM_MIN_OUTPUT_TOKENS are skipped.
+    """
+    
+    def __init__(
+        self,
+        policies: Optional[Dict[str, Dict]] = None,
+        enabled: bool = LLM_ROUTING_ENABLED
+    ):
+        """
+        Initialize the router.
+        
+        Args:
+            policies: Per-agent {"models", "latency_slo", "max_input_tokens"} policies
+            enabled: Whether routing is applied (otherwise the default model is used)
+        """
+        self.policies = policies if policies is not None else _load_policies()
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._input_sizes: Dict[tuple, float] = {}
+        self._decisions = {}
+    
+    def policy(self, agent_name: str, default_model: str) -> Dict:
+        """Routing policy of an agent; the default model is always the last resort."""
+        policy = self.policies.get(agent_name, {})
+        models = list(policy.get("models") or [])
+        if default_model not in models:
+            models.append(default_model)
+        return {
+            "models": models,
+            "latency_slo": float(policy.get("latency_slo", LLM_ROUTING_DEFAULT_SLO)),
+            "max_input_tokens": policy.get("max_input_tokens", {}),
+        }
+    
+    def _size_factor(self, agent_name: str, model: str, input_tokens: int) -> float:
+        """How much larger this input is than the model's usual input for the agent."""
+        usual = self._input_sizes.get((agent_name, model))
+        if not usual:
+            return 1.0
+        return max(1.0, input_tokens / usual)
+    
+    def _evaluate(
+        self,
+        agent_name: str,
+        model: str,
+        input_tokens: int,
+        policy: Dict,
+        prompt_tokens: Optional[int] = None,
+        min_output_tokens: int = LLM_MIN_OUTPUT_TOKENS
+    ) -> Dict:
+        """Check one candidate model against the policy and, if prompt_tokens is given, its context window."""
+        tracker = get_latency_tracker(agent_name, model)
+        p50 = tracker.percentile(50)
+        p95 = tracker.percentile(95)
+        candidate = {
+            "model": model,
+            "samples": len(tracker.latencies),
+            "p50_seconds": round(p50, 2) if p50 is not None else None,
+            "p95_seconds": round(p95, 2) if p95 is not None else None,
+            "error_rate": round(tracker.error_rate(), 3),
+            "predicted_seconds": None,
+            "eligible": True,
+            "fits": True,
+            "reason": "meets latency SLO",
+        }
+        
+        if prompt_tokens is not None:
+            window = context_window(model)
+            model_prompt_tokens = int(math.ceil(prompt_tokens * calibration(model)))
+            if window - model_prompt_tokens - LLM_CONTEXT_SAFETY_TOKENS < min_output_tokens:
+                candidate.update(
+                    eligible=False,
+                    fits=False,
+                    reason=f"prompt of ~{model_prompt_tokens} tokens leaves less than {min_output_tokens} "
+                           f"output tokens in its {window}-token window"
+                )
+                return candidate
+        
+        limit = policy["max_input_tokens"].get(model)
+        if limit and input_tokens > limit:
+            candidate.update(eligible=False, reason=f"input of ~{input_tokens} tokens exceeds {limit}")
+            return candidate
+        if len(tracker.outcomes) >= LLM_ROUTING_MIN_SAMPLES and tracker.error_rate() > LLM_ROUTING_MAX_ERROR_RATE:
+            candidate.update(eligible=False, reason="error rate above threshold")
+            return candidate
+        if len(tracker.latencies) < LLM_ROUTING_MIN_SAMPLES or p95 is None:
+            candidate["reason"] = "not enough latency samples yet"
+            return candidate
+        
+        predicted = p95 * self._size_factor(agent_name, model, input_tokens)
+        candidate["predicted_seconds"] = round(predicted, 2)
+        if predicted > policy["latency_slo"]:
+            candidate.update(eligible=False, reason="predicted latency above SLO")
+        return candidate
+    
+    def route(self, agent_name: str, payload: Dict) -> Dict:
+        """
+        Choose the model for a request.
+        
+        Args:
+            agent_name: Agent identifier (e.g. "agent2")
+            payload: Chat-completions request body carrying the agent's default model
+        
+        Returns:
+            Routing decision with the chosen model and the candidates considered
+        """
+        default_model = payload.get("model", "")
+        input_tokens = estimate_prompt_tokens(payload)
+        decision = {
+            "agent": agent_name,
+            "default_model": default_model,
+            "model": default_model,
+            "input_tokens": input_tokens,
+            "reason": "routing disabled",
+            "timestamp": time.time(),
+        }
+        if not self.enabled:
+            return decision
+        
+        policy = self.policy(agent_name, default_model)
+        prompt_tokens = None
+        min_output_tokens = LLM_MIN_OUTPUT_TOKENS
+        if TOKEN_BUDGET_ENABLED:
+            # The prompt was fitted for the default model; other models must hold it as it is
+            prompt_tokens = count_message_tokens(payload.get("messages", []))
+            min_output_tokens = min(int(payload.get("max_tokens") or LLM_MIN_OUTPUT_TOKENS), LLM_MIN_OUTPUT_TOKENS)
+        candidates = [
+            self._evaluate(agent_name, model, input_tokens, policy, prompt_tokens, min_output_tokens)
+            for model in policy["models"]
+        ]
+        eligible = [c for c in candidates if c["eligible"]]
+        fitting = [c for c in candidates if c["fits"]]
+        if eligible:
+            chosen = eligible[0]
+            reason = chosen["reason"]
+        elif fitting:
+            # Nothing meets the SLO: take the fastest model that can take the input
+            sized = [c for c in fitting if c["predicted_seconds"] is not None] or fitting
+            chosen = min(sized, key=lambda c: c["predicted_seconds"] or float("inf"))
+            reason = "no model meets the SLO; fastest available"
+        else:
+            chosen = next(c for c in candidates if c["model"] == default_model)
+            reason = "no model's context window fits the prompt; default model"
+        
+        decision.update(
+            model=chosen["model"],
+            reason=reason,
+            latency_slo_seconds=policy["latency_slo"],
+            candidates=candidates,
+        )
+        
+        with self._lock:
+            key = (agent_name, chosen["model"])
+            usual = self._input_sizes.get(key)
+            self._input_sizes[key] = input_tokens if usual is None else 0.8 * usual + 0.2 * input_tokens
+            self._decisions[agent_name] = decision
+        return decision
+    
+    def stats(self) -> Dict:
+        """
+        Get routing policies and the latest decision of each agent.
+        
+        Returns:
+            Dictionary of routing state
+        """
+        return {
+            "enabled": self.enabled,
+            "policies": self.policies,
+            "last_decisions": dict(self._decisions),
+        }
+
+
+_model_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Get the process-wide model router."""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
+
+
+def route_payload(agent_name: str, payload: Dict) -> Dict:
+    """
+    Set the payload's model to the routed model and record the decision.
+    
+    Args:
+        agent_name: Agent identifier (e.g. "agent2")
+        payload: Chat-completions request body carrying the agent's default model
+    
+    Returns:
+        The same payload, with "model" possibly replaced
+    """
+    decision = get_model_router().route(agent_name, payload)
+    if decision["model"] != payload.get("model"):
+        payload["model"] = decision["model"]
+        clamp_max_tokens(payload)
+    
+    decisions = routing_decisions.get()
+    if decisions is not None:
+        decisions.append(decision)
+    return payload
@@ -0,0 +1,124 @@
+"""In-process publish/subscribe of versioned job progress."""
+import asyncio
+import json
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class _Topic:
+    """Subscribers of one job and the payload rendered for its latest version."""
+    
+    def __init__(self):
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.payload_version: Optional[int] = None
+        self.payload: Optional[str] = None
+
+
+class ProgressBus:
+    """
+    Wakes progress subscribers as soon as a job's state changes.
+    
+    Every change bumps the "version" field of the state document, so any
+    worker can tell whether a stored snapshot is newer than the one a client
+    has seen. Subscribers in the worker running the job are woken by
+    publish(); the rendered payload of each version is shared by all of them.
+    Subscribers of jobs running elsewhere time out and re-read the store.
+    
+    Not thread-safe: publish and wait from the event loop.
+    """
+    
+    def __init__(self):
+        self._topics: Dict[str, _Topic] = {}
+    
+    def publish(self, key: str, state: Dict) -> int:
+        """
+        Record a change of a job's state and wake its subscribers.
+        
+        Args:
+            key: Job id
+            state: The job's live state document; its "version" is bumped
+        
+        Returns:
+            The new version
+        """
+        state["version"] = state.get("version", 0) + 1
+        topic = self._topics.get(key)
+        if topic is not None:
+            changed, topic.changed = topic.changed, asyncio.Event()
+            changed.set()
+        return state["version"]
+    
+    @contextmanager
+    def subscription(self, key: str) -> Iterator[None]:
+        """
+        Subscribe to a job for the duration of a with block.
+        
+        Args:
+            key: Job id
+        """
+        topic = self._topics.setdefault(key, _Topic())
+        topic.subscribers += 1
+        try:
+            yield
+        finally:
+            topic.subscribers -= 1
+            if topic.subscribers == 0 and self._topics.get(key) is topic:
+                del self._topics[key]
+    
+    async def wait(self, key: str, timeout: Optional[float]) -> bool:
+        """
+        Wait for the next publish of a job.
+        
+        Call inside subscription(key), after checking the current version
+        without awaiting in between, so no publish is missed.
+        
+        Args:
+            key: Job id
+            timeout: Seconds to wait at most; None waits for the publish
+                (only for jobs running in this worker, which publish every change)
+        
+        Returns:
+            True if the job was published, False on timeout
+        """
+        topic = self._topics.get(key)
+        if topic is None:
+            await asyncio.sleep(timeout)
+            return False
+        try:
+            await asyncio.wait_for(topic.changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def render(self, key: str, state: Dict) -> str:
+        """
+        Serialize a state snapshot, once per version for all subscribers.
+        
+        Args:
+            key: Job id
+            state: State document
+        
+        Returns:
+            JSON payload
+        """
+        version = state.get("version")
+        topic = self._topics.get(key)
+        if topic is not None and version is not None and topic.payload_version == version:
+            return topic.payload
+        payload = json.dumps(state)
+        if topic is not None and version is not None:
+            topic.payload_version, topic.payload = version, payload
+        return payload
+    
+    def stats(self) -> Dict:
+        """
+        Get subscriber counts.
+        
+        Returns:
+            Dictionary with the watched jobs and their subscribers
+        """
+        return {
+            "topics": len(self._topics),
+            "subscribers": sum(topic.subscribers for topic in self._topics.values()),
+        }
@@ -0,0 +1,43 @@
+"""Message layout that keeps a byte-identical prompt prefix across calls."""
+from typing import Dict, List, Optional
+
+# Headers of the shared context message. Every agent uses the same wrapper so
+# the system prompt + JD + resume prefix is identical across calls and the
+# provider's prefix cache can reuse it; changing them invalidates that cache.
+JD_HEADER = "=== JOB DESCRIPTION ==="
+RESUME_HEADER = "=== RESUME ==="
+
+
+def render_context(jd_text: Optional[str] = None, resume_text: Optional[str] = None) -> str:
+    """
+    Render the shared JD/resume context message.
+    
+    Args:
+        jd_text: Job description text (omitted when None)
+        resume_text: Resume text (omitted when None)
+    
+    Returns:
+        Context message content, JD first then resume
+    """
+    blocks = []
+    if jd_text is not None:
+        blocks.append(f"{JD_HEADER}\n{jd_text.strip()}")
+    if resume_text is not None:
+        blocks.append(f"{RESUME_HEADER}\n{resume_text.strip()}")
+    return "\n\n".join(blocks)
+
+
+def build_messages(system_prompt: str, user_messages: List[str]) -> List[Dict]:
+    """
+    Build the chat messages: system prompt, shared context, then the variable part.
+    
+    Args:
+        system_prompt: Agent system prompt
+        user_messages: User message contents, most stable first
+    
+    Returns:
+        Chat-completions message list
+    """
+    return [{"role": "system", "content": system_prompt}] + [
+        {"role": "user", "content": content} for content in user_messages if content
+    ]
@@ -0,0 +1,375 @@
+"""Cross-worker token-bucket rate limiter for upstream LLM calls."""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import (
+    LLM_RATE_LIMIT_ENABLED,
+    LLM_RATE_LIMIT_PATH,
+    LLM_DEFAULT_RPM,
+    LLM_DEFAULT_TPM,
+    LLM_RATE_LIMITS,
+)
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Priority of upstream calls made in the current context. Batch jobs set this
+# to PRIORITY_BATCH so interactive workflow calls go ahead of them.
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+# How often a queued caller re-checks the bucket at most
+_POLL_INTERVAL = 0.25
+_MAX_SLEEP = 1.0
+
+
+def estimate_prompt_tokens(payload: Dict) -> int:
+    """Rough prompt size of a request: message characters / 4."""
+    return sum(len(m.get("content") or "") for m in payload.get("messages", [])) // 4
+
+
+def estimate_tokens(payload: Dict) -> int:
+    """
+    Rough token cost of a request: prompt characters / 4 plus max_tokens.
+    
+    Args:
+        payload: Chat-completions request body
+    
+    Returns:
+        Estimated total tokens
+    """
+    return estimate_prompt_tokens(payload) + int(payload.get("max_tokens") or 0)
+
+
+def _load_limits() -> Dict[str, Dict[str, int]]:
+    try:
+        overrides = json.loads(LLM_RATE_LIMITS)
+    except json.JSONDecodeError:
+        print("⚠️  Warning: LLM_RATE_LIMITS is not valid JSON, using defaults")
+        overrides = {}
+    return overrides if isinstance(overrides, dict) else {}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class UpstreamRateLimiter:
+    """
+    Requests/min and tokens/min buckets per model, stored in SQLite so that
+    every worker process draws from the same budget.
+    
+    Within a process, callers waiting for the same model are served in
+    priority order. Across processes, a caller yields while a live worker
+    has higher-priority callers queued for that model. The async methods
+    run their database work in a thread, off the event loop.
+    """
+    
+    def __init__(
+        self,
+        path: str = LLM_RATE_LIMIT_PATH,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+        enabled: bool = LLM_RATE_LIMIT_ENABLED
+    ):
+        """
+        Initialize the limiter.
+        
+        Args:
+            path: SQLite database file shared by the workers
+            limits: Per-model {"rpm": ..., "tpm": ...} overrides
+            enabled: Whether limiting is applied
+        """
+        self.path = path
+        self.limits = limits if limits is not None else _load_limits()
+        self.enabled = enabled
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._queues: Dict[str, List[tuple]] = {}
+        self._sequence = itertools.count()
+        self._stats = {"acquired": 0, "waited": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        self._conn = None
+        
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                    model TEXT PRIMARY KEY,
+                    requests REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS waiting (
+                    pid INTEGER NOT NULL,
+                    model TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (pid, model, priority)
+                )"""
+            )
+            self._conn.execute("DELETE FROM waiting WHERE pid = ?", (self.pid,))
+    
+    def budget(self, model: str) -> Dict[str, int]:
+        """Requests/min and tokens/min budget of a model."""
+        limits = self.limits.get(model, self.limits.get("default", {}))
+        return {
+            "rpm": int(limits.get("rpm", LLM_DEFAULT_RPM)),
+            "tpm": int(limits.get("tpm", LLM_DEFAULT_TPM)),
+        }
+    
+    # ------------------------------------------------------------------
+    # Shared bucket state
+    # ------------------------------------------------------------------
+    
+    def _try_take(self, model: str, tokens: int) -> float:
+        """
+        Atomically refill the model's buckets and take one request plus tokens.
+        
+        Returns:
+            0.0 if taken, otherwise seconds until enough budget is available
+        """
+        budget = self.budget(model)
+        tokens = min(tokens, budget["tpm"])
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated_at FROM buckets WHERE model = ?", (model,)
+                ).fetchone()
+                if row is None:
+                    requests_left, tokens_left = float(budget["rpm"]), float(budget["tpm"])
+                else:
+                    elapsed = max(0.0, now - row[2])
+                    requests_left = min(budget["rpm"], row[0] + elapsed * budget["rpm"] / 60)
+                    tokens_left = min(budget["tpm"], row[1] + elapsed * budget["tpm"] / 60)
+                
+                if requests_left >= 1 and tokens_left >= tokens:
+                    requests_left -= 1
+                    tokens_left -= tokens
+                    wait = 0.0
+                else:
+                    wait = max(
+                        (1 - requests_left) * 60 / budget["rpm"] if requests_left < 1 else 0.0,
+                        (tokens - tokens_left) * 60 / budget["tpm"] if tokens_left < tokens else 0.0,
+                    )
+                
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets(model, requests, tokens, updated_at) VALUES(?, ?, ?, ?)",
+                    (model, requests_left, tokens_left, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+    
+    def refund(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """
+        Return over-estimated tokens to the bucket once real usage is known.
+        
+        Args:
+            model: Model name
+            estimated_tokens: Tokens taken when the call was admitted
+            actual_tokens: total_tokens reported by the upstream, if any
+        """
+        if not self.enabled or not actual_tokens or actual_tokens >= estimated_tokens:
+            return
+        budget = self.budget(model)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE buckets SET tokens = MIN(?, tokens + ?) WHERE model = ?",
+                (budget["tpm"], min(estimated_tokens, budget["tpm"]) - actual_tokens, model)
+            )
+    
+    async def arefund(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Async variant of refund."""
+        if not self.enabled or not actual_tokens or actual_tokens >= estimated_tokens:
+            return
+        await asyncio.to_thread(self.refund, model, estimated_tokens, actual_tokens)
+    
+    def _set_waiting(self, model: str, priority: int, delta: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO waiting(pid, model, priority, count) VALUES(?, ?, ?, ?) "
+                "ON CONFLICT(pid, model, priority) DO UPDATE SET count = count + excluded.count",
+                (self.pid, model, priority, delta)
+            )
+    
+    def _higher_priority_waiting_elsewhere(self, model: str, priority: int) -> bool:
+        """Whether another live worker has higher-priority callers queued for the model."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT pid FROM waiting WHERE model = ? AND priority < ? AND count > 0 AND pid != ?",
+                (model, priority, self.pid)
+            ).fetchall()
+            dead = [pid for (pid,) in rows if not _pid_alive(pid)]
+            for pid in dead:
+                self._conn.execute("DELETE FROM waiting WHERE pid = ?", (pid,))
+        return len(rows) > len(dead)
+    
+    def _admit(self, model: str, tokens: int, priority: int) -> float:
+        """
+        Take the request's budget unless a higher-priority caller is queued elsewhere.
+        
+        Returns:
+            0.0 if taken, otherwise seconds to wait before trying again
+        """
+        if self._higher_priority_waiting_elsewhere(model, priority):
+            return _POLL_INTERVAL
+        return self._try_take(model, tokens)
+    
+    # ------------------------------------------------------------------
+    # Acquire
+    # ------------------------------------------------------------------
+    
+    def _record_wait(self, waited: float) -> None:
+        self._stats["acquired"] += 1
+        if waited > 0:
+            self._stats["waited"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+    
+    async def acquire(self, model: str, tokens: int, priority: Optional[int] = None) -> float:
+        """
+        Wait until the model's budget admits one request of the given size.
+        
+        Args:
+            model: Model name
+            tokens: Estimated tokens of the request
+            priority: Queue priority (default: request_priority of the context)
+        
+        Returns:
+            Seconds spent waiting
+        """
+        if not self.enabled:
+            return 0.0
+        priority = request_priority.get() if priority is None else priority
+        queue = self._queues.setdefault(model, [])
+        
+        # Fast path: nobody ahead of us and budget available
+        if not queue and await asyncio.to_thread(self._admit, model, tokens, priority) == 0.0:
+            self._record_wait(0.0)
+            return 0.0
+        
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(queue, ticket)
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._set_waiting, model, priority, 1)
+            while True:
+                wait = _POLL_INTERVAL
+                if queue[0] == ticket:
+                    wait = await asyncio.to_thread(self._admit, model, tokens, priority)
+                    if wait == 0.0:
+                        break
+                await asyncio.sleep(min(max(wait, _POLL_INTERVAL), _MAX_SLEEP))
+        finally:
+            queue.remove(ticket)
+            heapq.heapify(queue)
+            await asyncio.to_thread(self._set_waiting, model, priority, -1)
+        
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+    
+    def acquire_sync(self, model: str, tokens: int) -> float:
+        """
+        Blocking variant of acquire for synchronous callers (no priority queue).
+        
+        Returns:
+            Seconds spent waiting
+        """
+        if not self.enabled:
+            return 0.0
+        started = time.monotonic()
+        while True:
+            wait = self._try_take(model, tokens)
+            if wait == 0.0:
+                break
+            time.sleep(min(max(wait, _POLL_INTERVAL), _MAX_SLEEP))
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+    
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    
+    def stats(self) -> Dict:
+        """
+        Get limiter budgets, bucket levels, queue depths and wait times.
+        
+        Returns:
+            Dictionary of limiter metrics
+        """
+        if not self.enabled:
+            return {"enabled": False}
+        
+        with self._lock:
+            buckets = {
+                model: {"requests_available": round(requests, 2), "tokens_available": int(tokens)}
+                for model, requests, tokens in self._conn.execute(
+                    "SELECT model, requests, tokens FROM buckets"
+                ).fetchall()
+            }
+            global_waiting = {}
+            for model, priority, count in self._conn.execute(
+                "SELECT model, priority, SUM(count) FROM waiting GROUP BY model, priority"
+            ).fetchall():
+                global_waiting.setdefault(model, {})[str(priority)] = count
+        
+        acquired = self._stats["acquired"]
+        return {
+            "enabled": True,
+            "budgets": {model: self.budget(model) for model in set(buckets) | set(self.limits)},
+            "buckets": buckets,
+            "queue_depth": {model: len(queue) for model, queue in self._queues.items()},
+            "global_waiting": global_waiting,
+            "acquired": acquired,
+            "waited": self._stats["waited"],
+            "avg_wait_seconds": round(self._stats["total_wait_seconds"] / acquired, 3) if acquired else 0.0,
+            "max_wait_seconds": round(self._stats["max_wait_seconds"], 3),
+        }
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_rate_limiter: Optional[UpstreamRateLimiter] = None
+
+
+def get_rate_limiter() -> UpstreamRateLimiter:
+    """Get the process-wide rate limiter, opening it on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = UpstreamRateLimiter()
+    return _rate_limiter
+
+
+def close_rate_limiter() -> None:
+    """Close the process-wide rate limiter."""
+    global _rate_limiter
+    if _rate_limiter is not None:
+        _rate_limiter.close()
+    _rate_limiter = None
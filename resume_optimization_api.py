@@ -3,11 +3,22 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 import json
+from contextlib import asynccontextmanager
 from resume_optimization_service import ResumeOptimizationService
 from resume_export import ResumeExporter
 from agent4 import ResumeOptimizationAgent
+from llm_client import open_llm_client, close_llm_client
 
-app = FastAPI(title="Resume Optimization API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared LLM client on startup and close it on shutdown."""
+    await open_llm_client()
+    yield
+    await close_llm_client()
+
+
+app = FastAPI(title="Resume Optimization API", version="1.0.0", lifespan=lifespan)
 
 # Global service instances
 optimization_service = ResumeOptimizationService()
@@ -53,7 +64,7 @@ async def optimize_resume(request: OptimizationRequest) -> Dict:
         optimization_service.load_agent3_outputs(request.agent3_outputs)
         
         # Get optimization recommendations from Agent 4
-        recommendations = agent4.optimize_resume(
+        recommendations = await agent4.aoptimize_resume(
             jd_text=request.jd_text,
             resume_text=request.resume_text,
             agent2_outputs=request.agent2_outputs,
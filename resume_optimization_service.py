@@ -59,6 +59,32 @@ class ResumeOptimizationService:
         """
         self.original_resume = resume_text
     
+    def get_session_state(self) -> Dict:
+        """
+        Get the state changed by user interaction (feedback, final resume).
+        
+        Returns:
+            JSON-serializable dictionary accepted by restore_session_state
+        """
+        return {
+            "user_feedback": self.user_feedback,
+            "final_resume": self.final_resume,
+            "modification_history": self.modification_history,
+            "project_classification": self.project_classification
+        }
+    
+    def restore_session_state(self, session_state: Dict) -> None:
+        """
+        Restore state saved with get_session_state.
+        
+        Args:
+            session_state: Dictionary returned by get_session_state
+        """
+        self.user_feedback = session_state.get("user_feedback", self.user_feedback)
+        self.final_resume = session_state.get("final_resume", self.final_resume)
+        self.modification_history = session_state.get("modification_history", self.modification_history)
+        self.project_classification = session_state.get("project_classification", self.project_classification)
+    
     def submit_feedback(
         self,
         feedback_type: str,  # "experience_replacement", "format_adjustment", "experience_optimization", or "skills_optimization"
@@ -0,0 +1,549 @@
+"""Semantic near-duplicate cache for Agent 2 JD analyses backed by the vector DB."""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    STUDENT_PORTAL_BASE_URL,
+    EMBEDDING_MODEL,
+    VECTOR_DB_PATH,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MODE,
+    SEMANTIC_CACHE_EMBEDDER,
+    SEMANTIC_CACHE_HASHING_DIM,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_METADATA_FILE,
+    SEMANTIC_CACHE_VECTORS_FILE,
+)
+from llm_cache import hash_text
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+EMBEDDINGS_ENDPOINT = f"{STUDENT_PORTAL_BASE_URL.rstrip('/')}/v1/embeddings"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9+#.]+|[一-鿿]")
+
+# Nearest entries checked per lookup; many resumes against one JD all sit
+# close to each other in the combined vector space
+SEARCH_CANDIDATES = 20
+
+# First line of the metadata file; files with another format or embedder are replaced on the next store
+FILE_FORMAT = "semantic-cache-v2"
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word unigrams and bigrams."""
+    
+    name = "hashing"
+    
+    def __init__(self, dim: int = SEMANTIC_CACHE_HASHING_DIM):
+        """
+        Initialize the hashing embedder.
+        
+        Args:
+            dim: Output vector dimension
+        """
+        self.dim = dim
+    
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """
+        Embed texts into L2-normalized vectors.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            Array of shape (len(texts), dim)
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        return _normalize(vectors)
+    
+    async def aembed(self, texts: List[str]) -> "np.ndarray":
+        """Async variant of embed (hashing is CPU-only, so it runs in a thread)."""
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class RemoteEmbedder:
+    """Embedder calling the OpenAI-compatible embeddings endpoint with EMBEDDING_MODEL."""
+    
+    name = "remote"
+    
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        """
+        Initialize the remote embedder.
+        
+        Args:
+            model: Embedding model name
+        """
+        self.model = model
+    
+    def _to_vectors(self, result: Dict) -> "np.ndarray":
+        data = sorted(result["data"], key=lambda item: item.get("index", 0))
+        return _normalize(np.array([item["embedding"] for item in data], dtype="float32"))
+    
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """Embed texts with the shared sync client."""
+        from llm_client import get_sync_client
+        response = get_sync_client().post(EMBEDDINGS_ENDPOINT, json={"model": self.model, "input": texts}, timeout=30.0)
+        response.raise_for_status()
+        return self._to_vectors(response.json())
+    
+    async def aembed(self, texts: List[str]) -> "np.ndarray":
+        """Embed texts with the shared async client."""
+        from llm_client import get_async_client
+        response = await get_async_client().post(EMBEDDINGS_ENDPOINT, json={"model": self.model, "input": texts}, timeout=30.0)
+        response.raise_for_status()
+        return self._to_vectors(response.json())
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "remote": RemoteEmbedder,
+}
+
+
+def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype("float32")
+
+
+class _NumpyIndex:
+    """Minimal inner-product index used when faiss is not installed."""
+    
+    def __init__(self, dim: int):
+        self.d = dim
+        self.vectors = np.zeros((0, dim), dtype="float32")
+    
+    @property
+    def ntotal(self) -> int:
+        return self.vectors.shape[0]
+    
+    def add(self, vectors: "np.ndarray") -> None:
+        self.vectors = np.vstack([self.vectors, vectors])
+    
+    def search(self, query: "np.ndarray", k: int):
+        scores = query @ self.vectors.T
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, axis=1), order
+
+
+class SemanticAnalysisCache:
+    """
+    Near-duplicate cache of Agent 2 analyses keyed by JD+resume embeddings.
+    
+    The JD and the resume are embedded separately and concatenated for the
+    index search; a hit then requires the JD and the candidate text to each
+    reach the threshold on their own, so a matching JD cannot make up for a
+    different candidate. In "reuse" mode a hit is returned as the answer only
+    if the candidate text is identical; otherwise it is a warm start.
+    
+    Entries are appended under a file lock to SEMANTIC_CACHE_METADATA_FILE
+    (one JSON line each) and SEMANTIC_CACHE_VECTORS_FILE (one float32 row
+    each), so a store writes only the new entry; other workers read just
+    the lines appended since their last load. Entries expire after
+    ttl_seconds and the oldest are dropped above max_entries; the files are
+    rewritten without them once a tenth of max_entries can be dropped.
+    """
+    
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        mode: str = SEMANTIC_CACHE_MODE,
+        metadata_file: str = SEMANTIC_CACHE_METADATA_FILE,
+        vectors_file: str = SEMANTIC_CACHE_VECTORS_FILE,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+        ttl_seconds: int = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            embedder: Object with embed/aembed methods (default from SEMANTIC_CACHE_EMBEDDER)
+            threshold: Minimum cosine similarity of the JD and of the candidate text for a hit
+            mode: "warm_start" passes the cached analysis to the LLM; "reuse" also
+                returns it directly when the candidate text is identical
+            metadata_file: JSON lines file: a header, then one entry per line
+            vectors_file: Raw float32 vectors, one row per entry
+            enabled: Whether lookups and writes are performed
+            ttl_seconds: Lifetime of an entry
+            max_entries: Maximum number of entries kept
+        """
+        self.enabled = enabled and NUMPY_AVAILABLE
+        self.embedder = embedder or EMBEDDERS.get(SEMANTIC_CACHE_EMBEDDER, HashingEmbedder)()
+        self.threshold = threshold
+        self.mode = mode
+        self.metadata_file = metadata_file
+        self.vectors_file = vectors_file
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._index = None
+        self._metadata: List[Dict] = []
+        # Header of the loaded files, their identity and how much of the metadata file was read
+        self._header: Optional[Dict] = None
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "pruned": 0}
+        
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.metadata_file) or VECTOR_DB_PATH, exist_ok=True)
+            with self._file_lock(exclusive=False):
+                self._reload_if_changed()
+    
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Hold the cross-worker lock of the index files (a no-op without fcntl)."""
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        with open(f"{self.metadata_file}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _reset(self) -> None:
+        self._index = None
+        self._metadata = []
+        self._header = None
+        self._file_id = None
+        self._offset = 0
+    
+    def _compatible(self, dim: Optional[int] = None) -> bool:
+        """Whether the loaded files hold vectors of this embedder (and dimension)."""
+        header = self._header or {}
+        return (
+            header.get("format") == FILE_FORMAT
+            and header.get("embedder") == self._embedder_id()
+            and (dim is None or header.get("dim") == dim)
+        )
+    
+    def _reload_if_changed(self) -> None:
+        """Read the entries appended since the last load, or all of them if the files were rewritten."""
+        try:
+            stat = os.stat(self.metadata_file)
+        except OSError:
+            self._reset()
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            self._reset()
+            self._file_id = file_id
+        if stat.st_size == self._offset:
+            return
+        try:
+            with open(self.metadata_file, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            # A line left incomplete by a crashed writer is ignored (and overwritten by the next store)
+            chunk = chunk[:chunk.rfind(b"\n") + 1]
+            lines = chunk.splitlines()
+            if self._offset == 0 and lines:
+                self._header = json.loads(lines.pop(0))
+            self._offset += len(chunk)
+            if not lines or not self._compatible():
+                return
+            dim = self._header["dim"]
+            with open(self.vectors_file, "rb") as f:
+                f.seek(len(self._metadata) * dim * 4)
+                vectors = np.fromfile(f, dtype="float32", count=len(lines) * dim)
+            if vectors.size < len(lines) * dim:
+                raise ValueError("vectors file is shorter than the metadata")
+            if self._index is None:
+                self._index = self._new_index(dim)
+            self._index.add(vectors.reshape(len(lines), dim))
+            self._metadata.extend(json.loads(line) for line in lines)
+        except Exception as e:
+            print(f"⚠️  Warning: Failed to load semantic cache: {str(e)}")
+            # Start over; the next store rewrites the files
+            self._reset()
+            self._file_id = file_id
+            self._offset = stat.st_size
+    
+    def _append(self, vector: "np.ndarray", entry: Dict) -> None:
+        """Write one entry after the entries already on disk (caller holds the exclusive lock)."""
+        with open(self.vectors_file, "r+b") as f:
+            f.seek(len(self._metadata) * vector.shape[1] * 4)
+            f.write(vector.astype("float32").tobytes())
+            f.truncate()
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.metadata_file, "r+b") as f:
+            f.seek(self._offset)
+            f.write(line)
+            f.truncate()
+        self._offset += len(line)
+        self._index.add(vector)
+        self._metadata.append(entry)
+    
+    def _rewrite(self) -> None:
+        """Atomically replace both files with the entries in memory (caller holds the exclusive lock)."""
+        if self._metadata:
+            vectors = np.stack([self._stored_vector(i) for i in range(len(self._metadata))]).astype("float32")
+        else:
+            vectors = np.zeros((0, self._header["dim"]), dtype="float32")
+        tmp_vectors = f"{self.vectors_file}.tmp"
+        with open(tmp_vectors, "wb") as f:
+            f.write(vectors.tobytes())
+        tmp_metadata = f"{self.metadata_file}.tmp"
+        with open(tmp_metadata, "w", encoding="utf-8") as f:
+            for line in [self._header] + self._metadata:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        os.replace(tmp_vectors, self.vectors_file)
+        os.replace(tmp_metadata, self.metadata_file)
+        stat = os.stat(self.metadata_file)
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+    
+    def _embedder_id(self) -> str:
+        return f"{self.embedder.name}:{getattr(self.embedder, 'model', getattr(self.embedder, 'dim', ''))}"
+    
+    def _new_index(self, dim: int):
+        return faiss.IndexFlatIP(dim) if FAISS_AVAILABLE else _NumpyIndex(dim)
+    
+    # ------------------------------------------------------------------
+    # Lookup and store
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _pair_vector(vectors: "np.ndarray") -> "np.ndarray":
+        """Combine JD and resume vectors into one normalized query vector."""
+        return _normalize(vectors.reshape(1, -1))
+    
+    def _stored_vector(self, idx: int) -> "np.ndarray":
+        if isinstance(self._index, _NumpyIndex):
+            return self._index.vectors[idx]
+        return self._index.reconstruct(int(idx))
+    
+    @staticmethod
+    def _part_similarities(query: "np.ndarray", stored: "np.ndarray") -> Tuple[float, float]:
+        """Cosine similarities of the JD halves and of the candidate halves of two pair vectors."""
+        half = query.shape[0] // 2
+        similarities = []
+        for a, b in ((query[:half], stored[:half]), (query[half:], stored[half:])):
+            norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+            similarities.append(float(a @ b) / norm if norm else 0.0)
+        return similarities[0], similarities[1]
+    
+    def _prune(self, now: float) -> None:
+        """
+        Drop expired entries, then the oldest above max_entries, and rewrite
+        the files; only once enough can be dropped, so stores stay appends.
+        """
+        keep = [i for i, entry in enumerate(self._metadata) if now - entry["created_at"] <= self.ttl_seconds]
+        keep = keep[max(0, len(keep) - self.max_entries):]
+        if len(self._metadata) - len(keep) < max(1, self.max_entries // 10):
+            return
+        index = self._new_index(self._index.d)
+        if keep:
+            index.add(np.stack([self._stored_vector(i) for i in keep]).astype("float32"))
+        self._index = index
+        self._stats["pruned"] += len(self._metadata) - len(keep)
+        self._metadata = [self._metadata[i] for i in keep]
+        self._rewrite()
+    
+    def _search(self, vector: "np.ndarray", context_hash: str, candidate_hash: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._reload_if_changed()
+            if self._index is None or self._index.ntotal == 0 or self._index.d != vector.shape[1]:
+                self._stats["misses"] += 1
+                return None
+            _, ids = self._index.search(vector, min(SEARCH_CANDIDATES, self._index.ntotal))
+            best = None
+            for idx in ids[0]:
+                if idx < 0:
+                    break
+                entry = self._metadata[idx]
+                if entry["context_hash"] != context_hash or now - entry["created_at"] > self.ttl_seconds:
+                    continue
+                jd_similarity, candidate_similarity = self._part_similarities(vector[0], self._stored_vector(idx))
+                if min(jd_similarity, candidate_similarity) < self.threshold:
+                    continue
+                if best is None or min(jd_similarity, candidate_similarity) > best["similarity"]:
+                    best = {
+                        "similarity": min(jd_similarity, candidate_similarity),
+                        "jd_similarity": jd_similarity,
+                        "candidate_similarity": candidate_similarity,
+                        "reusable": self.mode == "reuse" and entry.get("candidate_hash") == candidate_hash,
+                        "analysis": entry["analysis"],
+                        "created_at": entry["created_at"]
+                    }
+            self._stats["hits" if best else "misses"] += 1
+            return best
+    
+    def _store(self, vector: "np.ndarray", context_hash: str, candidate_hash: str, analysis: Dict) -> None:
+        now = time.time()
+        entry = {
+            "context_hash": context_hash,
+            "candidate_hash": candidate_hash,
+            "analysis": analysis,
+            "created_at": now
+        }
+        with self._lock, self._file_lock(exclusive=True):
+            # Reload under the lock so the entry goes after those written by other workers
+            self._reload_if_changed()
+            if not self._compatible(vector.shape[1]):
+                # Missing files, or written by another embedder: start new ones
+                self._reset()
+                self._header = {"format": FILE_FORMAT, "embedder": self._embedder_id(), "dim": vector.shape[1]}
+                self._index = self._new_index(vector.shape[1])
+                self._rewrite()
+            if self._index is None:
+                self._index = self._new_index(vector.shape[1])
+            self._append(vector, entry)
+            self._prune(now)
+            self._stats["stores"] += 1
+    
+    def lookup(self, jd_text: str, candidate_text: str, context_hash: str) -> Optional[Dict]:
+        """
+        Find a cached analysis for a near-identical JD and candidate.
+        
+        Args:
+            jd_text: Job description text
+            candidate_text: Resume text plus project materials
+            context_hash: Hash of model and system prompt; entries must match it
+        
+        Returns:
+            Dictionary with the similarities, analysis and "reusable" (whether
+            the analysis may be returned without an LLM call), or None
+        """
+        if not self.enabled:
+            return None
+        try:
+            return self._search(
+                self._pair_vector(self.embedder.embed([jd_text, candidate_text])), context_hash, hash_text(candidate_text)
+            )
+        except Exception as e:
+            print(f"⚠️  Warning: Semantic cache lookup failed: {str(e)}")
+            return None
+    
+    async def alookup(self, jd_text: str, candidate_text: str, context_hash: str) -> Optional[Dict]:
+        """Async variant of lookup."""
+        if not self.enabled:
+            return None
+        try:
+            return await asyncio.to_thread(
+                self._search,
+                self._pair_vector(await self.embedder.aembed([jd_text, candidate_text])),
+                context_hash,
+                hash_text(candidate_text)
+            )
+        except Exception as e:
+            print(f"⚠️  Warning: Semantic cache lookup failed: {str(e)}")
+            return None
+    
+    def store(self, jd_text: str, candidate_text: str, context_hash: str, analysis: Dict) -> None:
+        """
+        Store a successful analysis.
+        
+        Args:
+            jd_text: Job description text
+            candidate_text: Resume text plus project materials
+            context_hash: Hash of model and system prompt
+            analysis: Agent 2 analysis result
+        """
+        if not self.enabled:
+            return
+        try:
+            self._store(
+                self._pair_vector(self.embedder.embed([jd_text, candidate_text])),
+                context_hash,
+                hash_text(candidate_text),
+                analysis
+            )
+        except Exception as e:
+            print(f"⚠️  Warning: Semantic cache store failed: {str(e)}")
+    
+    async def astore(self, jd_text: str, candidate_text: str, context_hash: str, analysis: Dict) -> None:
+        """Async variant of store."""
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(
+                self._store,
+                self._pair_vector(await self.embedder.aembed([jd_text, candidate_text])),
+                context_hash,
+                hash_text(candidate_text),
+                analysis
+            )
+        except Exception as e:
+            print(f"⚠️  Warning: Semantic cache store failed: {str(e)}")
+    
+    def stats(self) -> Dict:
+        """
+        Get semantic cache statistics for this worker.
+        
+        Returns:
+            Dictionary with configuration, entry count and hit/miss counters
+        """
+        return {
+            "enabled": self.enabled,
+            "backend": "faiss" if FAISS_AVAILABLE else "numpy",
+            "embedder": self._embedder_id(),
+            "threshold": self.threshold,
+            "mode": self.mode,
+            "entries": len(self._metadata),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            **self._stats
+        }
+
+
+def context_hash(model: str, system_prompt: str) -> str:
+    """Hash identifying the model and prompt an analysis was produced with."""
+    return hash_text(f"{model}\n{system_prompt}")
+
+
+_semantic_cache: Optional[SemanticAnalysisCache] = None
+
+
+def get_semantic_cache() -> SemanticAnalysisCache:
+    """Get the process-wide semantic cache, loading it on first use."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticAnalysisCache()
+    return _semantic_cache
@@ -0,0 +1,200 @@
+"""Per-workflow ResumeOptimizationService sessions backed by the state store."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import SESSION_MAX_ACTIVE, SESSION_IDLE_SECONDS
+from resume_optimization_service import ResumeOptimizationService
+from state_store import EXPIRED_STATUS, get_state_store
+
+# Attempts of a session change that keeps losing to concurrent changes
+UPDATE_ATTEMPTS = 3
+
+
+class SessionConflictError(Exception):
+    """Raised when a session change keeps conflicting with changes made by other workers."""
+    
+    def __init__(self, workflow_id: str):
+        self.workflow_id = workflow_id
+        super().__init__(f"Session of workflow {workflow_id} is being changed concurrently; please retry")
+
+
+class OptimizationSessionRegistry:
+    """
+    One ResumeOptimizationService per workflow.
+    
+    A session is built lazily from the workflow's stored results (resume,
+    Agent 3 and Agent 4 outputs); the user's feedback and final resume are
+    saved to the state store after every change, so any worker (or a
+    restarted one) can rebuild it. Saved session state carries a version:
+    a change is applied to the latest saved state and saved only if no
+    other worker saved in between, otherwise it is applied again. In-memory
+    copies are dropped when idle or above max_sessions, least recently
+    used first.
+    """
+    
+    def __init__(self, max_sessions: int = SESSION_MAX_ACTIVE, idle_seconds: int = SESSION_IDLE_SECONDS):
+        """
+        Initialize the registry.
+        
+        Args:
+            max_sessions: Sessions kept in memory at most
+            idle_seconds: Seconds after the last use before a session is dropped from memory
+        """
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = 0
+        self._evictions = 0
+        self._conflicts = 0
+    
+    def get(self, workflow_id: str) -> Optional[ResumeOptimizationService]:
+        """
+        Get the session of a workflow.
+        
+        Args:
+            workflow_id: Workflow the session belongs to
+        
+        Returns:
+            The session with its latest saved feedback, or None if the
+            workflow has no (unexpired) results
+        """
+        return self._load(workflow_id)[0]
+    
+    def _load(self, workflow_id: str) -> Tuple[Optional[ResumeOptimizationService], Optional[int]]:
+        """Get the session of a workflow and the version of its saved state."""
+        store = get_state_store()
+        session_state = store.get("session", workflow_id)
+        
+        with self._lock:
+            entry = self._sessions.get(workflow_id)
+            if entry is not None:
+                self._sessions.move_to_end(workflow_id)
+                entry["last_used"] = time.monotonic()
+                service = entry["service"]
+        
+        if entry is None:
+            results = store.get("workflow_results", workflow_id)
+            if results is None or results.get("status") == EXPIRED_STATUS:
+                return None, None
+            service = self._build(results)
+            with self._lock:
+                self._sessions[workflow_id] = {"service": service, "last_used": time.monotonic()}
+                self._loads += 1
+            self.evict_idle()
+        
+        # Another worker may have changed the session since it was cached here
+        if session_state is None or session_state.get("status") == EXPIRED_STATUS:
+            return service, None
+        service.restore_session_state(session_state)
+        return service, session_state.get("version")
+    
+    def _build(self, results: Dict) -> ResumeOptimizationService:
+        """Build a session from a workflow's stored results."""
+        service = ResumeOptimizationService()
+        service.load_original_resume(results.get("resume_text", ""))
+        service.load_agent3_outputs(results.get("agent3_outputs") or {})
+        service.load_optimization_recommendations(results.get("agent4_outputs") or {})
+        return service
+    
+    def update(
+        self,
+        workflow_id: str,
+        change: Callable[[ResumeOptimizationService], Any]
+    ) -> Optional[Tuple[ResumeOptimizationService, Any]]:
+        """
+        Apply a change to a session and save it to the state store.
+        
+        The change is applied to the latest saved state and saved only if
+        that state is still the latest; if another worker saved first, it is
+        applied again to the newer state.
+        
+        A change that raises or loses to another worker is not kept: the
+        cached session is dropped and rebuilt from the stored state.
+        
+        Args:
+            workflow_id: Workflow the session belongs to
+            change: Changes the session and returns a result; an exception
+                aborts the update without saving
+        
+        Returns:
+            Tuple of (session, result of change), or None if the workflow
+            has no (unexpired) results
+        
+        Raises:
+            SessionConflictError: If every attempt lost to a concurrent change
+        """
+        for _ in range(UPDATE_ATTEMPTS):
+            service, version = self._load(workflow_id)
+            if service is None:
+                return None
+            try:
+                result = change(service)
+            except Exception:
+                self._discard(workflow_id, service)
+                raise
+            session_state = service.get_session_state()
+            session_state["version"] = (version or 0) + 1
+            if get_state_store().put_if_version("session", workflow_id, session_state, version):
+                return service, result
+            self._discard(workflow_id, service)
+            with self._lock:
+                self._conflicts += 1
+        raise SessionConflictError(workflow_id)
+    
+    def _discard(self, workflow_id: str, service: ResumeOptimizationService) -> None:
+        """Drop a cached session holding a change that was not saved, so it is rebuilt from the store."""
+        with self._lock:
+            entry = self._sessions.get(workflow_id)
+            if entry is not None and entry["service"] is service:
+                del self._sessions[workflow_id]
+    
+    def evict_idle(self) -> int:
+        """
+        Drop sessions idle for longer than idle_seconds, then the least
+        recently used above max_sessions. Their saved state is kept.
+        
+        Returns:
+            Number of sessions dropped
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [wid for wid, entry in self._sessions.items() if now - entry["last_used"] > self.idle_seconds]
+            for workflow_id in idle:
+                del self._sessions[workflow_id]
+            evicted = len(idle)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                evicted += 1
+            self._evictions += evicted
+        return evicted
+    
+    def stats(self) -> Dict:
+        """
+        Get registry statistics for this worker.
+        
+        Returns:
+            Dictionary with active sessions, limits, loads, evictions and save conflicts
+        """
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_seconds": self.idle_seconds,
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "conflicts": self._conflicts,
+            }
+
+
+_session_registry: Optional[OptimizationSessionRegistry] = None
+
+
+def get_session_registry() -> OptimizationSessionRegistry:
+    """Get the process-wide session registry, creating it on first use."""
+    global _session_registry
+    if _session_registry is None:
+        _session_registry = OptimizationSessionRegistry()
+    return _session_registry
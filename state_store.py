@@ -0,0 +1,807 @@
+"""Workflow and interview state shared by all workers, stored in SQLite (WAL) under DATA_DIR."""
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    STATE_BACKEND,
+    STATE_DB_PATH,
+    STATE_TTL_SECONDS,
+    STATE_MAX_ENTRIES,
+    STATE_MAX_BYTES,
+    STATE_TOMBSTONE_TTL_SECONDS,
+    STATE_STALE_SECONDS,
+)
+
+# Status of a document whose content was evicted; only the marker is kept
+EXPIRED_STATUS = "expired"
+
+
+# Distinguishes this process from an earlier one that had the same host name and pid
+# (e.g. pid 1 of a restarted container)
+_BOOT_ID = uuid.uuid4().hex
+
+
+def _owner_id() -> str:
+    """Identifier of this worker process: host, pid and boot id."""
+    return f"{socket.gethostname()}:{os.getpid()}:{_BOOT_ID}"
+
+
+def _parse_owner(owner: Optional[str]) -> Tuple[str, Optional[int]]:
+    """Host and pid of an owner id (boot ids are optional for documents written before them)."""
+    parts = (owner or "").split(":")
+    if len(parts) >= 3 and parts[-2].isdigit():
+        return ":".join(parts[:-2]), int(parts[-2])
+    if len(parts) >= 2 and parts[-1].isdigit():
+        return ":".join(parts[:-1]), int(parts[-1])
+    return "", None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _serialize(value: Dict) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _tombstone(now: float, reason: str) -> str:
+    return _serialize({"status": EXPIRED_STATUS, "expired_at": now, "reason": reason})
+
+
+def _plan_eviction(
+    entries: List[Tuple[Any, Optional[str], int, float, float]],
+    now: float,
+    ttl_seconds: float,
+    max_entries: int,
+    max_bytes: int
+) -> Tuple[List[Any], List[Any]]:
+    """
+    Choose the documents to evict.
+    
+    Every document expires ttl_seconds after its last update; running ones
+    are touched by their worker's heartbeat, so a running document that old
+    was abandoned. Then the least recently accessed finished documents (any
+    status but "running", including none) are evicted until the count and
+    size fit.
+    
+    Args:
+        entries: (id, status, size, updated_at, last_accessed) of every non-expired document
+        now: Current time
+        ttl_seconds: Lifetime of a document after its last update
+        max_entries: Maximum number of documents
+        max_bytes: Maximum total size of the documents
+    
+    Returns:
+        Tuple of (ids expired by TTL, ids evicted for capacity)
+    """
+    expired = [e for e in entries if now - e[3] > ttl_seconds]
+    finished = [e for e in entries if e[1] != "running"]
+    expired_ids = {e[0] for e in expired}
+    
+    count = len(entries) - len(expired)
+    total = sum(e[2] for e in entries) - sum(e[2] for e in expired)
+    evicted = []
+    for entry in sorted((e for e in finished if e[0] not in expired_ids), key=lambda e: e[4]):
+        if count <= max_entries and total <= max_bytes:
+            break
+        evicted.append(entry[0])
+        count -= 1
+        total -= entry[2]
+    return [e[0] for e in expired], evicted
+
+
+class StateStore(ABC):
+    """
+    Backend interface: JSON documents by (kind, key), indexed by status.
+    
+    Kinds are "workflow", "workflow_results" and "interview". A Redis-style
+    backend maps get/put/delete to GET/SET/DEL of "kind:key" and keeps one
+    set per "kind:status" for keys().
+    """
+    
+    @abstractmethod
+    def get(self, kind: str, key: str) -> Optional[Dict]:
+        """
+        Load a document.
+        
+        Args:
+            kind: Document kind (e.g. "workflow")
+            key: Document id
+        
+        Returns:
+            The stored document, or None if absent
+        """
+    
+    def put(self, kind: str, key: str, value: Dict) -> None:
+        """
+        Store a document, indexed by its "status" field.
+        
+        Args:
+            kind: Document kind
+            key: Document id
+            value: JSON-serializable document
+        """
+        self.put_serialized(kind, key, value.get("status"), _serialize(value))
+    
+    @abstractmethod
+    def put_serialized(self, kind: str, key: str, status: Optional[str], data: str) -> None:
+        """
+        Store an already serialized document.
+        
+        Args:
+            kind: Document kind
+            key: Document id
+            status: Status the document is indexed by
+            data: Document as JSON
+        """
+    
+    @abstractmethod
+    def put_if_version(self, kind: str, key: str, value: Dict, expected_version: Optional[int]) -> bool:
+        """
+        Store a document only if the stored one still has the expected
+        "version" field (compare-and-swap).
+        
+        Args:
+            kind: Document kind
+            key: Document id
+            value: JSON-serializable document, normally with the next version
+            expected_version: Version the stored document must have; None
+                matches a missing document or one without a version
+        
+        Returns:
+            True if stored, False if the document was changed meanwhile
+        """
+    
+    @abstractmethod
+    def delete(self, kind: str, key: str) -> bool:
+        """Delete a document; returns whether it existed."""
+    
+    @abstractmethod
+    def keys(self, kind: str, status: Optional[str] = None) -> List[str]:
+        """Ids of the documents of a kind, optionally only those with a status."""
+    
+    @abstractmethod
+    def heartbeat(self, kind: str, keys: List[str]) -> int:
+        """
+        Touch the update time of running documents owned by this worker, so
+        other workers can tell they are still being worked on.
+        
+        Args:
+            kind: Document kind
+            keys: Ids of the documents
+        
+        Returns:
+            Number of documents touched
+        """
+    
+    def flush_access_times(self) -> int:
+        """
+        Write the access times of documents read since the last flush (backends
+        that batch them; eviction uses them to find the least recently used).
+        
+        Returns:
+            Number of documents updated
+        """
+        return 0
+    
+    def recover_interrupted(self, kind: str) -> int:
+        """
+        Mark documents left running by a worker that no longer exists as failed.
+        
+        Returns:
+            Number of documents marked as failed
+        """
+        return 0
+    
+    @abstractmethod
+    def evict(self) -> Dict:
+        """
+        Replace expired and least recently used finished documents with an
+        "expired" marker, and drop markers older than the tombstone TTL.
+        
+        Returns:
+            Counts of "expired", "evicted" and "purged" documents
+        """
+    
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Backend statistics."""
+    
+    def close(self) -> None:
+        """Release the backend's resources."""
+
+
+class SQLiteStateStore(StateStore):
+    """State store in a SQLite database shared by the workers of a host."""
+    
+    def __init__(
+        self,
+        path: str = STATE_DB_PATH,
+        ttl_seconds: int = STATE_TTL_SECONDS,
+        max_entries: int = STATE_MAX_ENTRIES,
+        max_bytes: int = STATE_MAX_BYTES,
+        tombstone_ttl_seconds: int = STATE_TOMBSTONE_TTL_SECONDS,
+        stale_seconds: int = STATE_STALE_SECONDS
+    ):
+        """
+        Open the database, creating it if missing.
+        
+        Args:
+            path: SQLite database file
+            ttl_seconds: Lifetime of a document after its last update
+            max_entries: Maximum number of documents
+            max_bytes: Maximum total size of the documents
+            tombstone_ttl_seconds: How long "expired" markers are kept
+            stale_seconds: Age of the last update after which another worker's
+                running document is considered abandoned
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tombstone_ttl_seconds = tombstone_ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = _owner_id()
+        self._lock = threading.Lock()
+        # Access times of documents read since the last flush, by (kind, key)
+        self._accessed: Dict[Tuple[str, str], float] = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+    
+    def _create_schema(self) -> None:
+        """Create tables and indexes if missing."""
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS state (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    status TEXT,
+                    owner TEXT,
+                    data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, key)
+                )"""
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(state)").fetchall()]
+            if "last_accessed" not in columns:
+                self._conn.execute("ALTER TABLE state ADD COLUMN last_accessed REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_state_kind_status ON state(kind, status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_state_updated_at ON state(updated_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+            )
+    
+    def _bump(self, name: str, amount: int = 1) -> None:
+        """Increment a shared counter (caller holds the lock and a transaction)."""
+        self._conn.execute(
+            "INSERT INTO stats(name, value) VALUES(?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+    
+    def get(self, kind: str, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM state WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            if row is not None:
+                self._accessed[(kind, key)] = time.time()
+        return json.loads(row[0]) if row else None
+    
+    def flush_access_times(self) -> int:
+        with self._lock, self._conn:
+            accessed, self._accessed = self._accessed, {}
+            if accessed:
+                self._conn.executemany(
+                    "UPDATE state SET last_accessed = MAX(last_accessed, ?) WHERE kind = ? AND key = ?",
+                    [(accessed_at, kind, key) for (kind, key), accessed_at in accessed.items()]
+                )
+        return len(accessed)
+    
+    def put_serialized(self, kind: str, key: str, status: Optional[str], data: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO state(kind, key, status, owner, data, size, created_at, updated_at, last_accessed) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(kind, key) DO UPDATE SET status = excluded.status, owner = excluded.owner, "
+                "data = excluded.data, size = excluded.size, updated_at = excluded.updated_at, "
+                "last_accessed = excluded.last_accessed",
+                (kind, key, status, self.owner, data, len(data.encode("utf-8")), now, now, now)
+            )
+    
+    def put_if_version(self, kind: str, key: str, value: Dict, expected_version: Optional[int]) -> bool:
+        data = _serialize(value)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._conn:
+            stored = self._conn.execute(
+                "UPDATE state SET status = ?, owner = ?, data = ?, size = ?, updated_at = ?, last_accessed = ? "
+                "WHERE kind = ? AND key = ? AND json_extract(data, '$.version') IS ?",
+                (value.get("status"), self.owner, data, size, now, now, kind, key, expected_version)
+            ).rowcount
+            if not stored and expected_version is None:
+                stored = self._conn.execute(
+                    "INSERT OR IGNORE INTO state(kind, key, status, owner, data, size, created_at, updated_at, "
+                    "last_accessed) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key, value.get("status"), self.owner, data, size, now, now, now)
+                ).rowcount
+        return stored > 0
+    
+    def evict(self) -> Dict:
+        self.flush_access_times()
+        now = time.time()
+        with self._lock, self._conn:
+            entries = [
+                ((kind, key), status, size, updated_at, last_accessed)
+                for kind, key, status, size, updated_at, last_accessed in self._conn.execute(
+                    "SELECT kind, key, status, size, updated_at, last_accessed FROM state WHERE status IS NOT ?",
+                    (EXPIRED_STATUS,)
+                ).fetchall()
+            ]
+            expired, evicted = _plan_eviction(entries, now, self.ttl_seconds, self.max_entries, self.max_bytes)
+            for ids, reason in ((expired, "ttl"), (evicted, "capacity")):
+                marker = _tombstone(now, reason)
+                for kind, key in ids:
+                    self._conn.execute(
+                        "UPDATE state SET status = ?, data = ?, size = ?, updated_at = ? WHERE kind = ? AND key = ?",
+                        (EXPIRED_STATUS, marker, len(marker), now, kind, key)
+                    )
+            purged = self._conn.execute(
+                "DELETE FROM state WHERE status = ? AND updated_at < ?",
+                (EXPIRED_STATUS, now - self.tombstone_ttl_seconds)
+            ).rowcount
+            if expired:
+                self._bump("expired", len(expired))
+            if evicted:
+                self._bump("evicted", len(evicted))
+        return {"expired": len(expired), "evicted": len(evicted), "purged": purged}
+    
+    def delete(self, kind: str, key: str) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM state WHERE kind = ? AND key = ?", (kind, key)
+            ).rowcount > 0
+    
+    def keys(self, kind: str, status: Optional[str] = None) -> List[str]:
+        with self._lock:
+            if status is None:
+                rows = self._conn.execute("SELECT key FROM state WHERE kind = ?", (kind,)).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT key FROM state WHERE kind = ? AND status = ?", (kind, status)
+                ).fetchall()
+        return [row[0] for row in rows]
+    
+    def heartbeat(self, kind: str, keys: List[str]) -> int:
+        if not keys:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.executemany(
+                "UPDATE state SET updated_at = ? WHERE kind = ? AND key = ? AND owner = ? AND status = 'running'",
+                [(time.time(), kind, key, self.owner) for key in keys]
+            ).rowcount
+    
+    def recover_interrupted(self, kind: str) -> int:
+        host = socket.gethostname()
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, owner, data, updated_at FROM state "
+                "WHERE kind = ? AND status = 'running' AND owner IS NOT ?",
+                (kind, self.owner)
+            ).fetchall()
+        
+        recovered = 0
+        for key, owner, data, updated_at in rows:
+            owner_host, owner_pid = _parse_owner(owner)
+            # A process of this host that is gone, or whose pid is now ours, is dead at once;
+            # any other owner is dead once it stops touching its documents
+            dead = owner_host == host and owner_pid is not None and (
+                owner_pid == os.getpid() or not _pid_alive(owner_pid)
+            )
+            if not dead and now - updated_at <= self.stale_seconds:
+                continue
+            value = json.loads(data)
+            value["status"] = "failed"
+            value["error"] = "Interrupted by a server restart. Please start again."
+            value["message"] = "Interrupted"
+            data = _serialize(value)
+            with self._lock, self._conn:
+                # Skip documents written since they were read (their owner is alive after all)
+                recovered += self._conn.execute(
+                    "UPDATE state SET status = ?, owner = ?, data = ?, size = ?, updated_at = ?, last_accessed = ? "
+                    "WHERE kind = ? AND key = ? AND status = 'running' AND updated_at = ?",
+                    ("failed", self.owner, data, len(data.encode("utf-8")), now, now, kind, key, updated_at)
+                ).rowcount
+        return recovered
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, status, COUNT(*), COALESCE(SUM(size), 0) FROM state GROUP BY kind, status"
+            ).fetchall()
+            counters = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+        kinds: Dict[str, Dict] = {}
+        for kind, status, count, size in rows:
+            entry = kinds.setdefault(kind, {"entries": 0, "total_bytes": 0, "by_status": {}})
+            entry["entries"] += count
+            entry["total_bytes"] += size
+            entry["by_status"][status or "none"] = count
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "kinds": kinds,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "expired": counters.get("expired", 0),
+            "evicted": counters.get("evicted", 0),
+        }
+    
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush_access_times()
+            self._conn.close()
+            self._conn = None
+
+
+class MemoryStateStore(StateStore):
+    """State store in this process's memory (single worker, lost on restart)."""
+    
+    def __init__(
+        self,
+        ttl_seconds: int = STATE_TTL_SECONDS,
+        max_entries: int = STATE_MAX_ENTRIES,
+        max_bytes: int = STATE_MAX_BYTES,
+        tombstone_ttl_seconds: int = STATE_TOMBSTONE_TTL_SECONDS
+    ):
+        """
+        Initialize an empty store.
+        
+        Args:
+            ttl_seconds: Lifetime of a document after its last update
+            max_entries: Maximum number of documents
+            max_bytes: Maximum total size of the documents
+            tombstone_ttl_seconds: How long "expired" markers are kept
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tombstone_ttl_seconds = tombstone_ttl_seconds
+        self._documents: Dict[tuple, Dict] = {}
+        self._counters = {"expired": 0, "evicted": 0}
+        # Re-entrant: put_if_version stores while holding it
+        self._lock = threading.RLock()
+    
+    def get(self, kind: str, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._documents.get((kind, key))
+            if entry is not None:
+                entry["last_accessed"] = time.time()
+        return json.loads(entry["data"]) if entry else None
+    
+    def put_serialized(self, kind: str, key: str, status: Optional[str], data: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._documents[(kind, key)] = {
+                "status": status,
+                "data": data,
+                "size": len(data.encode("utf-8")),
+                "updated_at": now,
+                "last_accessed": now,
+            }
+    
+    def put_if_version(self, kind: str, key: str, value: Dict, expected_version: Optional[int]) -> bool:
+        with self._lock:
+            entry = self._documents.get((kind, key))
+            if entry is not None and json.loads(entry["data"]).get("version") != expected_version:
+                return False
+            self.put(kind, key, value)
+        return True
+    
+    def heartbeat(self, kind: str, keys: List[str]) -> int:
+        now = time.time()
+        touched = 0
+        with self._lock:
+            for key in keys:
+                entry = self._documents.get((kind, key))
+                if entry is not None and entry["status"] == "running":
+                    entry["updated_at"] = now
+                    touched += 1
+        return touched
+    
+    def delete(self, kind: str, key: str) -> bool:
+        with self._lock:
+            return self._documents.pop((kind, key), None) is not None
+    
+    def keys(self, kind: str, status: Optional[str] = None) -> List[str]:
+        with self._lock:
+            return [
+                key for (entry_kind, key), entry in self._documents.items()
+                if entry_kind == kind and (status is None or entry["status"] == status)
+            ]
+    
+    def evict(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            entries = [
+                (document_id, e["status"], e["size"], e["updated_at"], e["last_accessed"])
+                for document_id, e in self._documents.items() if e["status"] != EXPIRED_STATUS
+            ]
+            expired, evicted = _plan_eviction(entries, now, self.ttl_seconds, self.max_entries, self.max_bytes)
+            for ids, reason in ((expired, "ttl"), (evicted, "capacity")):
+                marker = _tombstone(now, reason)
+                for document_id in ids:
+                    self._documents[document_id].update(
+                        status=EXPIRED_STATUS, data=marker, size=len(marker), updated_at=now
+                    )
+            purged = [
+                document_id for document_id, e in self._documents.items()
+                if e["status"] == EXPIRED_STATUS and e["updated_at"] < now - self.tombstone_ttl_seconds
+            ]
+            for document_id in purged:
+                del self._documents[document_id]
+            self._counters["expired"] += len(expired)
+            self._counters["evicted"] += len(evicted)
+        return {"expired": len(expired), "evicted": len(evicted), "purged": len(purged)}
+    
+    def stats(self) -> Dict:
+        kinds: Dict[str, Dict] = {}
+        with self._lock:
+            for (kind, _), entry in self._documents.items():
+                stats = kinds.setdefault(kind, {"entries": 0, "total_bytes": 0, "by_status": {}})
+                stats["entries"] += 1
+                stats["total_bytes"] += entry["size"]
+                status = entry["status"] or "none"
+                stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
+            counters = dict(self._counters)
+        return {
+            "backend": "memory",
+            "kinds": kinds,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **counters,
+        }
+
+
+class _LiveDocument(dict):
+    """A live document that records when it is changed, so unchanged ones are not serialized."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = True
+    
+    def __setitem__(self, key, value):
+        self.dirty = True
+        super().__setitem__(key, value)
+    
+    def __delitem__(self, key):
+        self.dirty = True
+        super().__delitem__(key)
+    
+    def update(self, *args, **kwargs):
+        self.dirty = True
+        super().update(*args, **kwargs)
+    
+    def setdefault(self, key, default=None):
+        # Usually followed by a change of the returned value
+        self.dirty = True
+        return super().setdefault(key, default)
+    
+    def pop(self, *args):
+        self.dirty = True
+        return super().pop(*args)
+    
+    def popitem(self):
+        self.dirty = True
+        return super().popitem()
+    
+    def clear(self):
+        self.dirty = True
+        super().clear()
+
+
+class StateView:
+    """
+    Dict-like view of one kind of document in the state store.
+    
+    Documents this worker is running stay live in memory, so the code that
+    updates them can keep mutating them in place; flush() writes the changed
+    ones to the store, where every worker reads them. Documents of other
+    workers (or released ones) are read from the store on each access.
+    
+    A live document counts as changed when one of its own keys is assigned
+    (or setdefault is called); a change only inside a nested value is
+    written with the next such assignment, or on release.
+    """
+    
+    def __init__(self, kind: str, keep_live: bool = True):
+        """
+        Initialize the view.
+        
+        Args:
+            kind: Document kind in the store
+            keep_live: Keep assigned documents in memory until released; when
+                False, assignments are written through and not retained
+        """
+        self.kind = kind
+        self.keep_live = keep_live
+        self._live: Dict[str, _LiveDocument] = {}
+        # Sequence number of the latest snapshot of each live document; a
+        # snapshot written from a thread is dropped once a newer one exists
+        self._latest: Dict[str, int] = {}
+        self._sequence = 0
+        self._write_lock = threading.Lock()
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._live or get_state_store().get(self.kind, key) is not None
+    
+    def __getitem__(self, key: str) -> Dict:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key: str, value: Dict) -> None:
+        if self.keep_live:
+            value = self._live[key] = _LiveDocument(value)
+        self._write(key, value)
+    
+    def __delitem__(self, key: str) -> None:
+        self._live.pop(key, None)
+        self._latest.pop(key, None)
+        with self._write_lock:
+            deleted = get_state_store().delete(self.kind, key)
+        if not deleted:
+            raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """The live document, else the stored one, else default."""
+        if key in self._live:
+            return self._live[key]
+        value = get_state_store().get(self.kind, key)
+        return default if value is None else value
+    
+    def keys(self, status: Optional[str] = None) -> List[str]:
+        """Ids of the stored documents, optionally only those with a status."""
+        return get_state_store().keys(self.kind, status)
+    
+    def is_live(self, key: str) -> bool:
+        """Whether the document is live in this worker (its job runs here)."""
+        return key in self._live
+    
+    def _snapshot(self, key: str, value: Dict) -> Tuple[str, Optional[int], Optional[str], str]:
+        """Serialize a document for writing; call from the thread that changes it."""
+        sequence = None
+        if key in self._live:
+            self._sequence += 1
+            sequence = self._latest[key] = self._sequence
+            self._live[key].dirty = False
+        return key, sequence, value.get("status"), _serialize(value)
+    
+    def _put(self, snapshots: List[Tuple[str, Optional[int], Optional[str], str]]) -> None:
+        """Write snapshots, skipping those of documents snapshotted again, released or deleted since."""
+        store = get_state_store()
+        for key, sequence, status, data in snapshots:
+            with self._write_lock:
+                if sequence is None or self._latest.get(key) == sequence:
+                    store.put_serialized(self.kind, key, status, data)
+    
+    def _write(self, key: str, value: Dict) -> None:
+        self._put([self._snapshot(key, value)])
+    
+    def _changed_snapshots(self) -> List[Tuple[str, Optional[int], Optional[str], str]]:
+        return [self._snapshot(key, value) for key, value in list(self._live.items()) if value.dirty]
+    
+    def _mark_unwritten(self, snapshots: List[Tuple[str, Optional[int], Optional[str], str]]) -> None:
+        for key, *_ in snapshots:
+            if key in self._live:
+                self._live[key].dirty = True
+    
+    def flush(self) -> int:
+        """
+        Write the live documents that changed since they were last written.
+        
+        Returns:
+            Number of documents written
+        """
+        snapshots = self._changed_snapshots()
+        try:
+            self._put(snapshots)
+        except Exception:
+            self._mark_unwritten(snapshots)
+            raise
+        return len(snapshots)
+    
+    async def aflush(self) -> int:
+        """
+        Async variant of flush: the changed documents are serialized on the
+        event loop and written to the store in a thread.
+        
+        Returns:
+            Number of documents written
+        """
+        snapshots = self._changed_snapshots()
+        if not snapshots:
+            return 0
+        try:
+            await asyncio.to_thread(self._put, snapshots)
+        except Exception:
+            self._mark_unwritten(snapshots)
+            raise
+        return len(snapshots)
+    
+    def heartbeat(self) -> int:
+        """
+        Touch the live documents in the store (see StateStore.heartbeat).
+        
+        Returns:
+            Number of documents touched
+        """
+        return get_state_store().heartbeat(self.kind, list(self._live))
+    
+    async def aheartbeat(self) -> int:
+        """
+        Async variant of heartbeat, touching the documents in a thread.
+        
+        Returns:
+            Number of documents touched
+        """
+        return await asyncio.to_thread(get_state_store().heartbeat, self.kind, list(self._live))
+    
+    def release(self, key: str) -> None:
+        """Write a live document one last time and stop keeping it in memory."""
+        value = self._live.get(key)
+        if value is not None:
+            self._write(key, value)
+        self._live.pop(key, None)
+        self._latest.pop(key, None)
+
+
+_state_store: Optional[StateStore] = None
+
+
+def get_state_store() -> StateStore:
+    """Get the process-wide state store, opening it on first use."""
+    global _state_store
+    if _state_store is None:
+        if STATE_BACKEND == "memory":
+            _state_store = MemoryStateStore()
+        else:
+            if STATE_BACKEND != "sqlite":
+                print(f"⚠️  Warning: Unknown STATE_BACKEND {STATE_BACKEND!r}, using sqlite")
+            _state_store = SQLiteStateStore()
+    return _state_store
+
+
+def close_state_store() -> None:
+    """Close the process-wide state store."""
+    global _state_store
+    if _state_store is not None:
+        _state_store.close()
+    _state_store = None
@@ -569,7 +569,7 @@ function init() {
     if (generateBtn) {
         generateBtn.addEventListener('click', async () => {
             try {
-                const response = await fetch(`${API_BASE}/api/v1/resume/generate`, {
+                const response = await fetch(`${API_BASE}/api/v1/resume/generate?workflow_id=${state.workflowId}`, {
                     method: 'POST'
                 });
                 const data = await response.json();
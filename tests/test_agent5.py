@@ -0,0 +1,74 @@
+"""Tests for the parallel interview preparation of Agent 5."""
+import asyncio
+import json
+
+import pytest
+
+import agent5
+from agent5 import PART_ATTEMPTS, InterviewPreparationAgent
+
+BEHAVIORAL = {"self_introduction": {"script": "Hi"}}
+SUMMARY = {"key_preparation_focus_areas": ["SQL"]}
+DOMAIN = {"questions": [{"question": "How do payments settle?"}]}
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    """An agent planning only the behavioral and business domain parts."""
+    monkeypatch.setattr(agent5, "STUDENT_PORTAL_API_KEY", "test-key")
+    monkeypatch.setattr(agent5, "AGENT5_DEEP_DIVE_PROJECTS", 0)
+    # The JSON parser writes its debug file to the working directory
+    monkeypatch.chdir(tmp_path)
+    return InterviewPreparationAgent()
+
+
+def fake_completion(monkeypatch, domain_replies):
+    """Answer the business domain part with the next of domain_replies, the others correctly."""
+    calls = []
+    
+    async def chat_completion(payload, **kwargs):
+        request = payload["messages"][-1]["content"]
+        if "theme_3_business_domain key" in request:
+            calls.append("business_domain")
+            reply = domain_replies[min(len(calls), len(domain_replies)) - 1]
+        else:
+            reply = {"theme_1_behavioral_interview": BEHAVIORAL, "preparation_summary": SUMMARY}
+        return {"choices": [{"message": {"content": json.dumps(reply)}}]}
+    monkeypatch.setattr(agent5, "chat_completion", chat_completion)
+    return calls
+
+
+def prepare(agent):
+    return asyncio.run(agent.aprepare_interview_parallel("JD", "Resume", {}, {}))
+
+
+def test_reply_without_the_requested_sections_is_a_parse_error(agent):
+    result = {"choices": [{"message": {"content": json.dumps({"theme_1_behavioral_interview": BEHAVIORAL})}}]}
+    
+    parsed = agent._parse_sections(result, ["theme_1_behavioral_interview", "preparation_summary"])
+    
+    assert parsed["parse_error"] == "Response is missing sections: preparation_summary"
+    assert parsed["theme_1_behavioral_interview"] == BEHAVIORAL
+
+
+def test_part_with_the_wrong_keys_is_retried_and_reported(agent, monkeypatch):
+    calls = fake_completion(monkeypatch, [{"business_questions": DOMAIN}])
+    
+    interview_prep = prepare(agent)
+    
+    assert calls == ["business_domain"] * PART_ATTEMPTS
+    assert interview_prep["partial"] is True
+    assert list(interview_prep["part_errors"]) == ["business_domain"]
+    assert "theme_3_business_domain" in interview_prep["part_errors"]["business_domain"]
+    assert "error" not in interview_prep
+    assert interview_prep["theme_1_behavioral_interview"]["self_introduction"] == BEHAVIORAL["self_introduction"]
+
+
+def test_part_whose_retry_succeeds_is_not_partial(agent, monkeypatch):
+    calls = fake_completion(monkeypatch, [{"theme_3_business_domain": "not an object"}, {"theme_3_business_domain": DOMAIN}])
+    
+    interview_prep = prepare(agent)
+    
+    assert calls == ["business_domain"] * 2
+    assert "partial" not in interview_prep
+    assert interview_prep["theme_3_business_domain"]["questions"] == DOMAIN["questions"]
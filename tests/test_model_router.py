@@ -0,0 +1,87 @@
+"""Tests for latency-SLO model routing."""
+import pytest
+
+import llm_client
+import model_router
+import token_budget
+from config import LLM_MIN_OUTPUT_TOKENS, LLM_ROUTING_MIN_SAMPLES
+from model_router import ModelRouter, route_payload
+from token_budget import EstimatingTokenCounter
+
+
+@pytest.fixture(autouse=True)
+def windows(monkeypatch):
+    monkeypatch.setattr(model_router, "TOKEN_BUDGET_ENABLED", True)
+    monkeypatch.setattr(token_budget, "TOKEN_BUDGET_ENABLED", True)
+    monkeypatch.setattr(token_budget, "_counter", EstimatingTokenCounter())
+    monkeypatch.setattr(token_budget, "_calibration", {})
+    for model, window in (("small", 2000), ("mid", 16000), ("big", 100000)):
+        monkeypatch.setitem(token_budget._context_windows, model, window)
+    monkeypatch.setattr(llm_client, "_latency_trackers", {})
+
+
+def seed_latency(model: str, seconds: float) -> None:
+    tracker = llm_client.get_latency_tracker("agent2", model)
+    for _ in range(LLM_ROUTING_MIN_SAMPLES):
+        tracker.record(seconds, True)
+
+
+def payload(words: int) -> dict:
+    return {"model": "big", "messages": [{"role": "user", "content": "word " * words}], "max_tokens": 4000}
+
+
+def test_small_prompt_takes_the_first_model():
+    router = ModelRouter(policies={"agent2": {"models": ["small", "mid"]}}, enabled=True)
+    
+    assert router.route("agent2", payload(100))["model"] == "small"
+
+
+def test_models_whose_window_cannot_hold_the_prompt_are_skipped():
+    router = ModelRouter(policies={"agent2": {"models": ["small", "mid"]}}, enabled=True)
+    
+    decision = router.route("agent2", payload(3000))
+    
+    assert decision["model"] == "mid"
+    small = next(c for c in decision["candidates"] if c["model"] == "small")
+    assert small["eligible"] is False
+    assert small["fits"] is False
+
+
+@pytest.mark.parametrize("mid_seconds, big_seconds, fastest", [(30, 10, "big"), (10, 30, "mid")])
+def test_fallback_picks_the_fastest_model_that_fits(mid_seconds, big_seconds, fastest):
+    router = ModelRouter(policies={"agent2": {"models": ["small", "mid"], "latency_slo": 5}}, enabled=True)
+    # Every model misses the SLO; the fastest one cannot hold the prompt
+    seed_latency("small", 6)
+    seed_latency("mid", mid_seconds)
+    seed_latency("big", big_seconds)
+    
+    decision = router.route("agent2", payload(3000))
+    
+    assert decision["model"] == fastest
+    assert decision["model"] != "small"
+    assert "fastest available" in decision["reason"]
+
+
+def test_default_model_takes_prompts_too_large_for_the_others():
+    router = ModelRouter(policies={"agent2": {"models": ["small", "mid"]}}, enabled=True)
+    
+    assert router.route("agent2", payload(50000))["model"] == "big"
+
+
+def test_default_model_is_kept_when_no_model_fits():
+    router = ModelRouter(policies={"agent2": {"models": ["small", "mid"]}}, enabled=True)
+    
+    decision = router.route("agent2", payload(200000))
+    
+    assert decision["model"] == "big"
+    assert "no model's context window fits" in decision["reason"]
+
+
+def test_route_payload_clamps_max_tokens_to_the_routed_window(monkeypatch):
+    router = ModelRouter(policies={"agent2": {"models": ["small"]}}, enabled=True)
+    monkeypatch.setattr(model_router, "_model_router", router)
+    
+    routed = route_payload("agent2", payload(500))
+    
+    assert routed["model"] == "small"
+    assert LLM_MIN_OUTPUT_TOKENS <= routed["max_tokens"] < 4000
@@ -0,0 +1,30 @@
+"""Tests for the in-process progress bus."""
+import asyncio
+
+from progress_bus import ProgressBus
+
+
+def test_wait_without_timeout_returns_on_publish():
+    bus = ProgressBus()
+    state = {"status": "running"}
+    
+    async def scenario():
+        with bus.subscription("w1"):
+            waiting = asyncio.ensure_future(bus.wait("w1", None))
+            await asyncio.sleep(0)
+            assert not waiting.done()
+            bus.publish("w1", state)
+            return await waiting
+    
+    assert asyncio.run(scenario()) is True
+    assert state["version"] == 1
+
+
+def test_wait_times_out_without_publish():
+    bus = ProgressBus()
+    
+    async def scenario():
+        with bus.subscription("w1"):
+            return await bus.wait("w1", 0.01)
+    
+    assert asyncio.run(scenario()) is False
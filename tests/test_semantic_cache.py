@@ -0,0 +1,170 @@
+"""Tests for the semantic Agent 2 analysis cache."""
+import asyncio
+import os
+import threading
+
+import semantic_cache
+from semantic_cache import HashingEmbedder, SemanticAnalysisCache, context_hash
+
+JD = "Senior Python engineer to build data pipelines with Airflow, Spark and AWS. Experience with SQL required."
+CANDIDATE = "Built ETL pipelines in Python and Spark on AWS; led a team of four data engineers; strong SQL."
+NEAR_CANDIDATE = CANDIDATE.replace("four", "five")
+OTHER_CANDIDATE = "Frontend developer with React and TypeScript, designs UI components."
+CONTEXT = context_hash("model-a", "system prompt")
+
+
+def make_cache(tmp_path, **kwargs) -> SemanticAnalysisCache:
+    options = {"threshold": 0.9, "mode": "reuse", "enabled": True}
+    options.update(kwargs)
+    return SemanticAnalysisCache(
+        embedder=HashingEmbedder(),
+        metadata_file=str(tmp_path / "analyses.jsonl"),
+        vectors_file=str(tmp_path / "analyses.f32"),
+        **options
+    )
+
+
+def test_identical_candidate_is_reusable(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    hit = cache.lookup(JD, CANDIDATE, CONTEXT)
+    
+    assert hit is not None
+    assert hit["analysis"] == {"score": 1}
+    assert hit["reusable"] is True
+
+
+def test_near_candidate_above_threshold_is_warm_start_only(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    hit = cache.lookup(JD, NEAR_CANDIDATE, CONTEXT)
+    
+    assert hit is not None
+    assert hit["candidate_similarity"] >= cache.threshold
+    assert hit["reusable"] is False
+
+
+def test_near_candidate_below_threshold_misses(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.99)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    assert cache.lookup(JD, NEAR_CANDIDATE, CONTEXT) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_matching_jd_does_not_make_up_for_a_different_candidate(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.5)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    assert cache.lookup(JD, OTHER_CANDIDATE, CONTEXT) is None
+
+
+def test_warm_start_mode_never_reuses(tmp_path):
+    cache = make_cache(tmp_path, mode="warm_start")
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    assert cache.lookup(JD, CANDIDATE, CONTEXT)["reusable"] is False
+
+
+def test_entries_are_keyed_on_the_model(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    assert cache.lookup(JD, CANDIDATE, context_hash("model-b", "system prompt")) is None
+
+
+def test_expired_entries_miss_and_are_pruned(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = make_cache(tmp_path, ttl_seconds=60, max_entries=5)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    now[0] += 61
+    assert cache.lookup(JD, CANDIDATE, CONTEXT) is None
+    
+    cache.store(JD, OTHER_CANDIDATE, CONTEXT, {"score": 2})
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["pruned"] == 1
+
+
+def test_oldest_entries_are_dropped_above_max_entries(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    cache.store(JD, OTHER_CANDIDATE, CONTEXT, {"score": 2})
+    cache.store("Product manager for a payments platform.", CANDIDATE, CONTEXT, {"score": 3})
+    
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(JD, CANDIDATE, CONTEXT) is None
+    assert cache.lookup(JD, OTHER_CANDIDATE, CONTEXT)["analysis"] == {"score": 2}
+
+
+def test_stores_of_another_instance_are_kept(tmp_path):
+    first = make_cache(tmp_path)
+    second = make_cache(tmp_path)
+    first.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    second.store(JD, OTHER_CANDIDATE, CONTEXT, {"score": 2})
+    
+    reloaded = make_cache(tmp_path)
+    assert reloaded.stats()["entries"] == 2
+    assert reloaded.lookup(JD, CANDIDATE, CONTEXT)["analysis"] == {"score": 1}
+
+
+def test_disabled_cache_does_nothing(tmp_path):
+    cache = make_cache(tmp_path, enabled=False)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    
+    assert cache.lookup(JD, CANDIDATE, CONTEXT) is None
+    assert not (tmp_path / "analyses.jsonl").exists()
+
+
+def test_store_appends_one_line_and_row(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    metadata_file = tmp_path / "analyses.jsonl"
+    before = metadata_file.read_bytes()
+    inode = os.stat(metadata_file).st_ino
+    
+    cache.store(JD, OTHER_CANDIDATE, CONTEXT, {"score": 2})
+    
+    after = metadata_file.read_bytes()
+    assert after.startswith(before)
+    assert after[len(before):].count(b"\n") == 1
+    assert os.stat(metadata_file).st_ino == inode
+    assert (tmp_path / "analyses.f32").stat().st_size == 2 * 2 * HashingEmbedder().dim * 4
+
+
+def test_incomplete_line_of_a_crashed_writer_is_overwritten(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(JD, CANDIDATE, CONTEXT, {"score": 1})
+    with open(tmp_path / "analyses.jsonl", "ab") as f:
+        f.write(b'{"context_hash": "trunc')
+    
+    other = make_cache(tmp_path)
+    other.store(JD, OTHER_CANDIDATE, CONTEXT, {"score": 2})
+    
+    reloaded = make_cache(tmp_path)
+    assert reloaded.stats()["entries"] == 2
+    assert reloaded.lookup(JD, OTHER_CANDIDATE, CONTEXT)["analysis"] == {"score": 2}
+
+
+def test_async_lookup_and_store_run_off_the_event_loop(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    threads = []
+    for name in ("_search", "_store"):
+        method = getattr(cache, name)
+        
+        def record(*args, _method=method):
+            threads.append(threading.current_thread())
+            return _method(*args)
+        monkeypatch.setattr(cache, name, record)
+    
+    async def scenario():
+        await cache.astore(JD, CANDIDATE, CONTEXT, {"score": 1})
+        return await cache.alookup(JD, CANDIDATE, CONTEXT)
+    
+    assert asyncio.run(scenario())["analysis"] == {"score": 1}
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,89 @@
+"""Tests for the per-workflow optimization session registry."""
+import pytest
+
+import state_store
+from session_registry import OptimizationSessionRegistry, SessionConflictError, UPDATE_ATTEMPTS
+from state_store import MemoryStateStore
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MemoryStateStore()
+    monkeypatch.setattr(state_store, "_state_store", store)
+    store.put("workflow_results", "w1", {"status": "completed", "resume_text": "Resume"})
+    return store
+
+
+def record(name):
+    def change(service):
+        service.modification_history.append(name)
+        return name
+    return change
+
+
+def test_update_saves_a_new_version(store):
+    registry = OptimizationSessionRegistry()
+    
+    _, result = registry.update("w1", record("first"))
+    
+    assert result == "first"
+    assert store.get("session", "w1")["version"] == 1
+    registry.update("w1", record("second"))
+    saved = store.get("session", "w1")
+    assert saved["version"] == 2
+    assert saved["modification_history"] == ["first", "second"]
+
+
+def test_update_of_a_missing_workflow_returns_none(store):
+    assert OptimizationSessionRegistry().update("missing", record("first")) is None
+
+
+def test_concurrent_change_is_applied_again_on_top(store):
+    worker_a, worker_b = OptimizationSessionRegistry(), OptimizationSessionRegistry()
+    worker_a.get("w1")
+    interleaved = []
+    
+    def change(service):
+        if not interleaved:
+            # Another worker saves while this change is being applied
+            interleaved.append(worker_b.update("w1", record("other worker")))
+        return record("this worker")(service)
+    
+    worker_a.update("w1", change)
+    
+    saved = store.get("session", "w1")
+    assert saved["modification_history"] == ["other worker", "this worker"]
+    assert saved["version"] == 2
+    assert worker_a.stats()["conflicts"] == 1
+
+
+def test_update_gives_up_after_repeated_conflicts(store):
+    worker_a, worker_b = OptimizationSessionRegistry(), OptimizationSessionRegistry()
+    
+    def change(service):
+        worker_b.update("w1", record("other worker"))
+        return record("this worker")(service)
+    
+    with pytest.raises(SessionConflictError):
+        worker_a.update("w1", change)
+    assert worker_a.stats()["conflicts"] == UPDATE_ATTEMPTS
+    assert "this worker" not in store.get("session", "w1")["modification_history"]
+    assert "this worker" not in worker_a.get("w1").modification_history
+
+
+@pytest.mark.parametrize("saved_first", [False, True])
+def test_change_that_raises_leaves_the_session_unchanged(store, saved_first):
+    registry = OptimizationSessionRegistry()
+    if saved_first:
+        registry.update("w1", record("first"))
+    saved = store.get("session", "w1")
+    
+    def change(service):
+        record("failed")(service)
+        raise ValueError("invalid change")
+    
+    with pytest.raises(ValueError):
+        registry.update("w1", change)
+    
+    assert store.get("session", "w1") == saved
+    assert registry.get("w1").modification_history == (["first"] if saved_first else [])
@@ -0,0 +1,247 @@
+"""Tests for the shared workflow state store."""
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import state_store
+from state_store import EXPIRED_STATUS, MemoryStateStore, SQLiteStateStore, StateStore, StateView, _plan_eviction
+
+# A pid no process has (above the kernel's pid limit)
+DEAD_PID = 99999999
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStateStore(path=str(tmp_path / "state.db"), ttl_seconds=3600, stale_seconds=120)
+    yield store
+    store.close()
+
+
+def row(store: SQLiteStateStore, kind: str, key: str) -> dict:
+    cursor = store._conn.execute("SELECT * FROM state WHERE kind = ? AND key = ?", (kind, key))
+    return dict(zip([column[0] for column in cursor.description], cursor.fetchone()))
+
+
+def set_row(store: SQLiteStateStore, kind: str, key: str, **columns) -> None:
+    """Overwrite columns of a stored document, e.g. to age it or hand it to another owner."""
+    assignments = ", ".join(f"{name} = ?" for name in columns)
+    with store._conn:
+        store._conn.execute(
+            f"UPDATE state SET {assignments} WHERE kind = ? AND key = ?", (*columns.values(), kind, key)
+        )
+
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+def test_access_times_are_written_in_batches(store):
+    store.put("workflow", "w1", {"status": "completed"})
+    set_row(store, "workflow", "w1", last_accessed=0)
+    
+    assert store.get("workflow", "w1") == {"status": "completed"}
+    assert row(store, "workflow", "w1")["last_accessed"] == 0
+    
+    assert store.flush_access_times() == 1
+    assert row(store, "workflow", "w1")["last_accessed"] > 0
+    assert store.flush_access_times() == 0
+
+
+def test_heartbeat_touches_only_own_running_documents(store):
+    store.put("workflow", "mine", {"status": "running"})
+    store.put("workflow", "done", {"status": "completed"})
+    store.put("workflow", "theirs", {"status": "running"})
+    set_row(store, "workflow", "theirs", owner="other-host:1:boot")
+    for key in ("mine", "done", "theirs"):
+        set_row(store, "workflow", key, updated_at=0)
+    
+    assert store.heartbeat("workflow", ["mine", "done", "theirs"]) == 1
+    assert row(store, "workflow", "mine")["updated_at"] > 0
+    assert row(store, "workflow", "done")["updated_at"] == 0
+    assert row(store, "workflow", "theirs")["updated_at"] == 0
+
+
+def test_heartbeat_keeps_running_documents_from_expiring(store):
+    store.put("workflow", "w1", {"status": "running"})
+    set_row(store, "workflow", "w1", updated_at=time.time() - store.ttl_seconds - 1)
+    store.heartbeat("workflow", ["w1"])
+    
+    assert store.evict()["expired"] == 0
+    assert store.get("workflow", "w1")["status"] == "running"
+
+
+def test_memory_store_heartbeat():
+    store = MemoryStateStore()
+    store.put("workflow", "w1", {"status": "running"})
+    store.put("workflow", "w2", {"status": "failed"})
+    
+    assert store.heartbeat("workflow", ["w1", "w2", "missing"]) == 1
+
+
+def running_elsewhere(store: SQLiteStateStore, key: str, owner: str, age: float = 0) -> None:
+    """Store a running workflow owned by another worker, last updated age seconds ago."""
+    store.put("workflow", key, {"status": "running", "progress": 40})
+    set_row(store, "workflow", key, owner=owner, updated_at=time.time() - age)
+
+
+def test_recover_fails_runs_of_a_dead_local_worker(store):
+    running_elsewhere(store, "w1", f"{socket.gethostname()}:{DEAD_PID}:boot")
+    
+    assert store.recover_interrupted("workflow") == 1
+    recovered = store.get("workflow", "w1")
+    assert recovered["status"] == "failed"
+    assert "restart" in recovered["error"]
+    assert store.keys("workflow", "failed") == ["w1"]
+
+
+def test_recover_fails_runs_of_an_earlier_process_with_our_pid(store):
+    running_elsewhere(store, "w1", f"{socket.gethostname()}:{os.getpid()}:earlier-boot")
+    
+    assert store.recover_interrupted("workflow") == 1
+
+
+def test_recover_keeps_fresh_runs_of_live_and_remote_workers(store):
+    running_elsewhere(store, "local", f"{socket.gethostname()}:{os.getppid()}:boot")
+    running_elsewhere(store, "remote", "other-host:1:boot")
+    
+    assert store.recover_interrupted("workflow") == 0
+    assert sorted(store.keys("workflow", "running")) == ["local", "remote"]
+
+
+def test_recover_fails_runs_whose_heartbeat_stopped(store):
+    running_elsewhere(store, "remote", "other-host:1:boot", age=store.stale_seconds + 1)
+    
+    assert store.recover_interrupted("workflow") == 1
+    assert store.get("workflow", "remote")["status"] == "failed"
+
+
+def test_recover_never_touches_own_runs(store):
+    store.put("workflow", "w1", {"status": "running"})
+    set_row(store, "workflow", "w1", updated_at=0)
+    
+    assert store.recover_interrupted("workflow") == 0
+
+
+def test_plan_eviction_expires_running_documents_past_the_ttl():
+    now = 10000.0
+    entries = [
+        ("abandoned", "running", 10, now - 200, now),
+        ("active", "running", 10, now - 10, now - 500),
+        ("done", "completed", 10, now - 10, now),
+    ]
+    
+    expired, evicted = _plan_eviction(entries, now, ttl_seconds=100, max_entries=10, max_bytes=1000)
+    
+    assert expired == ["abandoned"]
+    assert evicted == []
+
+
+def test_plan_eviction_evicts_least_recently_used_finished_documents():
+    now = 10000.0
+    entries = [
+        ("running", "running", 10, now, now - 900),
+        ("old", "completed", 10, now, now - 500),
+        ("unstatused", None, 10, now, now - 400),
+        ("recent", "failed", 10, now, now - 1),
+    ]
+    
+    _, evicted = _plan_eviction(entries, now, ttl_seconds=3600, max_entries=2, max_bytes=1000)
+    assert evicted == ["old", "unstatused"]
+    
+    _, evicted = _plan_eviction(entries, now, ttl_seconds=3600, max_entries=10, max_bytes=25)
+    assert evicted == ["old", "unstatused"]
+
+
+def test_evict_leaves_a_marker(store):
+    store.put("workflow", "w1", {"status": "completed"})
+    set_row(store, "workflow", "w1", updated_at=time.time() - store.ttl_seconds - 1)
+    
+    assert store.evict()["expired"] == 1
+    marker = store.get("workflow", "w1")
+    assert marker["status"] == EXPIRED_STATUS
+    assert marker["reason"] == "ttl"
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def any_store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStateStore()
+        return
+    store = SQLiteStateStore(path=str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def test_put_if_version_creates_only_missing_documents(any_store):
+    assert any_store.put_if_version("session", "w1", {"version": 1}, None) is True
+    assert any_store.put_if_version("session", "w1", {"version": 1, "lost": True}, None) is False
+    assert any_store.get("session", "w1") == {"version": 1}
+
+
+def test_put_if_version_rejects_a_stale_version(any_store):
+    any_store.put("session", "w1", {"version": 1})
+    
+    assert any_store.put_if_version("session", "w1", {"version": 2}, 1) is True
+    assert any_store.put_if_version("session", "w1", {"version": 2, "lost": True}, 1) is False
+    assert any_store.get("session", "w1") == {"version": 2}
+
+
+def test_put_if_version_matches_documents_without_a_version(any_store):
+    any_store.put("session", "w1", {"user_feedback": {}})
+    
+    assert any_store.put_if_version("session", "w1", {"version": 1}, None) is True
+    assert any_store.get("session", "w1") == {"version": 1}
+
+
+@pytest.fixture
+def view(monkeypatch):
+    monkeypatch.setattr(state_store, "_state_store", MemoryStateStore())
+    view = StateView("workflow")
+    view["w1"] = {"status": "running", "progress": 0}
+    view["w2"] = {"status": "running", "progress": 0}
+    return view
+
+
+def test_flush_serializes_only_changed_documents(view, monkeypatch):
+    serialized = []
+    serialize = state_store._serialize
+    monkeypatch.setattr(state_store, "_serialize", lambda value: serialized.append(value) or serialize(value))
+    
+    assert view.flush() == 0
+    view.get("w1")["progress"] = 40
+    
+    assert view.flush() == 1
+    assert serialized == [{"status": "running", "progress": 40}]
+    assert state_store.get_state_store().get("workflow", "w1")["progress"] == 40
+
+
+def test_aflush_writes_in_a_thread(view, monkeypatch):
+    store = state_store.get_state_store()
+    threads = []
+    put_serialized = store.put_serialized
+    
+    def record(*args):
+        threads.append(threading.current_thread())
+        put_serialized(*args)
+    monkeypatch.setattr(store, "put_serialized", record)
+    view.get("w1").update(progress=40)
+    
+    assert asyncio.run(view.aflush()) == 1
+    assert threading.main_thread() not in threads
+    assert store.get("workflow", "w1")["progress"] == 40
+
+
+def test_flush_in_flight_does_not_overwrite_a_newer_write(view):
+    view.get("w1")["progress"] = 40
+    in_flight = view._changed_snapshots()
+    view.get("w1")["status"] = "completed"
+    view.release("w1")
+    
+    view._put(in_flight)
+    
+    assert state_store.get_state_store().get("workflow", "w1")["status"] == "completed"
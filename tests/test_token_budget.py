@@ -0,0 +1,147 @@
+"""Tests for prompt token budgets."""
+import pytest
+
+import token_budget
+from config import LLM_CONTEXT_SAFETY_TOKENS, LLM_MIN_OUTPUT_TOKENS
+from token_budget import (
+    MIN_SECTION_TOKENS,
+    EstimatingTokenCounter,
+    PromptTooLargeError,
+    clamp_max_tokens,
+    count_message_tokens,
+    fit_prompt,
+    token_usage_log,
+)
+
+MODEL = "test-model"
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    """Estimate tokens and collect the budget reports of the test."""
+    monkeypatch.setattr(token_budget, "TOKEN_BUDGET_ENABLED", True)
+    monkeypatch.setattr(token_budget, "_counter", EstimatingTokenCounter())
+    monkeypatch.setattr(token_budget, "_calibration", {})
+    reports = []
+    reset = token_usage_log.set(reports)
+    yield reports
+    token_usage_log.reset(reset)
+
+
+def with_window(monkeypatch, window: int) -> None:
+    monkeypatch.setitem(token_budget._context_windows, MODEL, window)
+
+
+def words(count: int) -> str:
+    return "word " * count
+
+
+def render(sections):
+    return [f"JD:\n{sections['jd']}\n\nResume:\n{sections['resume']}"]
+
+
+def fit(system_prompt: str, jd: str, resume: str, max_tokens: int = 4000):
+    return fit_prompt(
+        "agent2", MODEL, system_prompt, {"jd": jd, "resume": resume}, render, max_tokens, ["resume", "jd"]
+    )
+
+
+def prompt_tokens(system_prompt: str, user_messages) -> int:
+    messages = [{"role": "system", "content": system_prompt}] + [{"role": "user", "content": m} for m in user_messages]
+    return count_message_tokens(messages, MODEL)
+
+
+@pytest.mark.parametrize("max_tokens", [40, 256, 1000])
+def test_truncate_stays_within_max_tokens_including_the_marker(max_tokens):
+    counter = EstimatingTokenCounter()
+    truncated = counter.truncate(words(5000), max_tokens)
+    
+    assert "tokens omitted" in truncated
+    assert counter.count(truncated) <= max_tokens
+    assert counter.count(counter.truncate(truncated, max_tokens // 2)) <= max_tokens // 2
+
+
+def test_prompt_that_fits_is_untouched(monkeypatch, budget):
+    with_window(monkeypatch, 20000)
+    
+    user_messages, max_tokens = fit("system", words(1000), words(2000))
+    
+    assert user_messages == render({"jd": words(1000), "resume": words(2000)})
+    assert max_tokens == 4000
+    assert budget[0]["trimmed_sections"] == {}
+
+
+def test_sections_are_trimmed_in_proportion(monkeypatch, budget):
+    with_window(monkeypatch, 10000)
+    
+    user_messages, max_tokens = fit("system", words(2000), words(8000))
+    
+    trimmed = budget[0]["trimmed_sections"]
+    resume_cut = trimmed["resume"]["from_tokens"] - trimmed["resume"]["to_tokens"]
+    jd_cut = trimmed["jd"]["from_tokens"] - trimmed["jd"]["to_tokens"]
+    assert max_tokens == 4000
+    assert prompt_tokens("system", user_messages) + LLM_CONTEXT_SAFETY_TOKENS + max_tokens <= 10000
+    # The long, less important section gives up most, the other one is shortened, not cut to its floor
+    assert resume_cut > 4 * jd_cut > 0
+    assert trimmed["jd"]["to_tokens"] > 4 * MIN_SECTION_TOKENS
+
+
+def test_sections_stop_at_their_floor_while_the_minimum_output_fits(monkeypatch, budget):
+    with_window(monkeypatch, 3000)
+    
+    user_messages, max_tokens = fit("system", words(2000), words(8000))
+    
+    trimmed = budget[0]["trimmed_sections"]
+    assert LLM_MIN_OUTPUT_TOKENS <= max_tokens < 4000
+    assert prompt_tokens("system", user_messages) + LLM_CONTEXT_SAFETY_TOKENS + max_tokens <= 3000
+    for name in ("jd", "resume"):
+        assert MIN_SECTION_TOKENS * 0.9 <= trimmed[name]["to_tokens"] <= MIN_SECTION_TOKENS * 1.1
+
+
+def test_sections_go_below_their_floor_for_the_minimum_output(monkeypatch, budget):
+    with_window(monkeypatch, 3000)
+    system_prompt = words(1500)
+    
+    user_messages, max_tokens = fit(system_prompt, words(2000), words(8000))
+    
+    trimmed = budget[0]["trimmed_sections"]
+    assert max_tokens >= LLM_MIN_OUTPUT_TOKENS
+    assert prompt_tokens(system_prompt, user_messages) + LLM_CONTEXT_SAFETY_TOKENS + max_tokens <= 3000
+    assert trimmed["resume"]["to_tokens"] < MIN_SECTION_TOKENS
+
+
+def test_untrimmable_prompt_without_room_for_the_minimum_output_raises(monkeypatch):
+    with_window(monkeypatch, 3000)
+    
+    with pytest.raises(PromptTooLargeError) as raised:
+        fit(words(2000), words(100), words(100))
+    
+    assert raised.value.model == MODEL
+    assert raised.value.context_window == 3000
+    assert raised.value.min_output_tokens == LLM_MIN_OUTPUT_TOKENS
+
+
+def test_minimum_output_is_capped_by_the_requested_max_tokens(monkeypatch):
+    with_window(monkeypatch, 3000)
+    
+    _, max_tokens = fit(words(2000), words(100), words(100), max_tokens=200)
+    
+    assert max_tokens == 200
+
+
+def test_clamp_max_tokens_shrinks_to_the_window(monkeypatch):
+    with_window(monkeypatch, 5000)
+    payload = {"model": MODEL, "messages": [{"role": "user", "content": words(2000)}], "max_tokens": 4000}
+    
+    clamp_max_tokens(payload)
+    
+    assert LLM_MIN_OUTPUT_TOKENS <= payload["max_tokens"] < 4000
+    assert count_message_tokens(payload["messages"], MODEL) + LLM_CONTEXT_SAFETY_TOKENS + payload["max_tokens"] <= 5000
+
+
+def test_clamp_max_tokens_refuses_less_than_the_minimum_output(monkeypatch):
+    with_window(monkeypatch, 3000)
+    payload = {"model": MODEL, "messages": [{"role": "user", "content": words(2000)}], "max_tokens": 4000}
+    
+    with pytest.raises(PromptTooLargeError):
+        clamp_max_tokens(payload)
@@ -0,0 +1,137 @@
+"""Tests for the workflow stage executor."""
+import asyncio
+
+import pytest
+
+from workflow_dag import WorkflowAborted, WorkflowDAG, WorkflowStage
+
+
+def stage(name, events, result=None, depends_on=None, speculative_after=None, wait_for=None, error=None):
+    """A stage that logs its start and end, optionally waiting for an event or raising."""
+    async def run(inputs):
+        events.append(("start", name, sorted(inputs)))
+        if wait_for is not None:
+            await wait_for.wait()
+        if error is not None:
+            raise error
+        events.append(("end", name))
+        return result if result is not None else name
+    return WorkflowStage(name, run, depends_on=depends_on, speculative_after=speculative_after)
+
+
+def run_dag(stages):
+    committed = []
+    report = asyncio.run(WorkflowDAG(stages, on_commit=lambda name, result: committed.append(name)).run())
+    return report, committed
+
+
+def test_dependent_stage_starts_after_commit_with_its_inputs():
+    events = []
+    report, committed = run_dag([
+        stage("agent1", events, result={"ok": True}),
+        stage("agent3", events, depends_on=["agent1"]),
+    ])
+    
+    assert report["completed"] is True
+    assert committed == ["agent1", "agent3"]
+    assert events.index(("end", "agent1")) < events.index(("start", "agent3", ["agent1"]))
+    assert report["results"]["agent1"] == {"ok": True}
+
+
+def test_speculative_result_is_committed_only_after_its_gate():
+    events = []
+    
+    async def scenario():
+        gate_open = asyncio.Event()
+        committed = []
+        stages = [
+            stage("agent1", events, wait_for=gate_open),
+            stage("agent2", events),
+            stage("interview", events, depends_on=["agent2"], speculative_after=["agent1"]),
+        ]
+        task = asyncio.ensure_future(WorkflowDAG(stages, on_commit=lambda name, result: committed.append(name)).run())
+        # The speculative stage finishes while its gate is still running
+        while ("end", "interview") not in events:
+            await asyncio.sleep(0)
+        assert "interview" not in committed
+        gate_open.set()
+        return await task, committed
+    
+    report, committed = asyncio.run(scenario())
+    
+    assert report["completed"] is True
+    assert committed == ["agent2", "agent1", "interview"]
+    assert report["timing"]["stages"]["interview"]["speculative"] is True
+
+
+def test_abort_cancels_speculative_stages_and_skips_dependents():
+    events = []
+    
+    async def scenario():
+        never = asyncio.Event()
+        committed = []
+        stages = [
+            stage("agent1", events, error=WorkflowAborted()),
+            stage("agent2", events, wait_for=never),
+            stage("agent3", events, depends_on=["agent1", "agent2"]),
+            stage("interview", events, speculative_after=["agent1"], wait_for=never),
+        ]
+        report = await WorkflowDAG(stages, on_commit=lambda name, result: committed.append(name)).run()
+        return report, committed
+    
+    report, committed = asyncio.run(scenario())
+    statuses = {name: entry["status"] for name, entry in report["timing"]["stages"].items()}
+    
+    assert report["aborted"] is True
+    assert report["completed"] is False
+    assert report["failed_stage"] == "agent1"
+    assert report["error"] is None
+    assert committed == []
+    assert statuses == {"agent1": "aborted", "agent2": "cancelled", "agent3": "skipped", "interview": "cancelled"}
+
+
+def test_finished_speculative_result_is_discarded_when_its_gate_aborts():
+    events = []
+    
+    async def scenario():
+        gate = asyncio.Event()
+        stages = [
+            stage("agent1", events, wait_for=gate, error=WorkflowAborted()),
+            stage("interview", events, speculative_after=["agent1"]),
+        ]
+        committed = []
+        task = asyncio.ensure_future(WorkflowDAG(stages, on_commit=lambda name, result: committed.append(name)).run())
+        while ("end", "interview") not in events:
+            await asyncio.sleep(0)
+        gate.set()
+        return await task, committed
+    
+    report, committed = asyncio.run(scenario())
+    
+    assert committed == []
+    assert report["timing"]["stages"]["interview"]["status"] == "discarded"
+
+
+def test_failure_reports_the_exception():
+    events = []
+    error = RuntimeError("upstream down")
+    report, committed = run_dag([
+        stage("agent1", events, error=error),
+        stage("agent3", events, depends_on=["agent1"]),
+    ])
+    
+    assert report["error"] is error
+    assert report["failed_stage"] == "agent1"
+    assert report["aborted"] is False
+    assert committed == []
+
+
+def test_unknown_dependencies_and_cycles_are_rejected():
+    events = []
+    with pytest.raises(ValueError, match="unknown"):
+        WorkflowDAG([stage("agent3", events, depends_on=["agent9"])])
+    with pytest.raises(ValueError, match="cycle"):
+        WorkflowDAG([
+            stage("a", events, depends_on=["b"]),
+            stage("b", events, speculative_after=["a"]),
+        ])
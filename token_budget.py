@@ -0,0 +1,443 @@
+"""Token counting and per-call prompt budgets for the agents."""
+import contextvars
+import json
+import math
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from config import (
+    TOKEN_BUDGET_ENABLED,
+    TOKEN_ENCODING,
+    LLM_DEFAULT_CONTEXT_WINDOW,
+    LLM_CONTEXT_WINDOWS,
+    LLM_MIN_OUTPUT_TOKENS,
+    LLM_CONTEXT_SAFETY_TOKENS,
+)
+from llm_cache import hash_text
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Token reports of the calls made in the current context. A workflow sets
+# this to a list so every agent call's budget and usage is recorded.
+token_usage_log: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar(
+    "token_usage_log", default=None
+)
+
+# Tokens added by the chat format around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Never trim a section below this many tokens
+MIN_SECTION_TOKENS = 256
+# Rounds of proportional truncation (counts shift slightly after each cut)
+TRIM_PASSES = 4
+
+SectionValue = Union[str, Dict, List, None]
+
+
+class PromptTooLargeError(Exception):
+    """Raised instead of calling the upstream when a prompt leaves too little room for the output."""
+    
+    def __init__(self, model: str, prompt_tokens: int, context_window: int, min_output_tokens: int):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.context_window = context_window
+        self.min_output_tokens = min_output_tokens
+        super().__init__(
+            f"Input too large: about {prompt_tokens} prompt tokens leave less than {min_output_tokens} "
+            f"output tokens in the {context_window}-token context window of {model}. "
+            f"Please shorten the resume, job description or project materials."
+        )
+
+
+class EstimatingTokenCounter:
+    """
+    Offline token estimator that mimics BPE pre-tokenization: words, digit
+    groups, CJK characters, punctuation and whitespace runs are costed
+    separately, erring slightly high.
+    """
+    
+    name = "estimator"
+    
+    _PIECE_RE = re.compile(
+        r"[A-Za-z]+|\d{1,3}|[　-〿一-鿿＀-￯]|\s+|[^\sA-Za-z\d]"
+    )
+    
+    def count(self, text: str) -> int:
+        """Estimate the number of tokens in a text."""
+        tokens = 0.0
+        for piece in self._PIECE_RE.findall(text or ""):
+            first = piece[0]
+            if first.isascii() and first.isalpha():
+                # Common words are a single token; long or rare ones split
+                tokens += 1 if len(piece) <= 7 else math.ceil(len(piece) / 6)
+            elif first.isdigit():
+                tokens += 1
+            elif first.isspace():
+                # A single space merges into the next word; indentation runs merge in chunks
+                if piece != " ":
+                    tokens += 1 + (len(piece) - 1) // 8
+            elif "一" <= first <= "鿿":
+                tokens += 1.2
+            else:
+                tokens += 1
+        return int(math.ceil(tokens))
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the head and tail of a text within roughly max_tokens, omission marker included."""
+        total = self.count(text)
+        if total <= max_tokens:
+            return text
+        keep_tokens = max(0, max_tokens - self.count(_omission_marker(total)))
+        chars_per_token = len(text) / max(total, 1)
+        return _cut_middle(text, int(keep_tokens * chars_per_token * 0.98), total - keep_tokens)
+
+
+class TiktokenCounter:
+    """Exact counts with a tiktoken encoding."""
+    
+    def __init__(self, encoding):
+        """
+        Initialize the counter.
+        
+        Args:
+            encoding: Loaded tiktoken encoding
+        """
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+    
+    def count(self, text: str) -> int:
+        """Count the tokens of a text."""
+        return len(self.encoding.encode(text or "", disallowed_special=()))
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the head and tail of a text within max_tokens, omission marker included."""
+        tokens = self.encoding.encode(text or "", disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        keep = max(0, max_tokens - self.count(_omission_marker(len(tokens))))
+        head = int(keep * 0.7)
+        tail = keep - head
+        marker = _omission_marker(len(tokens) - keep)
+        return self.encoding.decode(tokens[:head]) + marker + self.encoding.decode(tokens[len(tokens) - tail:])
+
+
+def _omission_marker(omitted_tokens: int) -> str:
+    return f"\n[... about {omitted_tokens} tokens omitted to fit the context window ...]\n"
+
+
+def _cut_middle(text: str, keep_chars: int, omitted_tokens: int) -> str:
+    """Keep 70% of the budget from the head and 30% from the tail, cut at line breaks when possible."""
+    head_chars = int(keep_chars * 0.7)
+    tail_chars = keep_chars - head_chars
+    head = text[:head_chars]
+    tail = text[len(text) - tail_chars:] if tail_chars > 0 else ""
+    if "\n" in head[head_chars // 2:]:
+        head = head[:head.rfind("\n")]
+    if "\n" in tail[:tail_chars // 2]:
+        tail = tail[tail.find("\n") + 1:]
+    return head + _omission_marker(omitted_tokens) + tail
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_token_counter():
+    """
+    Get the process-wide token counter.
+    
+    Uses tiktoken when the package and its BPE file are available (the file
+    is downloaded once, or read from TIKTOKEN_CACHE_DIR offline), otherwise
+    the estimator.
+    """
+    global _counter
+    with _counter_lock:
+        if _counter is None:
+            _counter = EstimatingTokenCounter()
+            if TIKTOKEN_AVAILABLE:
+                try:
+                    _counter = TiktokenCounter(tiktoken.get_encoding(TOKEN_ENCODING))
+                except Exception as e:
+                    print(f"⚠️  Warning: tiktoken encoding {TOKEN_ENCODING} unavailable, estimating tokens: {e}")
+        return _counter
+
+
+def _load_context_windows() -> Dict[str, int]:
+    try:
+        windows = json.loads(LLM_CONTEXT_WINDOWS)
+    except json.JSONDecodeError:
+        print("⚠️  Warning: LLM_CONTEXT_WINDOWS is not valid JSON, using defaults")
+        windows = {}
+    return windows if isinstance(windows, dict) else {}
+
+
+_context_windows = _load_context_windows()
+
+# Observed upstream prompt_tokens / counted prompt tokens per model, so the
+# budget follows the model's real tokenizer
+_calibration: Dict[str, float] = {}
+
+
+# Upstream prompt tokens and the part served from the provider's prefix cache, per model
+_prompt_cache_totals: Dict[str, Dict[str, int]] = {}
+
+
+def context_window(model: str) -> int:
+    """Context window size of a model in tokens."""
+    return int(_context_windows.get(model, LLM_DEFAULT_CONTEXT_WINDOW))
+
+
+def calibration(model: str) -> float:
+    """Correction factor applied to counted tokens for a model."""
+    return _calibration.get(model, 1.0)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count (or estimate) the tokens of a text, calibrated for the model if given."""
+    tokens = get_token_counter().count(text)
+    return int(math.ceil(tokens * calibration(model))) if model else tokens
+
+
+def count_message_tokens(messages: List[Dict], model: Optional[str] = None) -> int:
+    """Count the prompt tokens of a chat message list."""
+    raw = sum(get_token_counter().count(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    return int(math.ceil(raw * calibration(model))) if model else raw
+
+
+def render_section(value: SectionValue, compact: bool = False) -> str:
+    """Render a prompt section; structured values are JSON, compact when space is short."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if compact:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(value, indent=2, ensure_ascii=False)
+
+
+def _user_message_hash(messages: List[Dict]) -> str:
+    return hash_text("\n".join(m.get("content") or "" for m in messages if m.get("role") != "system"))
+
+
+def _user_messages_hash(user_messages: List[str]) -> str:
+    # Same digest as _user_message_hash of the payload built from these messages
+    return hash_text("\n".join(m for m in user_messages if m))
+
+
+def fit_prompt(
+    agent_name: str,
+    model: str,
+    system_prompt: str,
+    sections: Dict[str, SectionValue],
+    render: Callable[[Dict[str, str]], List[str]],
+    max_tokens: int,
+    trim_order: List[str]
+) -> Tuple[List[str], int]:
+    """
+    Fit the user messages into the model's context window and size max_tokens.
+    
+    Structured sections are first serialized compactly, then the sections in
+    trim_order are truncated together, down to MIN_SECTION_TOKENS each,
+    until the prompt leaves room for max_tokens of output. Each section gives
+    up a share of the excess proportional to its size above the floor,
+    weighted by its place in trim_order (least important first, weighted
+    most), so one long section is shortened rather than cut to its floor.
+    The resulting max_tokens is the smaller of the requested value and
+    what is left of the window. If that is below LLM_MIN_OUTPUT_TOKENS
+    (or the requested value, if smaller), sections are truncated past their
+    floor to make room for it.
+    
+    Args:
+        agent_name: Agent identifier (e.g. "agent2")
+        model: Model the prompt is built for
+        system_prompt: System message content
+        sections: Named prompt sections (text, or dict/list rendered as JSON)
+        render: Builds the user messages from the rendered sections
+        max_tokens: Desired maximum completion length
+        trim_order: Section names that may be trimmed, least important first
+    
+    Returns:
+        Tuple of (user messages, max_tokens)
+    
+    Raises:
+        PromptTooLargeError: If the untrimmable part of the prompt leaves
+            less than the minimum output
+    """
+    rendered = {name: render_section(value) for name, value in sections.items()}
+    if not TOKEN_BUDGET_ENABLED:
+        return render(rendered), max_tokens
+    
+    counter = get_token_counter()
+    window = context_window(model)
+    system_tokens = count_tokens(system_prompt, model) + MESSAGE_OVERHEAD_TOKENS
+    
+    def prompt_tokens() -> int:
+        return system_tokens + sum(
+            count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS for content in render(rendered) if content
+        )
+    
+    original = {name: count_tokens(text, model) for name, text in rendered.items()}
+    trimmed = {}
+    prompt_budget = window - LLM_CONTEXT_SAFETY_TOKENS - max_tokens
+    total = prompt_tokens()
+    
+    # 1. Compact structured sections
+    if total > prompt_budget:
+        for name in trim_order:
+            if isinstance(sections.get(name), (dict, list)):
+                rendered[name] = render_section(sections[name], compact=True)
+                trimmed[name] = {"action": "compacted"}
+        total = prompt_tokens()
+    
+    def truncate_sections(budget: int, floor: int) -> int:
+        """Truncate the trimmable sections proportionally until the prompt fits the budget."""
+        total = prompt_tokens()
+        for _ in range(TRIM_PASSES):
+            if total <= budget:
+                break
+            sizes = {name: count_tokens(rendered.get(name, ""), model) for name in trim_order}
+            weights = {
+                name: (sizes[name] - floor) * (len(trim_order) - position)
+                for position, name in enumerate(trim_order) if sizes[name] > floor
+            }
+            if not weights:
+                break
+            excess = total - budget
+            total_weight = sum(weights.values())
+            for name, weight in weights.items():
+                target = max(floor, sizes[name] - math.ceil(excess * weight / total_weight))
+                rendered[name] = counter.truncate(rendered[name], int(target / calibration(model)))
+                trimmed[name] = {"action": "truncated"}
+            total = prompt_tokens()
+        return total
+    
+    # 2. Truncate sections down to their floor
+    if total > prompt_budget:
+        total = truncate_sections(prompt_budget, MIN_SECTION_TOKENS)
+    
+    # 3. Still no room for the minimum output: truncate past the floor
+    min_output_tokens = min(max_tokens, LLM_MIN_OUTPUT_TOKENS)
+    min_output_budget = window - LLM_CONTEXT_SAFETY_TOKENS - min_output_tokens
+    if total > min_output_budget:
+        total = truncate_sections(min_output_budget, 0)
+    if total > min_output_budget:
+        raise PromptTooLargeError(model, total, window, min_output_tokens)
+    
+    for name in trimmed:
+        trimmed[name].update(from_tokens=original[name], to_tokens=count_tokens(rendered[name], model))
+    
+    user_messages = render(rendered)
+    budgeted_max_tokens = min(max_tokens, window - total - LLM_CONTEXT_SAFETY_TOKENS)
+    
+    report = {
+        "agent": agent_name,
+        "model": model,
+        "encoder": counter.name,
+        "context_window": window,
+        "system_tokens": system_tokens,
+        "section_tokens": {name: count_tokens(text, model) for name, text in rendered.items()},
+        "trimmed_sections": trimmed,
+        "estimated_prompt_tokens": total,
+        "max_tokens": budgeted_max_tokens,
+        "over_budget": total > prompt_budget,
+        "message_hash": _user_messages_hash(user_messages),
+    }
+    log = token_usage_log.get()
+    if log is not None:
+        log.append(report)
+    return user_messages, budgeted_max_tokens
+
+
+def clamp_max_tokens(payload: Dict) -> None:
+    """
+    Shrink a payload's max_tokens to what fits the window of its (possibly re-routed) model.
+    
+    Raises:
+        PromptTooLargeError: If less than LLM_MIN_OUTPUT_TOKENS (or the
+            requested max_tokens, if smaller) would be left
+    """
+    if not TOKEN_BUDGET_ENABLED or "max_tokens" not in payload:
+        return
+    model = payload.get("model", "")
+    prompt = count_message_tokens(payload.get("messages", []), model)
+    window = context_window(model)
+    available = window - prompt - LLM_CONTEXT_SAFETY_TOKENS
+    min_output_tokens = min(payload["max_tokens"], LLM_MIN_OUTPUT_TOKENS)
+    if available < min_output_tokens:
+        raise PromptTooLargeError(model, prompt, window, min_output_tokens)
+    payload["max_tokens"] = min(payload["max_tokens"], available)
+
+
+def cached_prompt_tokens(usage: Dict) -> int:
+    """Prompt tokens the provider served from its prefix cache, per the usage field."""
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0)
+
+
+def prompt_cache_stats() -> Dict[str, Dict]:
+    """
+    Get upstream prefix-cache usage per model.
+    
+    Returns:
+        Dictionary of calls, prompt tokens, cached tokens and cached ratio by model
+    """
+    return {
+        model: {
+            **totals,
+            "cached_ratio": round(totals["cached_tokens"] / totals["prompt_tokens"], 3) if totals["prompt_tokens"] else 0.0,
+        }
+        for model, totals in _prompt_cache_totals.items()
+    }
+
+
+def record_usage(agent_name: str, payload: Dict, result: Dict, from_cache: bool = False) -> None:
+    """
+    Attach upstream token usage to the call's budget report and recalibrate.
+    
+    Args:
+        agent_name: Agent identifier
+        payload: Chat-completions request body that was sent
+        result: Chat-completions response
+        from_cache: Whether the response came from the response cache
+    """
+    usage = result.get("usage") or {}
+    model = payload.get("model", "")
+    messages = payload.get("messages", [])
+    
+    if usage.get("prompt_tokens") and not from_cache:
+        counted = count_message_tokens(messages)
+        if counted:
+            ratio = min(2.0, max(0.5, usage["prompt_tokens"] / counted))
+            previous = _calibration.get(model)
+            _calibration[model] = ratio if previous is None else 0.8 * previous + 0.2 * ratio
+        totals = _prompt_cache_totals.setdefault(model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage["prompt_tokens"]
+        totals["cached_tokens"] += cached_prompt_tokens(usage)
+    
+    log = token_usage_log.get()
+    if log is None:
+        return
+    
+    message_hash = _user_message_hash(messages)
+    entry = next(
+        (r for r in reversed(log)
+         if r.get("agent") == agent_name and r.get("message_hash") == message_hash and "prompt_tokens" not in r),
+        None
+    )
+    if entry is None:
+        entry = {"agent": agent_name, "message_hash": message_hash}
+        log.append(entry)
+    entry.update(
+        model=model,
+        max_tokens=payload.get("max_tokens"),
+        prompt_tokens=usage.get("prompt_tokens"),
+        cached_tokens=cached_prompt_tokens(usage),
+        completion_tokens=usage.get("completion_tokens"),
+        total_tokens=usage.get("total_tokens"),
+        from_cache=from_cache,
+    )
@@ -1,14 +1,18 @@
 """Complete Workflow API - All Agents Endpoints."""
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List, Tuple
+import copy
 import json
 import asyncio
+import time
 from datetime import datetime
+from contextlib import asynccontextmanager
 import os
+import uuid
 from pdf_parser import extract_text_from_pdf, validate_pdf
 
 # Import all agents
@@ -16,13 +20,52 @@ from agent1 import InputValidationAgent
 from agent2 import JDAnalysisAgent
 from agent3 import ProjectPackagingAgent
 from agent4 import ResumeOptimizationAgent
-from agent5 import InterviewPreparationAgent
+from agent5 import InterviewPreparationAgent, RESUME_INDEPENDENT_THEMES
 
 # Import services
 from resume_optimization_service import ResumeOptimizationService
+from session_registry import get_session_registry, SessionConflictError
 from resume_export import ResumeExporter
+from llm_client import open_llm_client, close_llm_client, get_pool_metrics
+from llm_cache import get_response_cache, close_response_cache
+from semantic_cache import get_semantic_cache
+from rate_limiter import get_rate_limiter, close_rate_limiter, PRIORITY_BATCH, request_priority
+from circuit_breaker import get_circuit_breaker
+from model_router import get_model_router, routing_decisions
+from token_budget import token_usage_log, get_token_counter
+from workflow_dag import WorkflowDAG, WorkflowStage, WorkflowAborted
+from batch_runner import BatchRun
+from state_store import StateView, get_state_store, close_state_store, EXPIRED_STATUS
+from progress_bus import ProgressBus
+from config import (
+    BATCH_RUNS_DIR, AGENT5_PARALLEL_ENABLED, AGENT5_SPECULATION_TTL_SECONDS, STATE_FLUSH_INTERVAL, STATE_EVICT_INTERVAL,
+    STATE_HEARTBEAT_INTERVAL, PROGRESS_LONG_POLL_MAX_SECONDS
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared LLM client and state store on startup and close them on shutdown."""
+    await open_llm_client()
+    # Loading the tokenizer may read or download its BPE file; keep that off the event loop
+    await asyncio.to_thread(get_token_counter)
+    get_response_cache()
+    get_rate_limiter()
+    _recover_interrupted()
+    flusher = asyncio.create_task(_flush_state_periodically())
+    evictor = asyncio.create_task(_evict_state_periodically())
+    yield
+    flusher.cancel()
+    evictor.cancel()
+    await asyncio.gather(flusher, return_exceptions=True)
+    _flush_state()
+    await close_llm_client()
+    close_response_cache()
+    close_rate_limiter()
+    close_state_store()
 
-app = FastAPI(title="AI Job Hunting Assistant API", version="1.0.0")
+
+app = FastAPI(title="AI Job Hunting Assistant API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for frontend
 # Allow all origins for sharing (in production, restrict this to specific domains)
@@ -40,14 +83,229 @@ agent2 = JDAnalysisAgent()
 agent3 = ProjectPackagingAgent()
 agent4 = ResumeOptimizationAgent()
 agent5 = InterviewPreparationAgent()
-optimization_service = ResumeOptimizationService()
 exporter = ResumeExporter()
 
-# Global state for workflow execution
-workflow_state = {}
+# Global state for workflow execution, shared by all workers through the state store
+workflow_state = StateView("workflow")
+
+# Wakes progress streams of the workflows running in this worker on every state change
+workflow_progress = ProgressBus()
 
 # Store workflow results for later use (Agent 5 needs Agent 2 outputs)
-workflow_results = {}
+workflow_results = StateView("workflow_results", keep_live=False)
+
+# Interview preparation jobs
+interview_state = StateView("interview")
+
+# Batch runs currently executing in this worker, by run id
+batch_tasks = {}
+
+# Resume-independent Agent 5 sections generated ahead of time, by workflow id; claimed
+# (and deleted) by the first interview preparation of the workflow on any worker
+interview_speculation_state = StateView("interview_speculation")
+
+# Tasks generating those sections in this worker, by workflow id (kept for cancelling them)
+interview_speculation = {}
+
+# Views whose running documents this worker keeps live, flushes and heartbeats
+LIVE_VIEWS = (workflow_state, interview_state, interview_speculation_state)
+
+
+def _flush_state() -> None:
+    """Write in-place progress updates of this worker's running jobs, and read times, to the state store."""
+    for view in LIVE_VIEWS:
+        try:
+            view.flush()
+        except Exception as e:
+            print(f"⚠️  Warning: Failed to write {view.kind} state: {str(e)}")
+    try:
+        get_state_store().flush_access_times()
+    except Exception as e:
+        print(f"⚠️  Warning: Failed to write state access times: {str(e)}")
+
+
+async def _write_state_changes(heartbeat: bool) -> None:
+    """Async variant of _flush_state writing in threads, optionally with heartbeats."""
+    for view in LIVE_VIEWS:
+        try:
+            await view.aflush()
+        except Exception as e:
+            print(f"⚠️  Warning: Failed to write {view.kind} state: {str(e)}")
+    try:
+        await asyncio.to_thread(get_state_store().flush_access_times)
+    except Exception as e:
+        print(f"⚠️  Warning: Failed to write state access times: {str(e)}")
+    if not heartbeat:
+        return
+    for view in LIVE_VIEWS:
+        try:
+            await view.aheartbeat()
+        except Exception as e:
+            print(f"⚠️  Warning: Failed to touch {view.kind} state: {str(e)}")
+
+
+async def _flush_state_periodically() -> None:
+    last_heartbeat = time.monotonic()
+    while True:
+        await asyncio.sleep(STATE_FLUSH_INTERVAL)
+        heartbeat = time.monotonic() - last_heartbeat >= STATE_HEARTBEAT_INTERVAL
+        if heartbeat:
+            last_heartbeat = time.monotonic()
+        writing = asyncio.ensure_future(_write_state_changes(heartbeat))
+        try:
+            await asyncio.shield(writing)
+        except asyncio.CancelledError:
+            # Let the writes in flight finish before shutdown closes the store
+            await writing
+            raise
+
+
+def _recover_interrupted() -> None:
+    """Mark jobs whose worker died (on restart or a stale heartbeat) as failed."""
+    store = get_state_store()
+    for kind in (view.kind for view in LIVE_VIEWS):
+        recovered = store.recover_interrupted(kind)
+        if recovered:
+            print(f"⚠️  Warning: Marked {recovered} interrupted {kind} run(s) as failed")
+
+
+async def _evict_state_periodically() -> None:
+    """
+    Fail jobs abandoned by dead workers, expire finished jobs past their TTL
+    and evict the least recently used above the limits.
+    """
+    while True:
+        await asyncio.sleep(STATE_EVICT_INTERVAL)
+        _expire_interview_speculation()
+        try:
+            _recover_interrupted()
+            report = get_state_store().evict()
+            get_session_registry().evict_idle()
+        except Exception as e:
+            print(f"⚠️  Warning: State eviction failed: {str(e)}")
+            continue
+        if report["expired"] or report["evicted"]:
+            print(f"State eviction: {report['expired']} expired, {report['evicted']} evicted for capacity")
+
+
+def _expired_state(job: str, marker: Dict) -> Dict:
+    """
+    Progress response for a job whose state was evicted.
+    
+    Reported as failed (so polling clients stop) with error_code "expired".
+    
+    Args:
+        job: Job type for the message, e.g. "Workflow"
+        marker: The "expired" marker left in the state store
+    
+    Returns:
+        Progress dictionary
+    """
+    return {
+        "status": "failed",
+        "error_code": "expired",
+        "expired_at": marker.get("expired_at"),
+        "progress": 0,
+        "message": f"{job} expired",
+        "results": {},
+        "error": f"{job} has expired and its results were removed. Please start again."
+    }
+
+
+# Fields of a workflow state sent with every progress update; stage results
+# are sent once per stage (see _progress_view)
+PROGRESS_FIELDS = (
+    "status", "current_step", "progress", "message", "error", "error_code",
+    "expired_at", "circuit_breaker", "agent_progress", "version"
+)
+
+
+def _progress_view(state: Dict) -> Dict:
+    """
+    Status fields of a workflow state, without the stage results.
+    
+    "completed_stages" lists the stages whose results are available; clients
+    fetch each of them once from /api/v1/workflow/result/{workflow_id}/{stage}
+    (or receive it as a "results" patch on the progress stream).
+    
+    Args:
+        state: Workflow state
+    
+    Returns:
+        Progress dictionary
+    """
+    view = {field: state[field] for field in PROGRESS_FIELDS if field in state}
+    view["completed_stages"] = list(state.get("results", {}))
+    return view
+
+
+def _progress_wait_timeout(workflow_id: str, remaining: Optional[float] = None) -> Optional[float]:
+    """
+    How long a progress subscriber waits for a publish before reading the workflow again.
+    
+    A workflow running in this worker publishes every change, so its
+    subscribers wait for the publish alone. One running in another worker
+    cannot wake them, so they re-read the store every STATE_FLUSH_INTERVAL.
+    
+    Args:
+        workflow_id: Workflow the subscriber follows
+        remaining: Seconds left until the subscriber gives up, if it does
+    
+    Returns:
+        Seconds to wait, or None to wait for the publish
+    """
+    if workflow_state.is_live(workflow_id):
+        return remaining
+    return STATE_FLUSH_INTERVAL if remaining is None else min(remaining, STATE_FLUSH_INTERVAL)
+
+
+def _get_session(workflow_id: str) -> ResumeOptimizationService:
+    """
+    Get the resume optimization session of a workflow, or raise 404/410.
+    
+    Args:
+        workflow_id: Completed workflow the session belongs to
+    
+    Returns:
+        The workflow's ResumeOptimizationService
+    """
+    service = get_session_registry().get(workflow_id)
+    if service is not None:
+        return service
+    _raise_session_missing(workflow_id)
+
+
+def _update_session(workflow_id: str, change: Callable[[ResumeOptimizationService], Any]) -> Tuple[ResumeOptimizationService, Any]:
+    """
+    Apply a change to the session of a workflow and save it, or raise 404/409/410.
+    
+    Args:
+        workflow_id: Completed workflow the session belongs to
+        change: Changes the session and returns a result
+    
+    Returns:
+        Tuple of (session, result of change)
+    """
+    try:
+        updated = get_session_registry().update(workflow_id, change)
+    except SessionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if updated is None:
+        _raise_session_missing(workflow_id)
+    return updated
+
+
+def _raise_session_missing(workflow_id: str) -> None:
+    """Raise 410 if the workflow's results expired, 404 otherwise."""
+    marker = workflow_results.get(workflow_id)
+    if marker is not None and marker.get("status") == EXPIRED_STATUS:
+        raise HTTPException(status_code=410, detail=_expired_state("Workflow", marker)["error"])
+    raise HTTPException(status_code=404, detail="Workflow results not found. Please complete workflow first.")
+
+
+def _new_job_id(prefix: str) -> str:
+    """Job id that is unique across workers: timestamp plus a random suffix."""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
 
 
 # ============================================================================
@@ -113,6 +371,20 @@ class ExportRequest(BaseModel):
     title: str = "Resume"
 
 
+class BatchItem(BaseModel):
+    """One input of a batch run."""
+    id: Optional[str] = None
+    jd_text: str
+    resume_text: str
+    projects_text: Optional[str] = None
+
+
+class BatchStartRequest(BaseModel):
+    """Request to run the workflow over a batch of inputs."""
+    items: List[BatchItem]
+    submitter: Optional[str] = None  # "local" or "batch_api"
+
+
 # ============================================================================
 # Workflow Execution Endpoints
 # ============================================================================
@@ -129,7 +401,7 @@ async def start_workflow(request: WorkflowStartRequest, background_tasks: Backgr
     import asyncio
     
     # Generate workflow ID
-    workflow_id = f"workflow_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    workflow_id = _new_job_id("workflow")
     
     # Initialize workflow state immediately (synchronous, fast operation)
     workflow_state[workflow_id] = {
@@ -140,6 +412,7 @@ async def start_workflow(request: WorkflowStartRequest, background_tasks: Backgr
         "results": {},
         "error": None
     }
+    workflow_progress.publish(workflow_id, workflow_state[workflow_id])
     
     # Schedule background execution using asyncio.create_task for true async
     # This ensures the endpoint returns immediately without waiting
@@ -165,10 +438,63 @@ async def start_workflow(request: WorkflowStartRequest, background_tasks: Backgr
     }
 
 
+def _progress_etag(state: Dict, full: bool) -> str:
+    """ETag of a workflow progress response: the state version (and variant)."""
+    variant = "-full" if full else ""
+    return f'"{state.get("version", 0)}{variant}"'
+
+
+def _progress_unchanged(state: Dict, full: bool, since_version: Optional[int], if_none_match: Optional[str]) -> bool:
+    """Whether the client already has this version of the progress."""
+    if since_version is not None and state.get("version", 0) <= since_version:
+        return True
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or _progress_etag(state, full) in [tag.removeprefix("W/") for tag in tags]
+    return False
+
+
 @app.get("/api/v1/workflow/progress/{workflow_id}")
-async def get_workflow_progress(workflow_id: str) -> Dict:
-    """Get current workflow progress."""
-    if workflow_id not in workflow_state:
+async def get_workflow_progress(
+    workflow_id: str,
+    response: Response,
+    full: bool = False,
+    since_version: Optional[int] = None,
+    wait: float = 0,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Get current workflow progress.
+    
+    Returns the status fields and version only; stage results are fetched
+    once per stage from /api/v1/workflow/result/{workflow_id}/{stage}.
+    Pass full=true for the whole state including results.
+    
+    Conditional long poll: when the client already has the current version
+    (since_version, or the ETag in If-None-Match), a running workflow's
+    request is held for up to `wait` seconds (at most
+    PROGRESS_LONG_POLL_MAX_SECONDS) until the next change, and answered
+    304 Not Modified if none comes.
+    """
+    state = workflow_state.get(workflow_id)
+    if state is not None and state["status"] == "running" and _progress_unchanged(state, full, since_version, if_none_match):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(max(wait, 0), PROGRESS_LONG_POLL_MAX_SECONDS)
+        with workflow_progress.subscription(workflow_id):
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await workflow_progress.wait(workflow_id, _progress_wait_timeout(workflow_id, remaining))
+                state = workflow_state.get(workflow_id)
+                if state is None or state["status"] != "running" or not _progress_unchanged(
+                    state, full, since_version, if_none_match
+                ):
+                    break
+    
+    if state is not None and state["status"] == EXPIRED_STATUS:
+        return _expired_state("Workflow", state)
+    if state is None:
         # Return a pending state instead of 404 to handle initialization delay
         # This prevents frontend from showing errors during workflow startup
         return {
@@ -176,17 +502,26 @@ async def get_workflow_progress(workflow_id: str) -> Dict:
             "current_step": "agent1",
             "progress": 0,
             "message": "Workflow is initializing...",
-            "results": {},
+            "completed_stages": [],
             "error": None
         }
     
-    return workflow_state[workflow_id]
+    etag = _progress_etag(state, full)
+    if _progress_unchanged(state, full, since_version, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return state if full else _progress_view(state)
 
 
 @app.get("/api/v1/workflow/progress/{workflow_id}/stream")
 async def stream_workflow_progress(workflow_id: str):
     """
     Stream workflow progress using Server-Sent Events (SSE).
+    
+    Each update is a message with the progress fields (see _progress_view)
+    and the state version as event id. When a stage completes, its result is
+    sent once before that update as a "results" event holding a JSON-patch
+    style list: [{"op": "add", "path": "/results/<stage>", "value": ...}].
     Note: Some proxies/gateways may not support SSE, so polling fallback is recommended.
     """
     async def event_generator():
@@ -194,42 +529,65 @@ async def stream_workflow_progress(workflow_id: str):
             # Send initial connection message
             yield f": SSE connection established\n\n"
             
-            # Wait for workflow to be created (max 10 seconds)
-            max_wait = 10
-            waited = 0
-            while workflow_id not in workflow_state and waited < max_wait:
-                await asyncio.sleep(0.5)
-                waited += 0.5
-            
-            # If still not found, send initializing state
-            if workflow_id not in workflow_state:
-                initializing_state = {
-                    "status": "running",
-                    "current_step": "agent1",
-                    "progress": 0,
-                    "message": "Workflow is initializing...",
-                    "results": {},
-                    "error": None
-                }
-                yield f"data: {json.dumps(initializing_state)}\n\n"
-                # Wait a bit more for workflow to start
-                await asyncio.sleep(2)
-            
-            # Now stream actual progress
-            last_state = None
-            while workflow_id in workflow_state:
-                state = workflow_state[workflow_id]
-                
-                # Only send if state changed
-                if state != last_state:
-                    yield f"data: {json.dumps(state)}\n\n"
-                    last_state = state
-                    
-                    # If completed or failed, break
-                    if state["status"] in ["completed", "failed"]:
+            with workflow_progress.subscription(workflow_id):
+                # Wait for workflow to be created (max 10 seconds)
+                deadline = asyncio.get_running_loop().time() + 10
+                while workflow_id not in workflow_state:
+                    remaining = deadline - asyncio.get_running_loop().time()
+                    if remaining <= 0:
                         break
+                    await workflow_progress.wait(workflow_id, min(remaining, STATE_FLUSH_INTERVAL))
+                
+                # If still not found, send initializing state
+                if workflow_id not in workflow_state:
+                    initializing_state = {
+                        "status": "running",
+                        "current_step": "agent1",
+                        "progress": 0,
+                        "message": "Workflow is initializing...",
+                        "completed_stages": [],
+                        "error": None
+                    }
+                    yield f"data: {json.dumps(initializing_state)}\n\n"
+                    # Wait a bit more for workflow to start
+                    await workflow_progress.wait(workflow_id, 2)
                 
-                await asyncio.sleep(1)  # Update every second
+                # Now stream actual progress: send each new version as soon as it is
+                # published (see _progress_wait_timeout)
+                last_payload = None
+                sent_stages = set()
+                while True:
+                    live = workflow_state.is_live(workflow_id)
+                    state = workflow_state.get(workflow_id)
+                    if state is None:
+                        break
+                    version = state.get("version")
+                    if state["status"] == EXPIRED_STATUS:
+                        state = _expired_state("Workflow", state)
+                    
+                    for stage, result in list(state.get("results", {}).items()):
+                        if stage not in sent_stages:
+                            patch = [{"op": "add", "path": f"/results/{stage}", "value": result}]
+                            yield f"event: results\ndata: {json.dumps(patch)}\n\n"
+                            sent_stages.add(stage)
+                    
+                    progress = _progress_view(state)
+                    payload = workflow_progress.render(workflow_id, progress)
+                    if payload != last_payload:
+                        yield f"id: {progress.get('version', 0)}\ndata: {payload}\n\n"
+                        last_payload = payload
+                        
+                        # If completed or failed, break
+                        if progress["status"] in ["completed", "failed"]:
+                            break
+                    
+                    # Changes published while the updates above were sent would not wake the wait
+                    if live and (
+                        not workflow_state.is_live(workflow_id)
+                        or workflow_state.get(workflow_id).get("version") != version
+                    ):
+                        continue
+                    await workflow_progress.wait(workflow_id, _progress_wait_timeout(workflow_id))
         except Exception as e:
             # Send error message before closing
             error_state = {
@@ -253,8 +611,136 @@ async def stream_workflow_progress(workflow_id: str):
     )
 
 
+def _stream_progress_handler(
+    state: Dict,
+    agent_key: str,
+    progress_start: int,
+    progress_end: int,
+    publish: Optional[Callable[[], None]] = None
+):
+    """
+    Build a progress callback that maps streamed tokens of one agent into state.
+    
+    Args:
+        state: Workflow (or interview) state dictionary to update
+        agent_key: Result key of the agent, e.g. "agent2"
+        progress_start: Overall progress when the agent starts
+        progress_end: Overall progress when the agent finishes
+        publish: Called after each update, to notify progress subscribers
+    
+    Returns:
+        Callback accepted by the agents' async methods
+    """
+    def handle(update: Dict) -> None:
+        state["progress"] = max(
+            state.get("progress", 0),
+            int(progress_start + (progress_end - progress_start) * update["fraction"])
+        )
+        state.setdefault("agent_progress", {})[agent_key] = {
+            "tokens": update["tokens"],
+            "expected_tokens": update["expected_tokens"],
+            "elapsed_seconds": update["elapsed_seconds"],
+            "eta_seconds": update["eta_seconds"]
+        }
+        if update["sections"]:
+            state.setdefault("partial_results", {}).setdefault(agent_key, {}).update(update["sections"])
+        if publish is not None:
+            publish()
+    
+    return handle
+
+
+def _part_progress_handler(state: Dict, progress_start: int, progress_end: int):
+    """
+    Build the callbacks that record the progress of a parallel agent call's parts.
+    
+    Args:
+        state: Interview state dictionary to update
+        progress_start: Overall progress when the parts start
+        progress_end: Overall progress when every part has finished
+    
+    Returns:
+        Tuple of (callback for streamed updates naming their "part",
+        callback called with (part name, part result) as each part finishes)
+    """
+    fractions: Dict[str, float] = {}
+    
+    def update_progress() -> None:
+        expected = max(state.get("expected_parts", 0), len(fractions), 1)
+        state["progress"] = max(
+            state.get("progress", 0),
+            int(progress_start + (progress_end - progress_start) * sum(fractions.values()) / expected)
+        )
+    
+    def handle_stream(update: Dict) -> None:
+        part = update["part"]
+        fractions[part] = max(fractions.get(part, 0.0), min(update["fraction"], 1.0))
+        state.setdefault("part_progress", {})[part] = {
+            "tokens": update["tokens"],
+            "expected_tokens": update["expected_tokens"],
+            "elapsed_seconds": update["elapsed_seconds"],
+            "eta_seconds": update["eta_seconds"]
+        }
+        update_progress()
+    
+    def handle_part(part: str, result: Dict) -> None:
+        parts = state.setdefault("parts", {})
+        parts[part] = "failed" if "error" in result or "parse_error" in result else "completed"
+        fractions[part] = 1.0
+        update_progress()
+        expected = max(state.get("expected_parts", 0), len(parts))
+        state["message"] = f"Generated {part.replace('_', ' ')} ({len(parts)}/{expected})"
+        if parts[part] == "failed":
+            return
+        partial = state.setdefault("partial_results", {}).setdefault("agent5", {})
+        for key, value in result.items():
+            if key == "theme_2_project_deep_dive" and key in partial:
+                # One project per part: collect them
+                partial[key]["selected_projects"].extend(value.get("selected_projects", []))
+            else:
+                partial[key] = copy.deepcopy(value)
+    
+    return handle_stream, handle_part
+
+
+def _fail_if_circuit_open(state: Dict, agent_result: Optional[Dict] = None) -> bool:
+    """
+    Fail the workflow fast when the LLM circuit breaker is rejecting calls.
+    
+    Args:
+        state: Workflow state to update
+        agent_result: Result of the step that just ran; a successful result
+            is kept even if the breaker opened meanwhile
+    
+    Returns:
+        True if the workflow was marked as failed
+    """
+    if agent_result is not None and "error" not in agent_result:
+        return False
+    breaker = get_circuit_breaker()
+    if breaker.allows_request():
+        return False
+    
+    snapshot = breaker.snapshot()
+    state["status"] = "failed"
+    state["error"] = (
+        "LLM service is currently unavailable (circuit breaker open). "
+        f"Please retry in about {snapshot['retry_after_seconds']:.0f} seconds."
+    )
+    state["error_code"] = "llm_unavailable"
+    state["circuit_breaker"] = snapshot
+    state["message"] = "LLM service unavailable"
+    return True
+
+
 async def execute_workflow_async(workflow_id: str, jd_text: str, resume_text: str, projects_text: Optional[str]):
-    """Execute workflow in background."""
+    """
+    Execute workflow in background.
+    
+    Stages run as a dependency graph: Agent 2 does not read Agent 1's output,
+    so it starts alongside Agent 1 and is cancelled if validation finds
+    critical issues; Agent 3 waits for both, and Agent 4 for Agents 2 and 3.
+    """
     import logging
     logger = logging.getLogger(__name__)
     
@@ -266,96 +752,132 @@ async def execute_workflow_async(workflow_id: str, jd_text: str, resume_text: st
         state = workflow_state[workflow_id]
         logger.info(f"Starting workflow execution for {workflow_id}")
         
+        # Record the model routing decision and token budget of every agent call for auditing
+        state["routing"] = []
+        routing_decisions.set(state["routing"])
+        state["token_usage"] = []
+        token_usage_log.set(state["token_usage"])
+        
+        if _fail_if_circuit_open(state):
+            return
+        
+        def publish() -> None:
+            workflow_progress.publish(workflow_id, state)
+        
+        def enter_step(step: str, progress: int, message: str) -> None:
+            state["current_step"] = step
+            state["progress"] = max(state.get("progress", 0), progress)
+            state["message"] = message
+            publish()
+        
+        def check_circuit(agent_result: Optional[Dict] = None) -> None:
+            if _fail_if_circuit_open(state, agent_result):
+                raise WorkflowAborted()
+        
         # Agent 1: Input Validation
-        state["current_step"] = "agent1"
-        state["progress"] = 10
-        state["message"] = "Validating inputs..."
-        logger.info(f"Agent 1: Starting validation")
-        try:
-            agent1_result = agent1.validate_inputs(
+        async def run_agent1(inputs: Dict) -> Dict:
+            enter_step("agent1", 10, "Validating inputs...")
+            logger.info(f"Agent 1: Starting validation")
+            agent1_result = await agent1.avalidate_inputs(
                 resume_text=resume_text,
-                project_materials=projects_text
+                project_materials=projects_text,
+                progress_callback=_stream_progress_handler(state, "agent1", 10, 30, publish)
             )
-            state["results"]["agent1"] = agent1_result
             
             if not agent1_result.get("is_valid", False) and "error" not in agent1_result:
                 # Check if there are critical issues
                 issues = agent1_result.get("issues", [])
                 critical_issues = [i for i in issues if i.get("severity") == "critical"]
                 if critical_issues:
+                    state["results"]["agent1"] = agent1_result
                     state["status"] = "failed"
                     state["error"] = "Input validation failed with critical issues"
-                    return
-        except Exception as e:
-            import traceback
-            error_msg = f"Agent 1 error: {str(e)}"
-            logger.error(f"Agent 1 failed: {error_msg}\n{traceback.format_exc()}")
-            state["status"] = "failed"
-            state["error"] = error_msg
-            return
+                    raise WorkflowAborted()
+            check_circuit(agent1_result)
+            return agent1_result
         
-        # Agent 2: JD Analysis
-        state["current_step"] = "agent2"
-        state["progress"] = 30
-        state["message"] = "Analyzing JD and generating candidate profile..."
-        try:
-            agent2_result = agent2.analyze_jd_and_match(
+        # Agent 2: JD Analysis (speculative until Agent 1 passes)
+        async def run_agent2(inputs: Dict) -> Dict:
+            enter_step("agent2", 30, "Analyzing JD and generating candidate profile...")
+            agent2_result = await agent2.aanalyze_jd_and_match(
                 jd_text=jd_text,
                 resume_text=resume_text,
-                project_materials=projects_text
+                project_materials=projects_text,
+                progress_callback=_stream_progress_handler(state, "agent2", 30, 50, publish)
             )
-            state["results"]["agent2"] = agent2_result
-        except Exception as e:
-            state["status"] = "failed"
-            state["error"] = f"Agent 2 error: {str(e)}"
-            return
+            check_circuit(agent2_result)
+            return agent2_result
         
         # Agent 3: Project Packaging
-        state["current_step"] = "agent3"
-        state["progress"] = 50
-        state["message"] = "Packaging and optimizing projects..."
-        try:
-            agent3_result = agent3.package_projects(
+        async def run_agent3(inputs: Dict) -> Dict:
+            enter_step("agent3", 50, "Packaging and optimizing projects...")
+            agent3_result = await agent3.apackage_projects(
                 jd_text=jd_text,
                 project_materials=projects_text or "",
-                agent2_outputs=agent2_result
+                agent2_outputs=inputs["agent2"],
+                progress_callback=_stream_progress_handler(state, "agent3", 50, 70, publish)
             )
-            state["results"]["agent3"] = agent3_result
-        except Exception as e:
-            state["status"] = "failed"
-            state["error"] = f"Agent 3 error: {str(e)}"
-            return
+            check_circuit(agent3_result)
+            return agent3_result
         
         # Agent 4: Resume Optimization
-        state["current_step"] = "agent4"
-        state["progress"] = 70
-        state["message"] = "Generating resume optimization recommendations..."
-        try:
-            # Load data into service
-            optimization_service.load_original_resume(resume_text)
-            optimization_service.load_agent3_outputs(agent3_result)
-            
-            agent4_result = agent4.optimize_resume(
+        async def run_agent4(inputs: Dict) -> Dict:
+            enter_step("agent4", 70, "Generating resume optimization recommendations...")
+            agent4_result = await agent4.aoptimize_resume(
                 jd_text=jd_text,
                 resume_text=resume_text,
-                agent2_outputs=agent2_result,
-                agent3_outputs=agent3_result
+                agent2_outputs=inputs["agent2"],
+                agent3_outputs=inputs["agent3"],
+                progress_callback=_stream_progress_handler(state, "agent4", 70, 95, publish)
             )
-            
-            optimization_service.load_optimization_recommendations(agent4_result)
-            state["results"]["agent4"] = agent4_result
-        except Exception as e:
+            check_circuit(agent4_result)
+            return agent4_result
+        
+        def commit_result(stage: str, result: Dict) -> None:
+            state["results"][stage] = result
+            publish()
+            if stage == "agent2" and "error" not in result:
+                # The business-domain questions need only the JD and Agent 2, so
+                # generate them while Agents 3/4 and the user's review run
+                interview_speculation_state[workflow_id] = {"status": "running", "started_at": time.time()}
+                interview_speculation[workflow_id] = asyncio.ensure_future(
+                    _speculate_interview_sections(workflow_id, jd_text, result)
+                )
+        
+        dag = WorkflowDAG(
+            [
+                WorkflowStage("agent1", run_agent1),
+                WorkflowStage("agent2", run_agent2, speculative_after=["agent1"]),
+                WorkflowStage("agent3", run_agent3, depends_on=["agent1", "agent2"]),
+                WorkflowStage("agent4", run_agent4, depends_on=["agent2", "agent3"]),
+            ],
+            on_commit=commit_result
+        )
+        report = await dag.run()
+        state["timing"] = report["timing"]
+        if not report["completed"]:
+            _cancel_interview_speculation(workflow_id)
+        
+        if report["error"] is not None:
+            stage = report["failed_stage"]
+            error_msg = f"{stage.replace('agent', 'Agent ')} error: {str(report['error'])}"
+            logger.error(f"Workflow stage {stage} failed: {error_msg}")
             state["status"] = "failed"
-            state["error"] = f"Agent 4 error: {str(e)}"
+            state["error"] = error_msg
+            return
+        if not report["completed"]:
             return
         
         # Store results for later use (Agent 5)
         workflow_results[workflow_id] = {
             "jd_text": jd_text,
             "resume_text": resume_text,
-            "agent2_outputs": agent2_result,
-            "agent3_outputs": agent3_result,
-            "agent4_outputs": agent4_result
+            "agent2_outputs": state["results"]["agent2"],
+            "agent3_outputs": state["results"]["agent3"],
+            "agent4_outputs": state["results"]["agent4"],
+            "routing": state["routing"],
+            "token_usage": state["token_usage"],
+            "timing": state["timing"]
         }
         
         # Complete
@@ -363,30 +885,144 @@ async def execute_workflow_async(workflow_id: str, jd_text: str, resume_text: st
         state["progress"] = 100
         state["status"] = "completed"
         state["message"] = "Workflow completed successfully!"
-        
+    
     except Exception as e:
         import traceback
+        _cancel_interview_speculation(workflow_id)
         error_msg = f"Workflow error: {str(e)}"
         logger.error(f"Workflow execution failed: {error_msg}\n{traceback.format_exc()}")
         if workflow_id in workflow_state:
             workflow_state[workflow_id]["status"] = "failed"
             workflow_state[workflow_id]["error"] = error_msg
+    
+    finally:
+        # Final status (completed, failed or aborted) for the progress subscribers
+        if workflow_id in workflow_state:
+            workflow_progress.publish(workflow_id, workflow_state[workflow_id])
+        workflow_state.release(workflow_id)
+
+
+async def _speculate_interview_sections(workflow_id: str, jd_text: str, agent2_outputs: Dict) -> None:
+    """Generate the resume-independent Agent 5 sections behind interactive calls and store them."""
+    # The task inherits the workflow's context; keep its calls out of the workflow's logs
+    routing_decisions.set(None)
+    token_usage_log.set(None)
+    request_priority.set(PRIORITY_BATCH)
+    try:
+        sections = await agent5.agenerate_sections(jd_text, agent2_outputs, RESUME_INDEPENDENT_THEMES)
+    except Exception as e:
+        sections = {"error": str(e)}
+    
+    if interview_speculation.pop(workflow_id, None) is not asyncio.current_task():
+        return  # Dropped meanwhile (expired, or the workflow failed)
+    speculation = interview_speculation_state.get(workflow_id)
+    error = sections.get("error") or sections.get("parse_error")
+    if error:
+        print(f"⚠️  Warning: Speculative interview preparation failed: {error}")
+        speculation.update(status="failed", error=error)
+    else:
+        speculation.update(status="completed", sections=sections)
+    interview_speculation_state.release(workflow_id)
+
+
+def _cancel_interview_speculation(workflow_id: str) -> None:
+    task = interview_speculation.pop(workflow_id, None)
+    if task is not None and not task.done():
+        task.cancel()
+    try:
+        del interview_speculation_state[workflow_id]
+    except KeyError:
+        pass
+
+
+def _expire_interview_speculation() -> None:
+    """Drop speculative sections no interview preparation claimed within their TTL."""
+    now = time.time()
+    for workflow_id in interview_speculation_state.keys():
+        speculation = interview_speculation_state.get(workflow_id)
+        if speculation is None or now - speculation.get("started_at", 0) <= AGENT5_SPECULATION_TTL_SECONDS:
+            continue
+        if speculation.get("status") == "running" and workflow_id not in interview_speculation:
+            continue  # Still generated by another worker, which expires it
+        _cancel_interview_speculation(workflow_id)
+
+
+async def _claim_interview_speculation(workflow_id: str) -> Optional[Dict]:
+    """
+    Take the speculative Agent 5 sections of a workflow, waiting for them if
+    they are still being generated (by this or another worker).
+    
+    Returns:
+        The sections, or None if none were generated, they failed or another
+        interview preparation claimed them first
+    """
+    task = interview_speculation.get(workflow_id)
+    if task is not None:
+        try:
+            # Shielded: the task keeps running for later preparations if this one is cancelled
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+    
+    # Generated by another worker: its heartbeat keeps the document "running" only while it is alive
+    speculation = interview_speculation_state.get(workflow_id)
+    while speculation is not None and speculation.get("status") == "running":
+        if time.time() - speculation.get("started_at", 0) > AGENT5_SPECULATION_TTL_SECONDS:
+            return None
+        await asyncio.sleep(STATE_FLUSH_INTERVAL)
+        speculation = interview_speculation_state.get(workflow_id)
+    
+    if speculation is None or speculation.get("status") != "completed":
+        return None
+    try:
+        # Claimed; preparations started later generate the sections themselves
+        del interview_speculation_state[workflow_id]
+    except KeyError:
+        return None
+    return speculation["sections"]
 
 
 @app.get("/api/v1/workflow/result/{workflow_id}")
 async def get_workflow_result(workflow_id: str) -> Dict:
     """Get workflow results after completion."""
-    if workflow_id not in workflow_state:
+    state = workflow_state.get(workflow_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
+    if state["status"] == EXPIRED_STATUS:
+        raise HTTPException(status_code=410, detail=_expired_state("Workflow", state)["error"])
     
-    state = workflow_state[workflow_id]
     if state["status"] != "completed":
         raise HTTPException(status_code=400, detail="Workflow not completed yet")
     
     return {
         "status": "success",
         "workflow_id": workflow_id,
-        "results": state["results"]
+        "results": state["results"],
+        "routing": state.get("routing", []),
+        "token_usage": state.get("token_usage", []),
+        "timing": state.get("timing")
+    }
+
+
+@app.get("/api/v1/workflow/result/{workflow_id}/{stage}")
+async def get_workflow_stage_result(workflow_id: str, stage: str) -> Dict:
+    """Get the result of one completed stage, while the workflow is still running or after."""
+    state = workflow_state.get(workflow_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if state["status"] == EXPIRED_STATUS:
+        raise HTTPException(status_code=410, detail=_expired_state("Workflow", state)["error"])
+    
+    if stage not in state.get("results", {}):
+        raise HTTPException(status_code=404, detail=f"No result for stage {stage} yet")
+    
+    return {
+        "status": "success",
+        "workflow_id": workflow_id,
+        "stage": stage,
+        "result": state["results"][stage],
+        "version": state.get("version", 0)
     }
 
 
@@ -395,15 +1031,18 @@ async def get_workflow_result(workflow_id: str) -> Dict:
 # ============================================================================
 
 @app.post("/api/v1/resume/feedback")
-async def submit_feedback(request: FeedbackRequest) -> Dict:
+async def submit_feedback(workflow_id: str, request: FeedbackRequest) -> Dict:
     """Submit user feedback for optimization recommendations."""
-    try:
-        result = optimization_service.submit_feedback(
+    def submit(service: ResumeOptimizationService) -> Dict:
+        return service.submit_feedback(
             feedback_type=request.feedback_type,
             item_id=request.item_id,
             feedback=request.feedback,
             additional_notes=request.additional_notes
         )
+    
+    try:
+        optimization_service, result = _update_session(workflow_id, submit)
         
         # If "further_modify" with modified_text, apply the modification
         if request.feedback == "further_modify" and request.modified_text:
@@ -415,36 +1054,44 @@ async def submit_feedback(request: FeedbackRequest) -> Dict:
             "feedback_result": result,
             "feedback_status": optimization_service.get_feedback_status()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error submitting feedback: {str(e)}")
 
 
 @app.post("/api/v1/resume/feedback/batch")
-async def submit_batch_feedback(feedbacks: List[FeedbackRequest]) -> Dict:
+async def submit_batch_feedback(workflow_id: str, feedbacks: List[FeedbackRequest]) -> Dict:
     """Submit multiple feedbacks at once (for "accept all")."""
-    try:
-        results = []
-        for feedback in feedbacks:
-            result = optimization_service.submit_feedback(
+    def submit_all(service: ResumeOptimizationService) -> List[Dict]:
+        return [
+            service.submit_feedback(
                 feedback_type=feedback.feedback_type,
                 item_id=feedback.item_id,
                 feedback=feedback.feedback,
                 additional_notes=feedback.additional_notes
             )
-            results.append(result)
+            for feedback in feedbacks
+        ]
+    
+    try:
+        optimization_service, results = _update_session(workflow_id, submit_all)
         
         return {
             "status": "success",
             "results": results,
             "feedback_status": optimization_service.get_feedback_status()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error submitting batch feedback: {str(e)}")
 
 
 @app.get("/api/v1/resume/feedback/status")
-async def get_feedback_status() -> Dict:
+async def get_feedback_status(workflow_id: str) -> Dict:
     """Get current feedback status."""
+    optimization_service = _get_session(workflow_id)
     try:
         return {
             "status": "success",
@@ -455,13 +1102,17 @@ async def get_feedback_status() -> Dict:
 
 
 @app.post("/api/v1/resume/generate")
-async def generate_final_resume() -> Dict:
+async def generate_final_resume(workflow_id: str) -> Dict:
     """Generate final optimized resume after all feedback."""
-    try:
-        result = optimization_service.apply_feedback_and_generate_resume()
-        
+    def generate(service: ResumeOptimizationService) -> Dict:
+        result = service.apply_feedback_and_generate_resume()
         if "error" in result:
+            # Nothing to save
             raise HTTPException(status_code=400, detail=result["error"])
+        return result
+    
+    try:
+        _, result = _update_session(workflow_id, generate)
         
         return {
             "status": "success",
@@ -478,8 +1129,9 @@ async def generate_final_resume() -> Dict:
 
 
 @app.get("/api/v1/resume/recommendations")
-async def get_recommendations() -> Dict:
+async def get_recommendations(workflow_id: str) -> Dict:
     """Get current optimization recommendations."""
+    optimization_service = _get_session(workflow_id)
     try:
         if not optimization_service.optimization_recommendations:
             raise HTTPException(status_code=404, detail="No recommendations available")
@@ -509,17 +1161,21 @@ class InterviewPrepareRequest(BaseModel):
 async def prepare_interview(request: InterviewPrepareRequest, background_tasks: BackgroundTasks) -> Dict:
     """
     Start Agent 5 interview preparation.
-    Requires workflow_id to get Agent 2 outputs.
+    Requires workflow_id to get Agent 2 outputs and the workflow's final resume.
     """
+    optimization_service = _get_session(request.workflow_id)
     if not optimization_service.final_resume:
         raise HTTPException(status_code=400, detail="Final resume not available. Please generate it first.")
     
-    if request.workflow_id not in workflow_results:
+    workflow_data = workflow_results.get(request.workflow_id)
+    if workflow_data is None:
         raise HTTPException(status_code=404, detail="Workflow results not found. Please complete workflow first.")
+    if workflow_data.get("status") == EXPIRED_STATUS:
+        raise HTTPException(status_code=410, detail=_expired_state("Workflow", workflow_data)["error"])
     
-    interview_id = f"interview_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    interview_id = _new_job_id("interview")
     
-    workflow_state[interview_id] = {
+    interview_state[interview_id] = {
         "status": "running",
         "progress": 0,
         "message": "Preparing interview materials...",
@@ -530,7 +1186,6 @@ async def prepare_interview(request: InterviewPrepareRequest, background_tasks:
     # Get required data
     final_resume = optimization_service.final_resume
     classified_projects = optimization_service.get_classified_projects_for_interview()
-    workflow_data = workflow_results[request.workflow_id]
     
     background_tasks.add_task(
         execute_interview_prep_async,
@@ -538,7 +1193,8 @@ async def prepare_interview(request: InterviewPrepareRequest, background_tasks:
         workflow_data["jd_text"],
         final_resume,
         workflow_data["agent2_outputs"],
-        classified_projects
+        classified_projects,
+        request.workflow_id
     )
     
     return {
@@ -553,11 +1209,24 @@ async def execute_interview_prep_async(
     jd_text: str,
     final_resume: str,
     agent2_outputs: Dict,
-    classified_projects: Dict
+    classified_projects: Dict,
+    workflow_id: Optional[str] = None
 ):
-    """Execute Agent 5 in background."""
+    """
+    Execute Agent 5 in background.
+    
+    Sections generated speculatively after the workflow's Agent 2 step are
+    reused; only the remaining ones are requested.
+    """
+    state = interview_state[interview_id]
     try:
-        state = workflow_state[interview_id]
+        if _fail_if_circuit_open(state):
+            return
+        
+        state["routing"] = []
+        routing_decisions.set(state["routing"])
+        state["token_usage"] = []
+        token_usage_log.set(state["token_usage"])
         
         state["progress"] = 30
         state["message"] = "Generating behavioral interview questions..."
@@ -566,46 +1235,83 @@ async def execute_interview_prep_async(
             "classified_projects": classified_projects
         }
         
+        precomputed = None
+        if workflow_id is not None:
+            precomputed = await _claim_interview_speculation(workflow_id)
+        if precomputed:
+            state["speculative_sections"] = sorted(precomputed)
+        
+        if AGENT5_PARALLEL_ENABLED:
+            state["expected_parts"] = len(agent5.plan_parts(agent4_outputs, precomputed or {}))
+            progress_callback, part_callback = _part_progress_handler(state, 30, 95)
+        else:
+            progress_callback, part_callback = _stream_progress_handler(state, "agent5", 30, 95), None
+        
         # Execute Agent 5
-        agent5_result = agent5.prepare_interview(
+        agent5_result = await agent5.aprepare_interview(
             jd_text=jd_text,
             final_resume=final_resume,
             agent2_outputs=agent2_outputs,
-            agent4_outputs=agent4_outputs
+            agent4_outputs=agent4_outputs,
+            progress_callback=progress_callback,
+            precomputed_sections=precomputed,
+            part_callback=part_callback
         )
+        if _fail_if_circuit_open(state, agent5_result):
+            return
+        if "error" in agent5_result:
+            state["status"] = "failed"
+            state["error"] = f"Interview preparation error: {agent5_result['error']}"
+            return
         
         state["progress"] = 100
         state["status"] = "completed"
         state["result"] = agent5_result
         state["message"] = "Interview preparation completed!"
-        
+        if agent5_result.get("partial"):
+            # Failed parts were filled with empty defaults; say which
+            state["partial"] = True
+            state["part_errors"] = agent5_result["part_errors"]
+            missing = ", ".join(part.replace("_", " ") for part in agent5_result["part_errors"])
+            state["message"] = f"Interview preparation completed without: {missing}. Please try again for the missing parts."
+    
     except Exception as e:
         state["status"] = "failed"
         state["error"] = f"Interview preparation error: {str(e)}"
+    
+    finally:
+        interview_state.release(interview_id)
 
 
 @app.get("/api/v1/interview/progress/{interview_id}")
 async def get_interview_progress(interview_id: str) -> Dict:
     """Get interview preparation progress."""
-    if interview_id not in workflow_state:
+    state = interview_state.get(interview_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Interview preparation not found")
+    if state["status"] == EXPIRED_STATUS:
+        return _expired_state("Interview preparation", state)
     
-    return workflow_state[interview_id]
+    return state
 
 
 @app.get("/api/v1/interview/result/{interview_id}")
 async def get_interview_result(interview_id: str) -> Dict:
     """Get interview preparation result."""
-    if interview_id not in workflow_state:
+    state = interview_state.get(interview_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Interview preparation not found")
+    if state["status"] == EXPIRED_STATUS:
+        raise HTTPException(status_code=410, detail=_expired_state("Interview preparation", state)["error"])
     
-    state = workflow_state[interview_id]
     if state["status"] != "completed":
         raise HTTPException(status_code=400, detail="Interview preparation not completed yet")
     
     return {
         "status": "success",
-        "result": state["result"]
+        "result": state["result"],
+        "routing": state.get("routing", []),
+        "token_usage": state.get("token_usage", [])
     }
 
 
@@ -614,13 +1320,14 @@ async def get_interview_result(interview_id: str) -> Dict:
 # ============================================================================
 
 @app.post("/api/v1/resume/export")
-async def export_resume(request: ExportRequest) -> Dict:
+async def export_resume(workflow_id: str, request: ExportRequest) -> Dict:
     """Export final resume to PDF or DOCX."""
+    optimization_service = _get_session(workflow_id)
     try:
         if not optimization_service.final_resume:
             raise HTTPException(status_code=400, detail="Final resume not available")
         
-        output_path = f"data/resumes/final_resume_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{request.format}"
+        output_path = f"data/resumes/final_resume_{workflow_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{request.format}"
         result = exporter.export(
             resume_text=optimization_service.final_resume,
             output_path=output_path,
@@ -642,13 +1349,106 @@ async def export_resume(request: ExportRequest) -> Dict:
         raise HTTPException(status_code=500, detail=f"Error exporting resume: {str(e)}")
 
 
+# ============================================================================
+# Batch Endpoints
+# ============================================================================
+
+def _open_batch_run(run_id: str) -> BatchRun:
+    """Open a batch run by id, or raise 404."""
+    run_dir = os.path.join(BATCH_RUNS_DIR, os.path.basename(run_id))
+    try:
+        return BatchRun(run_dir)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Batch run not found")
+
+
+def _launch_batch_run(run: BatchRun) -> None:
+    """Run (or resume) a batch in the background of this worker."""
+    import logging
+    logger = logging.getLogger(__name__)
+    run_id = run.run_dir.name
+    
+    async def execute():
+        try:
+            await run.run()
+        except Exception as e:
+            logger.error(f"Batch run {run_id} interrupted: {e}")
+        finally:
+            batch_tasks.pop(run_id, None)
+    
+    batch_tasks[run_id] = asyncio.create_task(execute())
+
+
+@app.post("/api/v1/batch/start")
+async def start_batch(request: BatchStartRequest) -> Dict:
+    """
+    Start an offline batch run of the workflow (Agents 1-4) over many inputs.
+    
+    Requests are submitted stage by stage at batch priority, through the
+    upstream batch API or a rate-limited local queue. Returns immediately;
+    use the batch progress endpoint to track the run.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No batch items provided")
+    try:
+        run = BatchRun.create([item.model_dump() for item in request.items], submitter=request.submitter)
+    except (ValueError, FileExistsError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    _launch_batch_run(run)
+    return {
+        "status": "started",
+        "run_id": run.run_dir.name,
+        "items": len(request.items)
+    }
+
+
+@app.post("/api/v1/batch/{run_id}/resume")
+async def resume_batch(run_id: str) -> Dict:
+    """Resume an interrupted batch run from its saved progress."""
+    if run_id in batch_tasks:
+        raise HTTPException(status_code=409, detail="Batch run is already running")
+    run = _open_batch_run(run_id)
+    if run.manifest["status"] == "completed":
+        raise HTTPException(status_code=400, detail="Batch run already completed")
+    
+    _launch_batch_run(run)
+    return {
+        "status": "resumed",
+        "run_id": run_id
+    }
+
+
+@app.get("/api/v1/batch/{run_id}")
+async def get_batch_progress(run_id: str) -> Dict:
+    """Get the per-stage progress of a batch run."""
+    progress = _open_batch_run(run_id).progress()
+    progress["active"] = run_id in batch_tasks
+    return progress
+
+
+@app.get("/api/v1/batch/{run_id}/results")
+async def get_batch_results(run_id: str) -> Dict:
+    """Get the per-item results of a completed batch run."""
+    run = _open_batch_run(run_id)
+    if run.manifest["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Batch run not completed yet")
+    
+    return {
+        "status": "success",
+        "run_id": run_id,
+        "results": run.results()
+    }
+
+
 # ============================================================================
 # Utility Endpoints
 # ============================================================================
 
 @app.get("/api/v1/projects/classified")
-async def get_classified_projects() -> Dict:
+async def get_classified_projects(workflow_id: str) -> Dict:
     """Get classified projects for interview preparation."""
+    optimization_service = _get_session(workflow_id)
     try:
         classified_projects = optimization_service.get_classified_projects_for_interview()
         return {
@@ -661,8 +1461,75 @@ async def get_classified_projects() -> Dict:
 
 @app.get("/api/v1/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    """
+    Health check endpoint.
+    
+    The status reflects this process only; the LLM circuit breaker (per
+    worker) is reported separately so an open breaker does not take the
+    frontend offline while half-open probes are needed to close it.
+    """
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "llm_circuit": get_circuit_breaker().snapshot()
+    }
+
+
+@app.get("/api/v1/workflows")
+async def list_workflows(status: Optional[str] = None) -> Dict:
+    """List workflow ids known to any worker, optionally only those with a status."""
+    return {
+        "status": "success",
+        "workflow_ids": workflow_state.keys(status)
+    }
+
+
+@app.get("/api/v1/state/stats")
+async def get_state_stats() -> Dict:
+    """Get entry counts and sizes of the shared workflow state store."""
+    return {
+        "status": "success",
+        "state": get_state_store().stats(),
+        "sessions": get_session_registry().stats(),
+        "progress_subscriptions": workflow_progress.stats()
+    }
+
+
+@app.get("/api/v1/llm/pool")
+async def get_llm_pool_metrics() -> Dict:
+    """Get shared LLM connection pool occupancy and request counters."""
+    return {
+        "status": "success",
+        "pool": get_pool_metrics()
+    }
+
+
+@app.get("/api/v1/llm/cache/stats")
+async def get_llm_cache_stats() -> Dict:
+    """Get hit/miss statistics of the shared LLM response cache."""
+    return {
+        "status": "success",
+        "cache": get_response_cache().stats(),
+        "semantic_cache": get_semantic_cache().stats()
+    }
+
+
+@app.get("/api/v1/llm/routing")
+async def get_llm_routing() -> Dict:
+    """Get model routing policies and the latest routing decision per agent."""
+    return {
+        "status": "success",
+        "routing": get_model_router().stats()
+    }
+
+
+@app.get("/api/v1/llm/limiter")
+async def get_llm_limiter_stats() -> Dict:
+    """Get upstream rate limiter budgets, queue depths and wait times."""
+    return {
+        "status": "success",
+        "limiter": get_rate_limiter().stats()
+    }
 
 
 @app.get("/")
@@ -0,0 +1,208 @@
+"""Dependency-graph executor for workflow stages."""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class WorkflowAborted(Exception):
+    """Raised by a stage to stop the workflow; the stage has already recorded why."""
+
+
+class WorkflowStage:
+    """A workflow step and the stages it waits for."""
+    
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[Dict[str, Any]], Awaitable[Any]],
+        depends_on: Optional[List[str]] = None,
+        speculative_after: Optional[List[str]] = None
+    ):
+        """
+        Declare a stage.
+        
+        Args:
+            name: Stage name (e.g. "agent2")
+            run: Coroutine function called with the results of depends_on
+            depends_on: Stages whose results this stage consumes; it starts once they are committed
+            speculative_after: Stages whose results this stage does not consume but
+                which must succeed before its result is accepted. The stage starts
+                without waiting for them and is cancelled if one of them aborts.
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = list(depends_on or [])
+        self.speculative_after = list(speculative_after or [])
+
+
+class WorkflowDAG:
+    """
+    Runs workflow stages as soon as their dependencies are committed.
+    
+    A stage's result is committed once the stage finished and every stage in
+    its speculative_after list is committed; stages depending on it start
+    only then. When a stage fails or aborts, every running stage is
+    cancelled and nothing else starts.
+    """
+    
+    def __init__(
+        self,
+        stages: List[WorkflowStage],
+        on_commit: Optional[Callable[[str, Any], None]] = None
+    ):
+        """
+        Initialize the executor.
+        
+        Args:
+            stages: Workflow stages
+            on_commit: Called with (stage name, result) when a result is committed
+        
+        Raises:
+            ValueError: On unknown dependencies or dependency cycles
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.on_commit = on_commit
+        self._validate()
+    
+    def _validate(self) -> None:
+        for stage in self.stages.values():
+            unknown = [d for d in stage.depends_on + stage.speculative_after if d not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+        
+        visiting, visited = set(), set()
+        
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage {name}")
+            visiting.add(name)
+            stage = self.stages[name]
+            for dependency in stage.depends_on + stage.speculative_after:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+        
+        for name in self.stages:
+            visit(name)
+    
+    async def run(self) -> Dict:
+        """
+        Run every stage.
+        
+        Returns:
+            Report with "completed", "results", "failed_stage", "error"
+            (the stage's exception, if any), "aborted" and "timing"
+        """
+        started = time.monotonic()
+        results: Dict[str, Any] = {}
+        finished, committed = set(), set()
+        tasks: Dict[str, asyncio.Task] = {}
+        timing = {name: {"status": "pending"} for name in self.stages}
+        report = {"completed": False, "results": results, "failed_stage": None, "error": None, "aborted": False}
+        
+        def offset() -> float:
+            return round(time.monotonic() - started, 3)
+        
+        def commit_ready() -> None:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in sorted(finished - committed):
+                    if all(d in committed for d in self.stages[name].speculative_after):
+                        committed.add(name)
+                        timing[name]["committed_at"] = offset()
+                        if self.on_commit is not None:
+                            self.on_commit(name, results[name])
+                        progressed = True
+        
+        def start_ready() -> None:
+            for name, stage in self.stages.items():
+                if name not in tasks and all(d in committed for d in stage.depends_on):
+                    timing[name].update(status="running", started_at=offset())
+                    if stage.speculative_after and not all(d in committed for d in stage.speculative_after):
+                        timing[name]["speculative"] = True
+                    tasks[name] = asyncio.ensure_future(stage.run({d: results[d] for d in stage.depends_on}))
+        
+        try:
+            start_ready()
+            while True:
+                running = {task: name for name, task in tasks.items() if name not in finished and not task.done()}
+                done_names = [name for name, task in tasks.items() if name not in finished and task.done()]
+                if not running and not done_names:
+                    break
+                if not done_names:
+                    await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                
+                for name in done_names:
+                    task = tasks[name]
+                    finished.add(name)
+                    timing[name]["finished_at"] = offset()
+                    try:
+                        results[name] = task.result()
+                        timing[name]["status"] = "completed"
+                    except WorkflowAborted:
+                        timing[name]["status"] = "aborted"
+                        report["aborted"] = True
+                        report["failed_stage"] = name
+                    except Exception as e:
+                        timing[name]["status"] = "failed"
+                        report["error"] = e
+                        report["failed_stage"] = name
+                
+                if report["failed_stage"] is not None:
+                    break
+                commit_ready()
+                start_ready()
+        finally:
+            # Stop anything still running (failure, abort, or the workflow itself being cancelled)
+            for name, task in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    timing[name].update(status="cancelled", finished_at=offset())
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        for name in self.stages:
+            if timing[name]["status"] == "pending":
+                timing[name]["status"] = "skipped"
+            elif timing[name]["status"] in ("running", "completed") and name not in committed:
+                # Finished, but its speculative result was never accepted
+                timing[name]["status"] = "discarded"
+        report["completed"] = len(committed) == len(self.stages)
+        report["timing"] = self._timing_report(timing, offset())
+        return report
+    
+    def _timing_report(self, timing: Dict[str, Dict], total: float) -> Dict:
+        """Per-stage timings plus the critical path that bounded the run."""
+        for entry in timing.values():
+            if "started_at" in entry and "finished_at" in entry:
+                entry["duration"] = round(entry["finished_at"] - entry["started_at"], 3)
+        
+        def ready_at(name: str) -> float:
+            return timing[name].get("committed_at", timing[name]["finished_at"])
+        
+        # Walk back from the stage that finished last through the dependency it
+        # waited for longest. A speculative gate is only on the path if it was
+        # still running when the stage finished.
+        path: List[str] = []
+        timed = [name for name, entry in timing.items() if "finished_at" in entry]
+        current = max(timed, key=lambda n: timing[n]["finished_at"]) if timed else None
+        while current is not None:
+            path.insert(0, current)
+            stage = self.stages[current]
+            waited_for = [d for d in stage.depends_on if "finished_at" in timing[d]] + [
+                d for d in stage.speculative_after
+                if "finished_at" in timing[d] and ready_at(d) >= timing[current]["finished_at"]
+            ]
+            current = max(waited_for, key=ready_at, default=None)
+        
+        sequential = sum(entry.get("duration", 0.0) for entry in timing.values() if entry["status"] == "completed")
+        return {
+            "total_seconds": total,
+            "sequential_seconds": round(sequential, 3),
+            "saved_seconds": round(max(0.0, sequential - total), 3),
+            "critical_path": path,
+            "stages": timing,
+        }